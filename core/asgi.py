@@ -3,6 +3,11 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las lecturas en vivo del dashboard (telemetria.vivo, SSE) necesitan servirse
+por acá, p. ej. ``uvicorn core.asgi:application``; por WSGI el dashboard
+vuelve al sondeo. La API de lecturas usa vistas async: por acá, una consulta
+lenta no ocupa un worker (comparar con ``manage.py benchmark_api``).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,270 @@
+"""
+Benchmark de la API de lecturas con muchos dashboards a la vez: los mismos
+pedidos servidos por el handler de core.wsgi (un pool de hilos, como gunicorn
+--threads) y por el de core.asgi (un event loop), sin servidor HTTP de por
+medio, contra una BD de prueba desechable. Lo usa el comando benchmark_api.
+
+En la BD de prueba las consultas son locales; `latencia` (segundos) agrega
+una espera por consulta, como la ida y vuelta a un PostgreSQL en otra máquina,
+que es donde los hilos de WSGI se quedan bloqueados sin hacer nada.
+"""
+import io
+import os
+import random
+import asyncio
+import tempfile
+import threading
+from time import perf_counter, sleep
+from datetime import datetime, timedelta, timezone as tz
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.test.utils import override_settings
+from telemetria.models import Proyecto, Estacion, DatosSensor
+from telemetria import resumenes
+
+CARGA = '/api/v1/estaciones/{codigo}/lecturas/?max_puntos=1000'
+MES = '/api/v1/estaciones/{codigo}/lecturas/?desde={mes}&max_puntos=1000'
+REFRESCO = '/api/v1/estaciones/{codigo}/lecturas/?despues={despues}'
+
+# Mezclas de pedidos: la de un dashboard que se abre (último día reducido, un
+# mes por hora, refresco) y la de muchos dashboards abiertos que solo refrescan
+MEZCLAS = {
+    'dashboard': (CARGA, MES, REFRESCO),
+    'refresco': (REFRESCO,),
+}
+
+HOST = 'localhost'
+
+
+# ==========================================
+#  DATOS
+# ==========================================
+
+def cargar_datos(estaciones, dias):
+    """Estaciones con una lectura por minuto durante `dias` y sus resúmenes. Devuelve [(codigo, ultimo)]."""
+    proyecto = Proyecto.objects.create(nombre='Benchmark API', fecha_inicio='2025-01-01')
+    # bulk_create: sin Estacion.save, que crea carpetas e imprime
+    creadas = Estacion.objects.bulk_create(
+        Estacion(proyecto=proyecto, nombre=f"Bench {n}", codigo_identificador=str(90001 + n)) for n in range(estaciones)
+    )
+    inicio = datetime(2025, 1, 1, tzinfo=tz.utc)
+    filas = dias * 24 * 60
+    ultimo = inicio + timedelta(minutes=filas - 1)
+    for estacion in creadas:
+        rng = random.Random(estacion.codigo_identificador)
+        DatosSensor.objects.bulk_create((
+            DatosSensor(
+                estacion=estacion, timestamp=inicio + timedelta(minutes=i), record_id=i,
+                bateria_voltaje=12.6 + rng.uniform(-0.1, 0.1), temperatura_agua=18 + rng.uniform(-1, 1),
+                oxigeno_disuelto=7.5 + rng.uniform(-0.5, 0.5), ph=8 + rng.uniform(-0.1, 0.1),
+            ) for i in range(filas)
+        ), batch_size=5000)
+        Estacion.objects.filter(pk=estacion.pk).update(ultimo_timestamp=ultimo, ultimo_record_id=filas - 1)
+        for _ in resumenes.reconstruir(estacion):
+            pass
+    return [(e.codigo_identificador, ultimo) for e in creadas]
+
+
+def sesion():
+    """Cookie de sesión de un superusuario (la API exige login)."""
+    usuario = User.objects.create_superuser('benchmark', password=None)
+    store = SessionStore()
+    store.update({
+        SESSION_KEY: str(usuario.pk),
+        BACKEND_SESSION_KEY: settings.AUTHENTICATION_BACKENDS[0],
+        HASH_SESSION_KEY: usuario.get_session_auth_hash(),
+    })
+    store.create()
+    return f"{settings.SESSION_COOKIE_NAME}={store.session_key}"
+
+
+def urls(estaciones, cantidad, pedidos, semilla=0):
+    """`cantidad` URLs de `pedidos` (ver MEZCLAS) sobre estaciones al azar."""
+    rng = random.Random(semilla)
+    lista = []
+    for _ in range(cantidad):
+        codigo, ultimo = rng.choice(estaciones)
+        lista.append(rng.choice(pedidos).format(
+            codigo=codigo,
+            mes=(ultimo - timedelta(days=30)).date().isoformat(),
+            despues=f"{(ultimo - timedelta(minutes=rng.randrange(1, 10))).timestamp() * 1000:.0f}",
+        ))
+    return lista
+
+
+def con_latencia(latencia):
+    """Agrega `latencia` segundos a cada consulta de cada conexión que se abra (None para quitarla)."""
+    def esperar(execute, sql, params, many, context):
+        sleep(latencia)
+        return execute(sql, params, many, context)
+
+    def instalar(sender, connection, **kwargs):
+        if esperar not in connection.execute_wrappers:
+            connection.execute_wrappers.append(esperar)
+
+    connection_created.connect(instalar, weak=False)
+    if connection.connection is not None:
+        instalar(None, connection)
+
+    def quitar():
+        connection_created.disconnect(instalar)
+        if esperar in connection.execute_wrappers:
+            connection.execute_wrappers.remove(esperar)
+    return quitar
+
+
+# ==========================================
+#  CLIENTES
+# ==========================================
+
+def _resumen(modo, duraciones, errores, segundos, bytes_):
+    duraciones.sort()
+    n = len(duraciones)
+    return {
+        'modo': modo,
+        'pedidos': n,
+        'errores': errores,
+        'pedidos_por_segundo': round(n / segundos, 1),
+        'p50_ms': round(duraciones[n // 2] * 1000, 1) if n else None,
+        'p95_ms': round(duraciones[int(n * 0.95)] * 1000, 1) if n else None,
+        'mb': round(bytes_ / 1e6, 1),
+    }
+
+
+def por_wsgi(urls_por_cliente, cookie, hilos):
+    """Cada cliente pide sus URLs en orden; `hilos` atienden (los demás pedidos esperan un hilo libre)."""
+    aplicacion = WSGIHandler()
+    duraciones, errores, bytes_ = [], 0, 0
+    lock = threading.Lock()
+
+    def atender(url):
+        ruta, _, consulta = url.partition('?')
+        entorno = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'QUERY_STRING': consulta, 'SCRIPT_NAME': '',
+            'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': HOST, 'HTTP_COOKIE': cookie,
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        estado = []
+        cuerpo = aplicacion(entorno, lambda status, headers, exc_info=None: estado.append(status))
+        try:
+            largo = sum(len(parte) for parte in cuerpo)
+        finally:
+            if hasattr(cuerpo, 'close'):
+                cuerpo.close()
+        return estado[0].startswith('200'), largo
+
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='wsgi') as pool:
+        def cliente(lista):
+            nonlocal errores, bytes_
+            for url in lista:
+                inicio = perf_counter()
+                ok, largo = pool.submit(atender, url).result()
+                with lock:
+                    duraciones.append(perf_counter() - inicio)
+                    errores += not ok
+                    bytes_ += largo
+
+        clientes = [threading.Thread(target=cliente, args=(lista,)) for lista in urls_por_cliente]
+        inicio = perf_counter()
+        for c in clientes: c.start()
+        for c in clientes: c.join()
+        segundos = perf_counter() - inicio
+    return _resumen(f"WSGI ({hilos} hilos)", duraciones, errores, segundos, bytes_)
+
+
+def por_asgi(urls_por_cliente, cookie):
+    """Los mismos clientes como tareas de un solo event loop."""
+    aplicacion = ASGIHandler()
+    duraciones, errores, bytes_ = [], 0, 0
+
+    async def atender(url):
+        ruta, _, consulta = url.partition('?')
+        alcance = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': ruta, 'raw_path': ruta.encode(), 'query_string': consulta.encode(), 'root_path': '',
+            'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+        }
+        recibido = False
+        fin = asyncio.Event()
+        estado, largo = [], 0
+
+        async def recibir():
+            nonlocal recibido
+            if recibido:
+                # Django escucha si el cliente se desconecta mientras responde
+                await fin.wait()
+                return {'type': 'http.disconnect'}
+            recibido = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def enviar(mensaje):
+            nonlocal largo
+            if mensaje['type'] == 'http.response.start':
+                estado.append(mensaje['status'])
+            elif mensaje['type'] == 'http.response.body':
+                largo += len(mensaje.get('body', b''))
+                if not mensaje.get('more_body'):
+                    fin.set()
+
+        await aplicacion(alcance, recibir, enviar)
+        return estado[0] == 200, largo
+
+    async def cliente(lista):
+        nonlocal errores, bytes_
+        for url in lista:
+            inicio = perf_counter()
+            ok, largo = await atender(url)
+            duraciones.append(perf_counter() - inicio)
+            errores += not ok
+            bytes_ += largo
+
+    async def todos():
+        await asyncio.gather(*(cliente(lista) for lista in urls_por_cliente))
+
+    inicio = perf_counter()
+    asyncio.run(todos())
+    return _resumen('ASGI (1 event loop)', duraciones, errores, perf_counter() - inicio, bytes_)
+
+
+# ==========================================
+#  EJECUCIÓN
+# ==========================================
+
+def ejecutar(clientes=50, pedidos=20, hilos=4, estaciones=5, dias=14, latencia=0.001, mezcla='dashboard'):
+    """
+    Carga los datos en una BD de prueba nueva (la de `settings` no se toca) y
+    corre los mismos pedidos por WSGI y por ASGI. Devuelve los dos resultados.
+    """
+    with tempfile.TemporaryDirectory(prefix='benchmark-api-') as tmp:
+        if connection.vendor == 'sqlite':
+            # En archivo y no en memoria: cada hilo abre su propia conexión. NAME
+            # también, para que ninguna cree un db.sqlite3 vacío en el proyecto.
+            connection.close()
+            ruta = os.path.join(tmp, 'db.sqlite3')
+            connection.settings_dict['NAME'] = ruta
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = ruta
+        nombre_original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Sin DEBUG: no se guarda el SQL de cada consulta
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=[HOST], RUTA_DATOS_TELEMETRIA=os.path.join(tmp, 'datos')):
+                datos = cargar_datos(estaciones, dias)
+                cookie = sesion()
+                lista = urls(datos, clientes * pedidos, MEZCLAS[mezcla])
+                urls_por_cliente = [lista[i::clientes] for i in range(clientes)]
+                quitar = con_latencia(latencia) if latencia else None
+                try:
+                    return [por_wsgi(urls_por_cliente, cookie, hilos), por_asgi(urls_por_cliente, cookie)]
+                finally:
+                    if quitar: quitar()
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
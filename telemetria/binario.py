@@ -0,0 +1,96 @@
+"""
+Formato binario columnar de la API de lecturas (Accept: TIPO). El navegador
+lee cada columna como un typed array sobre el mismo ArrayBuffer, sin parsear
+texto ni copiar.
+
+Todo en little-endian:
+
+    uint32            largo H del encabezado
+    H bytes           encabezado JSON (UTF-8), relleno con espacios hasta
+                      que 4 + H sea múltiplo de 8
+    Float64[n]        timestamps en milisegundos
+    por serie, en el orden de encabezado["series"]:
+        Float32[n]    valores (NaN donde no hay dato)
+        uint8[...]    bitmap de validez: bit i (LSB primero) = 1 si hay dato
+                      en la fila i, rellenado hasta múltiplo de 4 bytes
+
+El encabezado trae además "filas" (n) y, por serie, el offset de sus valores
+y de su bitmap contados desde el inicio de los timestamps; null (y sin bloque)
+si la serie no tiene ningún dato en la ventana.
+"""
+import sys
+import json
+import math
+import struct
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se arma con el módulo array
+    np = None
+
+TIPO = 'application/vnd.telemetria.columnas'
+
+
+def acepta(request):
+    """Si el cliente pidió el formato binario en el Accept (JSON sigue siendo el de defecto)."""
+    return TIPO in request.headers.get('Accept', '')
+
+
+def _relleno(largo, multiplo):
+    return -largo % multiplo
+
+
+def _columna(valores):
+    """(bytes Float32 LE, bytes del bitmap de validez) de una columna con None/NaN; None si no tiene datos."""
+    if np is not None:
+        y = np.array(valores, dtype=np.float64)
+        validos = ~np.isnan(y)
+        if not validos.any():
+            return None
+        return y.astype('<f4').tobytes(), np.packbits(validos, bitorder='little').tobytes()
+
+    flotantes = array('f', [math.nan if v is None else v for v in valores])
+    if sys.byteorder == 'big':
+        flotantes.byteswap()
+    bitmap = bytearray((len(valores) + 7) // 8)
+    for i, v in enumerate(flotantes):
+        if not math.isnan(v):
+            bitmap[i >> 3] |= 1 << (i & 7)
+    if not any(bitmap):
+        return None
+    return flotantes.tobytes(), bytes(bitmap)
+
+
+def _timestamps(ms):
+    if np is not None:
+        return np.asarray(ms, dtype='<f8').tobytes()
+    datos = array('d', ms)
+    if sys.byteorder == 'big':
+        datos.byteswap()
+    return datos.tobytes()
+
+
+def codificar(encabezado, ms, columnas):
+    """
+    Bytes del formato para las `columnas` ({clave: valores}) alineadas a `ms`.
+    `encabezado` (dict) se completa con filas, series y offsets.
+    """
+    n = len(ms)
+    partes = [_timestamps(ms)]
+    offset = len(partes[0])
+    series = {}
+    for clave, valores in columnas.items():
+        columna = _columna(valores)
+        if columna is None:
+            series[clave] = None
+            continue
+        flotantes, bitmap = columna
+        bitmap += bytes(_relleno(len(bitmap), 4))
+        series[clave] = {'valores': offset, 'validos': offset + len(flotantes)}
+        partes += [flotantes, bitmap]
+        offset += len(flotantes) + len(bitmap)
+
+    texto = json.dumps({**encabezado, 'filas': n, 'series': series}, separators=(',', ':')).encode('utf-8')
+    texto += b' ' * _relleno(4 + len(texto), 8)
+    return b''.join([struct.pack('<I', len(texto)), texto, *partes])
@@ -90,7 +90,7 @@ class ProyectoForm(forms.ModelForm):
 class EstacionForm(forms.ModelForm):
     class Meta:
         model = Estacion
-        fields = ['nombre', 'codigo_identificador', 'proyecto', 'latitud', 'longitud', 'limite_oxigeno_min', 'limite_bateria_min']
+        fields = ['nombre', 'codigo_identificador', 'proyecto', 'latitud', 'longitud', 'limite_oxigeno_min', 'limite_bateria_min', 'intervalo_envio']
         widgets = {
             'nombre': forms.TextInput(attrs={'class': 'w-full rounded-md border border-gray-300 px-3 py-2 focus:ring-brand focus:border-brand'}),
             'codigo_identificador': forms.TextInput(attrs={'class': 'w-full rounded-md border border-gray-300 px-3 py-2 focus:ring-brand focus:border-brand', 'placeholder': 'Ej: 21738'}),
@@ -99,6 +99,7 @@ class EstacionForm(forms.ModelForm):
             'longitud': forms.NumberInput(attrs={'class': 'w-full rounded-md border border-gray-300 px-3 py-2 focus:ring-brand focus:border-brand', 'step': 'any'}),
             'limite_oxigeno_min': forms.NumberInput(attrs={'class': 'w-full rounded-md border border-gray-300 px-3 py-2 focus:ring-brand focus:border-brand'}),
             'limite_bateria_min': forms.NumberInput(attrs={'class': 'w-full rounded-md border border-gray-300 px-3 py-2 focus:ring-brand focus:border-brand'}),
+            'intervalo_envio': forms.NumberInput(attrs={'class': 'w-full rounded-md border border-gray-300 px-3 py-2 focus:ring-brand focus:border-brand', 'placeholder': 'Ej: 15'}),
         }
 
     def __init__(self, user, *args, **kwargs):
@@ -0,0 +1,2 @@
+# Piezas reutilizables del importador de datos de los dataloggers
+# (parseo de archivos .dat, conexiones FTP y etapas del pipeline).
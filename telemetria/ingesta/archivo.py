@@ -0,0 +1,85 @@
+import os
+import gzip
+import hashlib
+import tempfile
+from django.conf import settings
+from telemetria.ingesta.ftp import leer_bloques
+
+# Carpeta dentro de RUTA_DATOS_TELEMETRIA (con punto: FuenteLocal y Vigilante la ignoran)
+CARPETA = '.archivo'
+NIVEL_COMPRESION = 6
+
+
+def raiz_archivo():
+    return os.path.join(settings.RUTA_DATOS_TELEMETRIA, CARPETA)
+
+
+def ruta_crudo(firma, raiz=None):
+    return os.path.join(raiz or raiz_archivo(), firma[:2], firma + '.dat.gz')
+
+
+def abrir_crudo(firma, raiz=None):
+    """Bloques de bytes (descomprimidos) de un archivo crudo."""
+    return leer_bloques(gzip.open(ruta_crudo(firma, raiz), 'rb'))
+
+
+class Captura:
+    """
+    Copia comprimida de las líneas que consume una Lectura, con su hash
+    calculado al vuelo. Se abre recién con la primera línea y, al confirmar,
+    se mueve a su ruta definitiva según el hash (si ya existía, se descarta).
+    """
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self.tamano = 0
+        self.lineas = 0
+        self._hash = hashlib.sha256()
+        self._tmp = None
+        self._gz = None
+
+    def escribir(self, linea):
+        if self._gz is None:
+            os.makedirs(self.raiz, exist_ok=True)
+            self._tmp = tempfile.NamedTemporaryFile(dir=self.raiz, prefix='.captura-', delete=False)
+            # mtime=0: mismo contenido -> mismos bytes comprimidos
+            self._gz = gzip.GzipFile(fileobj=self._tmp, mode='wb', compresslevel=NIVEL_COMPRESION, mtime=0)
+        # Las líneas se decodificaron en latin-1: el ida y vuelta es exacto
+        datos = linea.encode('latin-1') + b'\n'
+        self._hash.update(datos)
+        self._gz.write(datos)
+        self.tamano += len(datos)
+        self.lineas += 1
+
+    def confirmar(self):
+        """
+        Cierra la copia y la deja en .archivo/<aa>/<sha256>.dat.gz.
+        Devuelve {'firma', 'tamano', 'tamano_comprimido'}, o None si no hubo
+        líneas de datos (solo el encabezado).
+        """
+        if self._gz is None: return None
+        self._gz.close()
+        self._tmp.close()
+        temporal, self._gz, self._tmp = self._tmp.name, None, None
+        if self.lineas < 2:
+            os.unlink(temporal)
+            return None
+
+        firma = self._hash.hexdigest()
+        comprimido = os.path.getsize(temporal)
+        destino = ruta_crudo(firma, self.raiz)
+        if os.path.exists(destino):
+            os.unlink(temporal)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(temporal, destino)
+        return {'firma': firma, 'tamano': self.tamano, 'tamano_comprimido': comprimido}
+
+    def descartar(self):
+        if self._gz is None: return
+        try:
+            self._gz.close()
+            self._tmp.close()
+        finally:
+            os.unlink(self._tmp.name)
+            self._gz, self._tmp = None, None
@@ -0,0 +1,168 @@
+"""
+Carga histórica (backfill) en paralelo: un proceso por estación parsea sus
+.dat con el mismo camino que el importador (Lectura: MAPEO_CAMPOS, to_date,
+to_float) y manda lotes columnares compactos por una cola acotada a un único
+escritor, que es el proceso principal.
+"""
+import os
+import math
+import tarfile
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timezone as tz
+import django
+from django.db import connection
+from telemetria.models import DatosSensor
+from telemetria.ingesta.ftp import es_archivo_datos, leer_bloques
+from telemetria.ingesta.parser import CAMPOS_FECHA, obtener_codigo_estacion
+from telemetria.ingesta.pipeline import Tarea, Lectura
+from telemetria.ingesta import columnar
+
+TAMANO_LOTE = 10000
+
+# Cola hacia el escritor (la recibe cada proceso al iniciar)
+_cola = None
+
+
+# ==========================================
+#  ARCHIVOS DE ENTRADA
+# ==========================================
+
+def archivos_por_estacion(raiz):
+    """Recorre `raiz` (recursivo) y agrupa las rutas de los H_*.dat por código de estación."""
+    grupos = {}
+    for carpeta, _, nombres in os.walk(raiz):
+        for nombre in nombres:
+            if es_archivo_datos(nombre):
+                grupos.setdefault(obtener_codigo_estacion(nombre), []).append(os.path.join(carpeta, nombre))
+    for rutas in grupos.values():
+        rutas.sort(key=os.path.basename)
+    return grupos
+
+
+def extraer_tar(ruta, destino):
+    """Extrae solo los H_*.dat del tarball (por nombre base: ignora las rutas del tar)."""
+    with tarfile.open(ruta, 'r:*') as tar:
+        for miembro in tar:
+            nombre = os.path.basename(miembro.name)
+            if not miembro.isfile() or not es_archivo_datos(nombre): continue
+            origen = tar.extractfile(miembro)
+            with open(os.path.join(destino, nombre), 'wb') as f:
+                for bloque in leer_bloques(origen):
+                    f.write(bloque)
+
+
+# ==========================================
+#  LOTES COLUMNARES
+# ==========================================
+# Cada columna es un array de 8 bytes por valor: fechas como epoch (NaN = nulo),
+# números como float64 (NaN = nulo) y record_id como int64.
+
+def _epoch(valor):
+    return valor.timestamp() if valor is not None else math.nan
+
+
+def _fecha(valor):
+    return None if valor != valor else datetime.fromtimestamp(valor, tz=tz.utc)
+
+
+def empacar(registros, campos):
+    columnas = {
+        'timestamp': array('d', [_epoch(r.timestamp) for r in registros]),
+        'record_id': array('q', [r.record_id for r in registros]),
+    }
+    for campo in campos:
+        if campo == 'record_id': continue
+        if campo in CAMPOS_FECHA:
+            columnas[campo] = array('d', [_epoch(getattr(r, campo)) for r in registros])
+        else:
+            columnas[campo] = array('d', [math.nan if getattr(r, campo) is None else getattr(r, campo) for r in registros])
+    return columnas
+
+
+def desempacar(columnas, estacion_id):
+    """Lote columnar -> lista de DatosSensor (sin guardar)."""
+    nombres = list(columnas)
+    convertir = [
+        _fecha if c == 'timestamp' or c in CAMPOS_FECHA
+        else (lambda v: v) if c == 'record_id'
+        else (lambda v: None if v != v else v)
+        for c in nombres
+    ]
+    registros = []
+    for fila in zip(*columnas.values()):
+        valores = {c: conv(v) for c, conv, v in zip(nombres, convertir, fila)}
+        registros.append(DatosSensor(estacion_id=estacion_id, **valores))
+    return registros
+
+
+# ==========================================
+#  PROCESOS
+# ==========================================
+
+def iniciar_proceso(cola):
+    global _cola
+    _cola = cola
+    # Con 'spawn'/'forkserver' el proceso hijo arranca sin Django configurado
+    django.setup()
+
+
+def parsear_estacion(estacion, rutas, usar_columnar=columnar.DISPONIBLE, tamano_lote=TAMANO_LOTE):
+    """
+    Trabajo de un proceso: parsea todos los archivos de una estación y manda a
+    la cola ('lote', pk, campos, columnas), ('archivo', pk, nombre, filas) por
+    archivo, ('error', pk, nombre, mensaje) y al final ('fin', pk).
+    """
+    try:
+        for ruta in rutas:
+            nombre = os.path.basename(ruta)
+            lectura = Lectura(Tarea(nombre, estacion), leer_bloques(open(ruta, 'rb')), usar_columnar=usar_columnar)
+            filas = 0
+            try:
+                for lote in lectura.lotes(tamano_lote):
+                    _cola.put(('lote', estacion.pk, lectura.mapa.campos, empacar(lote, lectura.mapa.campos)))
+                    filas += len(lote)
+            except Exception as e:
+                _cola.put(('error', estacion.pk, nombre, str(e)))
+            finally:
+                lectura.cerrar()
+            _cola.put(('archivo', estacion.pk, nombre, filas))
+    finally:
+        _cola.put(('fin', estacion.pk))
+
+
+# ==========================================
+#  ÍNDICES
+# ==========================================
+
+def indices_secundarios(modelo=DatosSensor):
+    """{nombre: [columnas]} de los índices no únicos de la tabla del modelo."""
+    tabla = modelo._meta.db_table
+    with connection.cursor() as cursor:
+        restricciones = connection.introspection.get_constraints(cursor, tabla)
+    return {
+        nombre: datos['columns']
+        for nombre, datos in restricciones.items()
+        if datos['index'] and not datos['unique'] and not datos['primary_key'] and datos['columns']
+    }
+
+
+@contextmanager
+def sin_indices_secundarios(modelo=DatosSensor):
+    """
+    Borra los índices no únicos durante la carga y los recrea al salir (aunque
+    haya error). El índice único (estacion, timestamp, record_id) se mantiene:
+    lo necesita el upsert.
+    """
+    q = connection.ops.quote_name
+    tabla = modelo._meta.db_table
+    indices = indices_secundarios(modelo)
+    with connection.cursor() as cursor:
+        for nombre in indices:
+            cursor.execute(f"DROP INDEX {q(nombre)}")
+    try:
+        yield indices
+    finally:
+        with connection.cursor() as cursor:
+            for nombre, columnas in indices.items():
+                cursor.execute(f"CREATE INDEX {q(nombre)} ON {q(tabla)} ({', '.join(map(q, columnas))})")
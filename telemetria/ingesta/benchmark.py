@@ -0,0 +1,285 @@
+"""
+Benchmark de la ingesta de punta a punta: genera archivos H_*.dat sintéticos,
+los sirve con un FTP local (pyftpdlib, en el mismo proceso) y corre
+`importar_ftp` contra una BD de prueba desechable. Lo usa el comando
+benchmark_ingesta, que corre cada escenario en un proceso aparte para medir
+su pico de memoria y compara contra la línea base guardada.
+"""
+import os
+import io
+import json
+import random
+import logging
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from time import perf_counter
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import override_settings
+from telemetria.models import Proyecto, Estacion
+from telemetria.ingesta.parser import MAPEO_CAMPOS, CAMPOS_FECHA, mapear_columnas
+
+try:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler, ThrottledDTPHandler
+    from pyftpdlib.servers import FTPServer
+except ImportError:  # pyftpdlib solo hace falta para el benchmark
+    FTPServer = None
+
+DISPONIBLE = FTPServer is not None
+
+# Propia de cada máquina (no se versiona): la primera corrida la crea
+RUTA_BASE = os.path.join(os.path.dirname(__file__), 'benchmark_base.json')
+
+# Siempre presentes en el encabezado; el resto de MAPEO_CAMPOS depende de la variante
+ESENCIALES = ('record_id', 'bateria_voltaje', 'oxigeno_disuelto', 'temperatura_agua', 'ph')
+
+# Valor típico y paso de la caminata aleatoria de cada sensor
+RANGOS = {
+    'bateria_voltaje': (12.6, 0.01), 'ptemp_c': (24.0, 0.1),
+    'oxigeno_disuelto': (7.5, 0.05), 'oxigeno_max': (8.2, 0.05),
+    'porcentaje_oxigeno': (92.0, 0.5), 'presion_oxigeno': (150.0, 0.5),
+    'temperatura_agua': (18.0, 0.05), 'conductividad': (48000.0, 25.0),
+    'salinidad': (32.0, 0.02), 'salinidad_max': (32.5, 0.02),
+    'solidos_disueltos': (31000.0, 15.0), 'densidad': (1024.0, 0.05),
+    'ph': (8.0, 0.01), 'ph_max': (8.1, 0.01), 'orp': (180.0, 1.0),
+}
+
+
+class Escenario:
+    def __init__(self, nombre, estaciones, filas, nan=0.02, workers=1, variantes=4, ancho_banda=None):
+        self.nombre = nombre
+        self.estaciones = estaciones
+        self.filas = filas  # por estación
+        self.nan = nan      # fracción de celdas numéricas en NAN
+        self.workers = workers
+        self.variantes = variantes  # encabezados distintos repartidos entre las estaciones
+        self.ancho_banda = ancho_banda  # bytes/s por conexión del FTP (None = sin límite, como en local)
+
+
+ESCENARIOS = {e.nombre: e for e in (
+    Escenario('base', estaciones=10, filas=5000),
+    Escenario('pipeline', estaciones=10, filas=5000, workers=4),
+    Escenario('nan', estaciones=5, filas=10000, nan=0.5),
+    Escenario('grande', estaciones=2, filas=100000, variantes=1),
+    # FTP remoto (enlace lento por conexión): acá es donde descargar en paralelo rinde
+    Escenario('remoto', estaciones=10, filas=5000, ancho_banda=250_000),
+    Escenario('remoto_pipeline', estaciones=10, filas=5000, workers=4, ancho_banda=250_000),
+)}
+
+
+# ==========================================
+#  ARCHIVOS SINTÉTICOS
+# ==========================================
+
+def encabezado_sintetico(variante, rng):
+    """
+    [(campo, nombre de columna)] para una variante de encabezado: la 0 es la
+    completa con los primeros nombres de MAPEO_CAMPOS; las demás alternan
+    nombres y sufijos (_Avg), omiten columnas opcionales y cambian el orden.
+    Solo devuelve encabezados que mapear_columnas asigna bien.
+    """
+    for _ in range(100):
+        columnas = []
+        for campo, nombres in MAPEO_CAMPOS.items():
+            if variante and campo not in ESENCIALES and rng.random() < 0.3: continue
+            nombre = nombres[variante % len(nombres)]
+            if variante % 2 and campo != 'record_id' and campo not in CAMPOS_FECHA:
+                nombre += '_Avg'
+            columnas.append((campo, nombre))
+        if variante:
+            rng.shuffle(columnas)
+        columnas.insert(0, ('main_fecha', 'TIMESTAMP'))
+
+        mapeo = mapear_columnas([n for _, n in columnas])
+        if all(mapeo[c] == i for i, (c, _) in enumerate(columnas)):
+            return columnas
+    raise ValueError(f"No se pudo generar un encabezado válido para la variante {variante}")
+
+
+def generar_dat(ruta, columnas, filas, nan=0.0, inicio=datetime(2025, 1, 1), intervalo=timedelta(minutes=1), semilla=0):
+    """Escribe un .dat como los del datalogger: encabezado y `filas` registros con NAN en la fracción `nan`."""
+    rng = random.Random(semilla)
+    valores = {c: RANGOS[c][0] for c, _ in columnas if c in RANGOS}
+    with open(ruta, 'w', encoding='latin-1', newline='\n') as f:
+        f.write(','.join(f'"{n}"' for _, n in columnas) + '\n')
+        for i in range(filas):
+            fecha = inicio + intervalo * i
+            celdas = []
+            for campo, _ in columnas:
+                if campo == 'main_fecha':
+                    celdas.append(f'"{fecha:%Y-%m-%d %H:%M:%S}"')
+                elif campo == 'record_id':
+                    celdas.append(str(i))
+                elif campo in CAMPOS_FECHA:
+                    celdas.append(f'"{fecha - timedelta(seconds=rng.randrange(60)):%Y-%m-%d %H:%M:%S}"')
+                elif rng.random() < nan:
+                    celdas.append('NAN')
+                else:
+                    base, paso = RANGOS[campo]
+                    valores[campo] += rng.uniform(-paso, paso) + (base - valores[campo]) * 0.01
+                    celdas.append(f"{valores[campo]:.4g}")
+            f.write(','.join(celdas) + '\n')
+
+
+def generar_escenario(escenario, carpeta):
+    """Archivos del escenario en `carpeta`. Devuelve los códigos de estación."""
+    codigos = []
+    for n in range(escenario.estaciones):
+        codigo = str(90001 + n)
+        rng = random.Random(n)
+        columnas = encabezado_sintetico(n % escenario.variantes, rng)
+        generar_dat(os.path.join(carpeta, f"H_bench_FAO_{codigo}.dat"), columnas, escenario.filas, escenario.nan, semilla=n)
+        codigos.append(codigo)
+    return codigos
+
+
+# ==========================================
+#  FTP LOCAL
+# ==========================================
+
+class ServidorFTP:
+    """
+    pyftpdlib sirviendo `raiz` en 127.0.0.1 (puerto libre) desde un hilo,
+    mientras dure el `with`. Con `ancho_banda` (bytes/s) cada descarga se
+    limita a esa velocidad, como la de un FTP al otro lado de un enlace lento.
+    """
+
+    USUARIO = 'benchmark'
+    CLAVE = 'benchmark'
+
+    def __init__(self, raiz, ancho_banda=None):
+        self.raiz = raiz
+        self.ancho_banda = ancho_banda
+        self.servidor = None
+        self.puerto = None
+
+    def __enter__(self):
+        # serve_forever() configura su propio log si el logger no tiene handlers
+        registro = logging.getLogger('pyftpdlib')
+        if not registro.handlers:
+            registro.addHandler(logging.NullHandler())
+        registro.propagate = False
+        autorizador = DummyAuthorizer()
+        autorizador.add_user(self.USUARIO, self.CLAVE, self.raiz, perm='elr')
+        atributos = {'authorizer': autorizador}
+        if self.ancho_banda:
+            atributos['dtp_handler'] = type('Datos', (ThrottledDTPHandler,), {'write_limit': self.ancho_banda})
+        manejador = type('Manejador', (FTPHandler,), atributos)
+        self.servidor = FTPServer(('127.0.0.1', 0), manejador)
+        self.puerto = self.servidor.address[1]
+        threading.Thread(target=self.servidor.serve_forever, kwargs={'timeout': 0.2}, name='ftp-benchmark', daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.close_all()
+
+
+# ==========================================
+#  EJECUCIÓN
+# ==========================================
+
+def ejecutar_escenario(escenario):
+    """
+    Corre un escenario en este proceso sobre una BD de prueba nueva (la de
+    `settings` no se toca) y devuelve sus resultados. El tiempo medido es el
+    de `importar_ftp` completo; la generación de archivos queda afuera.
+    """
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as tmp:
+        carpeta_ftp = os.path.join(tmp, 'ftp')
+        os.makedirs(carpeta_ftp)
+        codigos = generar_escenario(escenario, carpeta_ftp)
+        if connection.vendor == 'sqlite':
+            # En archivo y no en memoria, para medir escrituras reales. También
+            # NAME: una conexión abierta fuera de create/destroy_test_db no debe
+            # crear un db.sqlite3 vacío en el proyecto (al borrarse tmp, falla).
+            connection.close()
+            ruta = os.path.join(tmp, 'db.sqlite3')
+            connection.settings_dict['NAME'] = ruta
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = ruta
+
+        nombre_original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(RUTA_DATOS_TELEMETRIA=os.path.join(tmp, 'datos')):
+                proyecto = Proyecto.objects.create(nombre='Benchmark', fecha_inicio='2025-01-01')
+                # bulk_create: sin Estacion.save, que crea carpetas e imprime
+                Estacion.objects.bulk_create(
+                    Estacion(proyecto=proyecto, nombre=f"Bench {c}", codigo_identificador=c) for c in codigos
+                )
+                informe = os.path.join(tmp, 'informe.json')
+                with ServidorFTP(carpeta_ftp, escenario.ancho_banda) as servidor:
+                    os.environ.update({
+                        'FTP_HOST': '127.0.0.1', 'FTP_PORT': str(servidor.puerto),
+                        'FTP_USER': servidor.USUARIO, 'FTP_PASS': servidor.CLAVE, 'FTP_REMOTE_DIR': '/',
+                    })
+                    salida = io.StringIO()
+                    inicio = perf_counter()
+                    with redirect_stdout(salida):
+                        call_command('importar_ftp', workers=escenario.workers, informe=informe)
+                    duracion = perf_counter() - inicio
+
+                if not os.path.exists(informe):
+                    raise RuntimeError(f"importar_ftp no terminó:\n{salida.getvalue()[-2000:]}")
+                with open(informe, encoding='utf-8') as f:
+                    totales = json.load(f)['totales']
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    esperadas = escenario.estaciones * escenario.filas
+    if totales['filas_escritas'] != esperadas or totales['con_error']:
+        raise RuntimeError(f"Se escribieron {totales['filas_escritas']} de {esperadas} filas ({totales['con_error']} archivos con error)")
+    return {
+        'escenario': escenario.nombre,
+        'filas': esperadas,
+        'bytes': totales['bytes'],
+        'segundos': round(duracion, 3),
+        'filas_por_segundo': round(esperadas / duracion),
+        'descarga_s': totales['segundos']['descarga'],
+        'parseo_s': totales['segundos']['parseo'],
+        'escritura_s': totales['segundos']['escritura'],
+    }
+
+
+# ==========================================
+#  LÍNEA BASE
+# ==========================================
+
+# Métrica -> True si más alto es mejor
+COMPARADAS = {
+    'filas_por_segundo': True,
+    'escritura_s': False,
+    'memoria_pico_mb': False,
+}
+
+
+def cargar_base(ruta=RUTA_BASE):
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_base(resultados, ruta=RUTA_BASE):
+    """Agrega (o reemplaza) en la base los escenarios de `resultados`."""
+    base = cargar_base(ruta)
+    for r in resultados:
+        base[r['escenario']] = {m: r[m] for m in COMPARADAS}
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(base, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def regresiones(resultado, base, tolerancia):
+    """Mensajes por cada métrica que empeoró más que `tolerancia` (fracción) respecto de la base."""
+    mensajes = []
+    referencia = base.get(resultado['escenario'])
+    if not referencia: return mensajes
+    for metrica, mayor_es_mejor in COMPARADAS.items():
+        antes, ahora = referencia.get(metrica), resultado.get(metrica)
+        if not antes or ahora is None: continue
+        cambio = (ahora - antes) / antes
+        if (-cambio if mayor_es_mejor else cambio) > tolerancia:
+            mensajes.append(f"{metrica}: {ahora} vs base {antes} ({cambio:+.0%})")
+    return mensajes
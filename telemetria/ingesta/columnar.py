@@ -0,0 +1,162 @@
+"""
+Parseo columnar (NumPy) de bloques de líneas .dat.
+
+En vez de csv.reader + strptime + float() por celda, cada bloque se lee de una
+sola pasada a una matriz de texto y cada columna se convierte completa:
+fechas con datetime64 (formato fijo %Y-%m-%d %H:%M:%S), números con astype,
+y las celdas NAN/vacías quedan como máscara (None). El resultado es el mismo
+que el de parser.iterar_registros, que sigue siendo el respaldo cuando NumPy no
+está instalado o un bloque trae algo que este camino no reconoce.
+"""
+from itertools import islice
+from collections import Counter
+from django.utils.timezone import get_current_timezone
+from telemetria.models import DatosSensor
+from telemetria.ingesta.parser import CAMPOS_FECHA, to_float, to_date, iterar_registros
+from telemetria.ingesta.metricas import FECHA_INVALIDA, LINEA_INVALIDA, YA_IMPORTADA
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usa el parseo por filas
+    np = None
+
+DISPONIBLE = np is not None
+
+# Líneas por bloque vectorizado (acota la memoria igual que TAMANO_LOTE)
+TAMANO_BLOQUE = 5000
+
+NULOS_FECHA = ['nan', 'NAN', '0', '']
+
+
+def _columna_fecha(col):
+    """Columna de texto -> lista de datetimes aware (None donde no hay fecha)."""
+    col = np.char.strip(col)
+    nulo = np.isin(col, NULOS_FECHA)
+    resultado = np.full(len(col), None, dtype=object)
+
+    # Solo el formato exacto 'YYYY-MM-DD HH:MM:SS' va por datetime64; lo demás
+    # (p. ej. '2025-1-1 0:0:0', que strptime sí acepta) cae a to_date celda a celda.
+    fijo = ~nulo & (np.char.str_len(col) == 19)
+    if fijo.any():
+        cod = col[fijo].astype('<U19').view(np.uint32).reshape(-1, 19)
+        fijo[fijo] = (
+            (cod[:, 4] == ord('-')) & (cod[:, 7] == ord('-')) & (cod[:, 10] == ord(' '))
+            & (cod[:, 13] == ord(':')) & (cod[:, 16] == ord(':'))
+        )
+    if fijo.any():
+        try:
+            fechas = col[fijo].astype('datetime64[s]').astype(object)
+        except ValueError:
+            fijo[:] = False
+        else:
+            # Igual que make_aware(): con zoneinfo solo asigna la zona
+            tz = get_current_timezone()
+            resultado[fijo] = [f.replace(tzinfo=tz) for f in fechas]
+
+    otros = ~nulo & ~fijo
+    if otros.any():
+        resultado[otros] = [to_date(v) for v in col[otros]]
+    return resultado
+
+
+def _columna_float(col):
+    """Columna de texto -> array float64 con NaN donde la celda es NAN/vacía/inválida."""
+    vacio = np.char.str_len(np.char.strip(col)) == 0
+    try:
+        return np.where(vacio, 'nan', col).astype(np.float64)
+    except ValueError:
+        return np.array([to_float(v) if v else None for v in col], dtype=np.float64)
+
+
+def _a_lista(valores):
+    """float64 con NaN -> lista de floats con None (máscara de nulos)."""
+    mascara = np.isnan(valores)
+    if not mascara.any():
+        return valores.tolist()
+    resultado = valores.astype(object)
+    resultado[mascara] = None
+    return resultado.tolist()
+
+
+def parsear_bloque(lineas, mapa, desde=None, rechazos=None):
+    """
+    Convierte un bloque de líneas de datos (ya filtradas) en columnas.
+    Devuelve (timestamps, {campo: lista de valores}) con solo las filas cuya
+    fecha principal es válida (y >= `desde`, si se indica); las demás se
+    cuentan en `rechazos`. Lanza ValueError si el bloque no es rectangular.
+    """
+    matriz = np.loadtxt(lineas, delimiter=',', quotechar='"', dtype=str, ndmin=2, comments=None)
+    n_filas, n_cols = matriz.shape
+    if mapa.indice_fecha >= n_cols:
+        raise ValueError("bloque sin columna de fecha")
+
+    timestamps = _columna_fecha(matriz[:, mapa.indice_fecha])
+    validas = timestamps != None  # noqa: E711 (comparación elemento a elemento)
+    con_fecha = int(validas.sum())
+    if desde is not None:
+        validas &= np.array([t is not None and t >= desde for t in timestamps], dtype=bool)
+    if rechazos is not None:
+        if con_fecha < n_filas: rechazos[FECHA_INVALIDA] += n_filas - con_fecha
+        if con_fecha > validas.sum(): rechazos[YA_IMPORTADA] += con_fecha - int(validas.sum())
+
+    columnas = {}
+    for campo, (idx, conv) in zip(mapa.campos, mapa.pares):
+        if idx >= n_cols:
+            columnas[campo] = [conv('')] * int(validas.sum())
+            continue
+        col = matriz[validas, idx]
+        if campo in CAMPOS_FECHA:
+            columnas[campo] = _columna_fecha(col).tolist()
+        elif campo == 'record_id':
+            valores = _columna_float(col)
+            if np.isinf(valores).any():
+                raise ValueError("record_id infinito")
+            columnas[campo] = np.nan_to_num(valores, nan=0.0).astype(np.int64).tolist()
+        else:
+            columnas[campo] = _a_lista(_columna_float(col))
+
+    return timestamps[validas].tolist(), columnas
+
+
+def _lineas_datos(lineas, rechazos):
+    for linea in lineas:
+        linea = linea.strip()
+        if linea.startswith('"20'):
+            yield linea
+        elif linea and not linea.startswith('"'):
+            rechazos[LINEA_INVALIDA] += 1
+
+
+def iterar_registros_columnar(lineas, mapa, estacion, tamano_bloque=TAMANO_BLOQUE, marca=None, rechazos=None):
+    """
+    Igual que parser.iterar_registros pero vectorizado por bloques. Si un bloque
+    no se puede leer como matriz (filas de distinto largo, etc.) ese bloque se
+    procesa con el parseo por filas.
+    """
+    desde = marca[0] if marca is not None else None
+    if rechazos is None:
+        rechazos = Counter()
+    datos = _lineas_datos(lineas, rechazos)
+
+    while True:
+        bloque = list(islice(datos, tamano_bloque))
+        if not bloque: return
+
+        try:
+            # Conteo aparte: si el bloque cae al parseo por filas, ese cuenta sus propios rechazos
+            parciales = Counter()
+            timestamps, columnas = parsear_bloque(bloque, mapa, desde, parciales)
+        except (ValueError, IndexError):
+            yield from iterar_registros(bloque, mapa, estacion, marca, rechazos)
+            continue
+        rechazos.update(parciales)
+
+        campos = tuple(columnas)
+        filas = zip(*columnas.values()) if campos else (() for _ in timestamps)
+        for ts, fila in zip(timestamps, filas):
+            valores = dict(zip(campos, fila))
+            valores.setdefault('record_id', 0)
+            if marca is not None and ts == desde and valores['record_id'] <= marca[1]:
+                rechazos[YA_IMPORTADA] += 1
+                continue
+            yield DatosSensor(estacion=estacion, timestamp=ts, **valores)
@@ -0,0 +1,98 @@
+import csv
+import hashlib
+import threading
+from telemetria.models import VersionEncabezado, Notificacion
+from telemetria.ingesta.parser import MAPEO_CAMPOS, CAMPOS_FECHA, to_float, to_date, mapear_columnas
+
+
+def a_record(valor):
+    return int(to_float(valor) or 0)
+
+
+def conversor(campo):
+    if campo == 'record_id': return a_record
+    if campo in CAMPOS_FECHA: return to_date
+    return to_float
+
+
+def firma_encabezado(encabezado_linea):
+    return hashlib.sha1(encabezado_linea.strip().encode('latin-1', 'replace')).hexdigest()
+
+
+class MapaColumnas:
+    """
+    Mapeo de un encabezado ya compilado: `pares` es una tupla plana de
+    (índice de columna, conversor) alineada con `campos`, para que el bucle de
+    filas la aplique directamente sin volver a consultar MAPEO_CAMPOS.
+    """
+
+    def __init__(self, firma, encabezado, columnas, version=None):
+        self.firma = firma
+        self.encabezado = encabezado
+        self.columnas = columnas
+        self.version = version  # None = aún no registrado en la BD
+        self.indice_fecha = columnas.get('main_fecha') or 0
+
+        usados = [c for c in MAPEO_CAMPOS if columnas.get(c) is not None]
+        self.campos = tuple(usados)
+        self.pares = tuple((columnas[c], conversor(c)) for c in usados)
+
+
+class RegistroColumnas:
+    """
+    Caché de MapaColumnas por (estación, firma del encabezado), respaldada por
+    VersionEncabezado. El mapeo se infiere una sola vez por encabezado distinto;
+    luego se reutiliza el guardado en la BD.
+    """
+
+    def __init__(self):
+        self._mapas = {}
+        self._lock = threading.Lock()
+
+    def precargar(self):
+        for v in VersionEncabezado.objects.all():
+            self._mapas[(v.estacion_id, v.firma)] = MapaColumnas(v.firma, v.encabezado, v.columnas, v.version)
+
+    def obtener(self, estacion, encabezado_linea):
+        """Devuelve el mapa para el encabezado (sin tocar la BD: se puede llamar desde el hilo parser)."""
+        firma = firma_encabezado(encabezado_linea)
+        clave = (estacion.pk, firma)
+        mapa = self._mapas.get(clave)
+        if mapa is None:
+            with self._lock:
+                mapa = self._mapas.get(clave)
+                if mapa is None:
+                    columnas = mapear_columnas(next(csv.reader([encabezado_linea])))
+                    mapa = MapaColumnas(firma, encabezado_linea.strip(), columnas)
+                    self._mapas[clave] = mapa
+        return mapa
+
+    def registrar(self, estacion, mapa):
+        """
+        Persiste un mapa nuevo como la siguiente versión de encabezado de la estación
+        (llamar desde el escritor, dentro de su transacción). Si la estación ya tenía
+        otra versión, es un cambio de programa del datalogger: se avisa.
+        """
+        if mapa.version is not None: return
+        existente = VersionEncabezado.objects.filter(estacion=estacion, firma=mapa.firma).first()
+        if existente:
+            mapa.version = existente.version
+            return
+
+        anterior = estacion.version_encabezado
+        nueva = VersionEncabezado.objects.create(
+            estacion=estacion,
+            version=anterior.version + 1 if anterior else 1,
+            firma=mapa.firma,
+            encabezado=mapa.encabezado,
+            columnas=mapa.columnas,
+        )
+        mapa.version = nueva.version
+
+        if anterior:
+            mensaje = f"Cambió el encabezado del datalogger: v{anterior.version} → v{nueva.version}. Revise el mapeo de columnas."
+            print(f"   [⚠] {estacion.nombre}: {mensaje}")
+            Notificacion.objects.create(estacion=estacion, tipo='warning', mensaje=mensaje)
+
+
+REGISTRO = RegistroColumnas()
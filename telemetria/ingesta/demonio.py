@@ -0,0 +1,167 @@
+import time
+import calendar
+import threading
+from telemetria.ingesta.parser import obtener_codigo_estacion
+
+# Segundos entre sondeos de una estación sin intervalo_envio configurado ni estimado
+INTERVALO_DEFECTO = 60
+# Nunca se sondea una estación más seguido que esto...
+ESPERA_MINIMA = 15
+# ...ni se la deja de mirar por más de esto, por mucho que venga vacía
+ESPERA_MAXIMA = 3600
+# Cada cuánto se recargan las estaciones (altas/bajas y cambios de intervalo_envio)
+RECARGA_ESTACIONES = 300
+
+
+def mtime_a_segundos(mtime):
+    """'YYYYMMDDHHMMSS' (UTC, como MDTM/MLSD) -> epoch, o None si no se puede leer."""
+    try:
+        return calendar.timegm(time.strptime(mtime[:14], '%Y%m%d%H%M%S'))
+    except (TypeError, ValueError):
+        return None
+
+
+class Agenda:
+    """
+    Estado de sondeo de una estación: cuándo toca mirarla y cada cuánto sube
+    archivos su datalogger (configurado en la estación o estimado a partir de
+    los cambios de mtime observados).
+    """
+
+    def __init__(self, codigo, intervalo=None, intervalo_defecto=INTERVALO_DEFECTO):
+        self.codigo = codigo
+        self.configurado = intervalo
+        self.estimado = None
+        self.intervalo_defecto = intervalo_defecto
+        self.ultimo_mtime = None
+        self.vacios = 0
+        self.proxima = 0.0
+
+    @property
+    def intervalo(self):
+        return self.configurado or self.estimado or self.intervalo_defecto
+
+    def observar_mtime(self, mtime):
+        """Actualiza la estimación del intervalo con el mtime más reciente de sus archivos."""
+        if mtime is None: return
+        if self.ultimo_mtime is not None and mtime > self.ultimo_mtime:
+            observado = min(max(mtime - self.ultimo_mtime, ESPERA_MINIMA), ESPERA_MAXIMA)
+            self.estimado = observado if self.estimado is None else (self.estimado + observado) / 2
+        if self.ultimo_mtime is None or mtime > self.ultimo_mtime:
+            self.ultimo_mtime = mtime
+
+    def registrar(self, guardados, ahora):
+        """Agenda el próximo sondeo según si esta vez llegaron datos o no."""
+        if guardados:
+            self.vacios = 0
+            # Alineado con la próxima subida esperada (+10% de margen), sin
+            # confiar a ciegas en el reloj del servidor FTP.
+            espera = self.intervalo
+            if self.ultimo_mtime is not None:
+                espera = self.ultimo_mtime + self.intervalo * 1.1 - ahora
+            espera = min(max(espera, ESPERA_MINIMA), self.intervalo)
+        else:
+            # Nada nuevo: el datalogger está atrasado o caído; espaciamos los
+            # reintentos exponencialmente a partir de un cuarto del intervalo.
+            self.vacios += 1
+            espera = max(self.intervalo / 4, ESPERA_MINIMA) * 2 ** (self.vacios - 1)
+            espera = min(espera, ESPERA_MAXIMA)
+        self.proxima = ahora + espera
+        return espera
+
+
+class Planificador:
+    """Agenda de todas las estaciones conocidas: qué códigos toca sondear y cuándo despertar."""
+
+    def __init__(self, intervalo_defecto=INTERVALO_DEFECTO):
+        self.intervalo_defecto = intervalo_defecto
+        self.agendas = {}
+
+    def sincronizar(self, estaciones):
+        """Alta/baja de agendas según las estaciones de la BD, conservando su estado."""
+        actuales = {}
+        for estacion in estaciones:
+            codigo = str(estacion.codigo_identificador).strip()
+            intervalo = estacion.intervalo_envio * 60 if estacion.intervalo_envio else None
+            agenda = self.agendas.get(codigo) or Agenda(codigo, intervalo_defecto=self.intervalo_defecto)
+            agenda.configurado = intervalo
+            actuales[codigo] = agenda
+        self.agendas = actuales
+
+    def vencidas(self, ahora):
+        return {codigo for codigo, agenda in self.agendas.items() if agenda.proxima <= ahora}
+
+    def proxima(self):
+        return min((a.proxima for a in self.agendas.values()), default=None)
+
+    def registrar(self, codigo, guardados, mtime, ahora):
+        agenda = self.agendas.get(codigo)
+        if agenda is None: return None
+        agenda.observar_mtime(mtime)
+        return agenda.registrar(guardados, ahora)
+
+
+class Demonio:
+    """
+    Importación residente: mantiene abierta la fuente (la conexión FTP se
+    reutiliza entre ciclos), en cada ciclo lista e importa solo los archivos de
+    las estaciones vencidas y duerme hasta la próxima. `detener()` (SIGTERM)
+    se respeta entre archivos, así que nunca queda un archivo a medio escribir.
+    """
+
+    def __init__(self, fuente, importador, planificador=None):
+        self.fuente = fuente
+        self.importador = importador
+        self.planificador = planificador or Planificador()
+        self.detenido = threading.Event()
+        self._ultima_carga = None
+
+    def detener(self, *args):
+        self.detenido.set()
+
+    def recargar(self):
+        self.importador.preparar()
+        self.planificador.sincronizar(self.importador.estaciones.todas())
+        self._ultima_carga = time.monotonic()
+
+    def ciclo(self, vencidas):
+        """Lista e importa los archivos de las estaciones `vencidas` y las vuelve a agendar."""
+        try:
+            self.fuente.mantener()
+            archivos = self.fuente.listar_archivos(lambda n: obtener_codigo_estacion(n) in vencidas)
+        except Exception as e:
+            print(f"❌ No se pudo listar la fuente: {e}")
+            archivos = None
+
+        mtimes = {}
+        if archivos:
+            for nombre, (_, mtime) in archivos.items():
+                codigo, segundos = obtener_codigo_estacion(nombre), mtime_a_segundos(mtime)
+                if segundos is not None and segundos > mtimes.get(codigo, 0):
+                    mtimes[codigo] = segundos
+            self.importador.importar(self.fuente, archivos, detener=self.detenido.is_set)
+            self.importador.informar_desconocidos()
+
+        ahora = time.time()
+        for codigo in vencidas:
+            guardados = self.importador.por_estacion.get(codigo, 0) if archivos else 0
+            espera = self.planificador.registrar(codigo, guardados, mtimes.get(codigo), ahora)
+            if not guardados and espera is not None:
+                print(f"   [⏳] {codigo}: sin datos nuevos, próximo sondeo en {espera:.0f}s.")
+
+    def ejecutar(self):
+        self.recargar()
+        while not self.detenido.is_set():
+            if time.monotonic() - self._ultima_carga > RECARGA_ESTACIONES:
+                self.recargar()
+
+            vencidas = self.planificador.vencidas(time.time())
+            if vencidas:
+                self.ciclo(vencidas)
+                continue
+
+            proxima = self.planificador.proxima()
+            espera = RECARGA_ESTACIONES if proxima is None else proxima - time.time()
+            self.detenido.wait(min(max(espera, 0.5), RECARGA_ESTACIONES))
+
+        self.fuente.cerrar()
@@ -0,0 +1,117 @@
+import time
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from telemetria.models import Estacion, ArchivoImportado, ArchivoCrudo
+from telemetria.ingesta.columnas import REGISTRO
+from telemetria.ingesta.escritores import VALORES, calcular_hashes, obtener_escritor
+from telemetria.resumenes import horas_de, actualizar_resumenes
+from telemetria import vivo
+
+
+# Un reloj de datalogger adelantado no debe dejar la marca de agua en el futuro
+# (bloquearía todo lo que llegue después con la hora correcta).
+TOLERANCIA_FUTURO = timedelta(days=1)
+
+
+def guardar_registros(registros, campos=None, escritor=None):
+    """
+    Upsert de un lote de DatosSensor por (estacion, timestamp, record_id) que
+    actualiza todos los `campos` mapeados (por defecto, todos los de valor) pero
+    solo escribe las filas nuevas o con valores distintos. `escritor` por defecto
+    es el del motor de la BD (ver ingesta.escritores). Devuelve cuántas escribió.
+    """
+    campos = tuple(c for c in (campos or VALORES) if c in VALORES)
+    calcular_hashes(registros, campos)
+    return (escritor or obtener_escritor()).guardar(registros, campos)
+
+
+def ultima_marca(registros, limite, marca=None):
+    """Mayor (timestamp, record_id) entre `marca` y los registros no posteriores a `limite`."""
+    ultimo = max(((r.timestamp, r.record_id) for r in registros if r.timestamp <= limite), default=None)
+    if ultimo is not None and (marca is None or ultimo > marca):
+        return ultimo
+    return marca
+
+
+def avanzar_marca(estacion, marca):
+    """Sube la marca de agua de la estación si `marca` es posterior (sin pasar por Estacion.save)."""
+    if marca is None or (estacion.marca_agua is not None and marca <= estacion.marca_agua):
+        return
+    estacion.ultimo_timestamp, estacion.ultimo_record_id = marca
+    Estacion.objects.filter(pk=estacion.pk).update(ultimo_timestamp=marca[0], ultimo_record_id=marca[1])
+
+
+def registrar_cambios(estacion):
+    """
+    Sube la generación de datos de la estación (invalida los ETag de la API de
+    lecturas) y, al confirmarse la transacción, avisa a los dashboards en vivo.
+    """
+    Estacion.objects.filter(pk=estacion.pk).update(
+        generacion_datos=F('generacion_datos') + 1, datos_modificados=timezone.now()
+    )
+    transaction.on_commit(lambda: vivo.notificar(estacion.pk))
+
+
+def guardar_lectura(lectura):
+    """
+    Guarda los lotes de una Lectura a medida que llegan, dentro de una única
+    transacción por archivo, y avanza su manifiesto y la marca de agua de la
+    estación al final, y recalcula los resúmenes de las horas en que escribió.
+    Devuelve (registros leídos, registros escritos): los que ya estaban
+    guardados con los mismos valores no se reescriben. Anota en la
+    métrica de la tarea el tiempo de escritura y el desfase de la estación.
+    """
+    estacion, metrica = lectura.tarea.estacion, lectura.tarea.metrica
+    metrica.ultimo_guardado = estacion.ultimo_timestamp
+    leidos = escritos = 0
+    marca = ultimo = None
+    horas = set()
+    limite = timezone.now() + TOLERANCIA_FUTURO
+    with transaction.atomic():
+        for registros in lectura.lotes():
+            inicio = time.perf_counter()
+            nuevos = guardar_registros(registros, lectura.mapa.campos)
+            if nuevos:
+                horas |= horas_de(registros)
+            escritos += nuevos
+            metrica.segundos['escritura'] += time.perf_counter() - inicio
+            leidos += len(registros)
+            marca = ultima_marca(registros, limite, marca)
+            nuevo = max(r.timestamp for r in registros)
+            ultimo = nuevo if ultimo is None or nuevo > ultimo else ultimo
+
+        inicio = time.perf_counter()
+        if escritos:
+            actualizar_resumenes(estacion, horas)
+            registrar_cambios(estacion)
+        avanzar_marca(estacion, marca)
+        if lectura.crudo is not None:
+            ArchivoCrudo.objects.get_or_create(
+                firma=lectura.crudo['firma'],
+                defaults={
+                    'nombre': lectura.tarea.nombre,
+                    'estacion': estacion,
+                    'inicio': lectura.crudo['inicio'],
+                    'tamano': lectura.crudo['tamano'],
+                    'tamano_comprimido': lectura.crudo['tamano_comprimido'],
+                }
+            )
+        if lectura.mapa is not None:
+            REGISTRO.registrar(estacion, lectura.mapa)
+        ArchivoImportado.objects.update_or_create(
+            nombre=lectura.tarea.nombre,
+            defaults={
+                'tamano': lectura.tamano,
+                'mtime': lectura.tarea.mtime or '',
+                'offset': lectura.offset,
+                'encabezado': lectura.encabezado or '',
+            }
+        )
+    # Incluye el COMMIT
+    metrica.segundos['escritura'] += time.perf_counter() - inicio
+    metrica.leidos, metrica.escritos = leidos, escritos
+    metrica.ultimo_archivo = ultimo
+    metrica.ultimo_en_bd = estacion.ultimo_timestamp
+    return leidos, escritos
@@ -0,0 +1,202 @@
+"""
+Escritores de lotes de DatosSensor para el importador.
+
+Todos hacen el mismo upsert por (estacion, timestamp, record_id): actualizan
+los campos mapeados y solo tocan las filas cuyo hash_contenido cambió.
+Cambia cómo llegan las filas a la BD:
+
+- EscritorPostgres: COPY a una tabla de staging temporal (sin WAL) y un único
+  INSERT ... SELECT ... ON CONFLICT por lote.
+- EscritorSQLite: un INSERT ... ON CONFLICT preparado, ejecutado con executemany.
+- EscritorORM: bulk_create, para cualquier otro motor.
+
+obtener_escritor() elige según el motor de la conexión (o settings.ESCRITOR_TELEMETRIA).
+"""
+import io
+import csv
+import hashlib
+from datetime import datetime
+from django.conf import settings
+from django.db import connection as conexion_defecto
+from telemetria.models import DatosSensor
+
+# Campos de valor (todo lo que no es la clave única ni el propio hash)
+VALORES = tuple(
+    f.name for f in DatosSensor._meta.concrete_fields
+    if f.name not in ('id', 'estacion', 'timestamp', 'record_id', 'hash_contenido')
+)
+CLAVE = ('estacion', 'timestamp', 'record_id')
+
+
+def _valor_hash(valor):
+    if valor is None: return ''
+    if isinstance(valor, datetime): return repr(valor.timestamp())
+    return repr(valor)
+
+
+def calcular_hashes(registros, campos):
+    """Asigna a cada registro el hash (int64) de sus valores en `campos`, incluyendo qué campos son."""
+    base = hashlib.blake2b('|'.join(campos).encode(), digest_size=8)
+    for r in registros:
+        h = base.copy()
+        h.update('|'.join([_valor_hash(getattr(r, c)) for c in campos]).encode())
+        r.hash_contenido = int.from_bytes(h.digest(), 'big', signed=True)
+
+
+def solo_cambios(registros):
+    """
+    Descarta los registros que ya están guardados con el mismo hash. Una sola
+    consulta por estación sobre el rango de timestamps del lote (índice único).
+    """
+    por_estacion = {}
+    for r in registros:
+        por_estacion.setdefault(r.estacion_id, []).append(r)
+
+    nuevos = []
+    for estacion_id, grupo in por_estacion.items():
+        guardados = dict(
+            ((ts, rid), h) for ts, rid, h in DatosSensor.objects.filter(
+                estacion_id=estacion_id,
+                timestamp__range=(min(r.timestamp for r in grupo), max(r.timestamp for r in grupo)),
+            ).values_list('timestamp', 'record_id', 'hash_contenido').order_by()
+        )
+        nuevos += [r for r in grupo if guardados.get((r.timestamp, r.record_id)) != r.hash_contenido]
+    return nuevos
+
+
+class EscritorORM:
+    """bulk_create con update_conflicts, precedido de una consulta de hashes para saltar lo que no cambió."""
+
+    def guardar(self, registros, campos):
+        registros = solo_cambios(registros)
+        if registros:
+            DatosSensor.objects.bulk_create(
+                registros,
+                update_conflicts=True,
+                unique_fields=list(CLAVE),
+                update_fields=list(campos) + ['hash_contenido']
+            )
+        return len(registros)
+
+
+class EscritorSQL:
+    """Base de los escritores que arman su propio SQL sobre la tabla de DatosSensor."""
+
+    # Cómo expresa cada motor "distinto, considerando NULL"
+    DISTINTO = 'IS DISTINCT FROM'
+
+    def __init__(self, conexion=None):
+        self.conexion = conexion or conexion_defecto
+        self.tabla = DatosSensor._meta.db_table
+
+    def q(self, nombre):
+        return self.conexion.ops.quote_name(nombre)
+
+    def campos_sql(self, campos):
+        return [DatosSensor._meta.get_field(c) for c in CLAVE + tuple(campos) + ('hash_contenido',)]
+
+    def filas(self, registros, campos_sql):
+        """Valores ya adaptados al motor, igual que los prepararía el ORM."""
+        preparar = [
+            (f.attname, (lambda v, f=f: f.get_db_prep_value(v, self.conexion)) if f.get_internal_type() == 'DateTimeField' else None)
+            for f in campos_sql
+        ]
+        return [
+            tuple(p(getattr(r, a)) if p else getattr(r, a) for a, p in preparar)
+            for r in registros
+        ]
+
+    def upsert_sql(self, columnas, campos):
+        actualizar = ', '.join(f"{self.q(c)} = excluded.{self.q(c)}" for c in columnas[len(CLAVE):])
+        clave = ', '.join(self.q(DatosSensor._meta.get_field(c).column) for c in CLAVE)
+        hash_col = self.q('hash_contenido')
+        return (
+            f"ON CONFLICT ({clave}) DO UPDATE SET {actualizar} "
+            f"WHERE {self.q(self.tabla)}.{hash_col} {self.DISTINTO} excluded.{hash_col}"
+        )
+
+
+class EscritorSQLite(EscritorSQL):
+    """Un INSERT ... ON CONFLICT preparado una vez y ejecutado con executemany (dentro de la transacción del archivo)."""
+
+    DISTINTO = 'IS NOT'
+
+    def guardar(self, registros, campos):
+        if not registros: return 0
+        campos_sql = self.campos_sql(campos)
+        columnas = [f.column for f in campos_sql]
+        sql = (
+            f"INSERT INTO {self.q(self.tabla)} ({', '.join(map(self.q, columnas))}) "
+            f"VALUES ({', '.join(['%s'] * len(columnas))}) "
+            + self.upsert_sql(columnas, campos)
+        )
+        with self.conexion.cursor() as cursor:
+            cursor.executemany(sql, self.filas(registros, campos_sql))
+            # En SQLite cuenta inserciones + actualizaciones (las saltadas por el WHERE no)
+            return max(cursor.rowcount, 0)
+
+
+class EscritorPostgres(EscritorSQL):
+    """
+    COPY del lote a una tabla temporal de staging y un INSERT ... SELECT con
+    ON CONFLICT. Las tablas temporales no escriben WAL y son privadas de la
+    sesión, así que varios importadores pueden usar el mismo nombre a la vez.
+    """
+
+    STAGING = 'telemetria_datossensor_staging'
+
+    def crear_staging(self, cursor):
+        campos = self.campos_sql(VALORES)
+        columnas = ', '.join(f"{self.q(f.column)} {f.db_type(self.conexion)}" for f in campos)
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {self.q(self.STAGING)} (orden integer, {columnas}) ON COMMIT DELETE ROWS"
+        )
+
+    def copiar(self, cursor, columnas, filas):
+        buffer = io.StringIO()
+        # En COPY ... CSV un campo vacío sin comillas es NULL, que es lo que csv escribe para None
+        csv.writer(buffer).writerows((i, *fila) for i, fila in enumerate(filas))
+        buffer.seek(0)
+        sql = f"COPY {self.q(self.STAGING)} (orden, {', '.join(map(self.q, columnas))}) FROM STDIN WITH (FORMAT csv)"
+        crudo = cursor.cursor
+        if hasattr(crudo, 'copy_expert'):  # psycopg2
+            crudo.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with crudo.copy(sql) as copia:
+                copia.write(buffer.getvalue())
+
+    def guardar(self, registros, campos):
+        if not registros: return 0
+        campos_sql = self.campos_sql(campos)
+        columnas = [f.column for f in campos_sql]
+        lista = ', '.join(map(self.q, columnas))
+        clave = ', '.join(self.q(DatosSensor._meta.get_field(c).column) for c in CLAVE)
+
+        with self.conexion.cursor() as cursor:
+            self.crear_staging(cursor)
+            self.copiar(cursor, columnas, self.filas(registros, campos_sql))
+            # DISTINCT ON: si el lote repite una clave gana la última fila, como en executemany
+            cursor.execute(
+                f"INSERT INTO {self.q(self.tabla)} ({lista}) "
+                f"SELECT DISTINCT ON ({clave}) {lista} FROM {self.q(self.STAGING)} "
+                f"ORDER BY {clave}, orden DESC "
+                + self.upsert_sql(columnas, campos)
+            )
+            escritos = cursor.rowcount
+            cursor.execute(f"TRUNCATE {self.q(self.STAGING)}")
+        return escritos
+
+
+ESCRITORES = {
+    'orm': EscritorORM,
+    'sqlite': EscritorSQLite,
+    'postgresql': EscritorPostgres,
+}
+
+
+def obtener_escritor(conexion=None):
+    """Escritor según settings.ESCRITOR_TELEMETRIA ('orm', 'sqlite', 'postgresql') o el motor de la conexión."""
+    conexion = conexion or conexion_defecto
+    nombre = getattr(settings, 'ESCRITOR_TELEMETRIA', None) or conexion.vendor
+    clase = ESCRITORES.get(nombre, EscritorORM)
+    return clase() if clase is EscritorORM else clase(conexion)
@@ -0,0 +1,48 @@
+from telemetria.models import Estacion
+
+
+class CacheEstaciones:
+    """
+    Resolución código -> Estacion para el importador. `cargar()` trae todas las
+    estaciones en una sola consulta; los códigos que no existen quedan en una
+    caché negativa (con los archivos que los usaron) para no volver a buscarlos
+    y poder informarlos una sola vez al final de la corrida.
+    """
+
+    def __init__(self):
+        self._por_codigo = {}
+        self._completo = False
+        self.desconocidos = {}  # codigo -> [archivos]
+
+    def cargar(self):
+        self._por_codigo = {str(e.codigo_identificador).strip(): e for e in Estacion.objects.all()}
+        self._completo = True
+        self.desconocidos = {}
+        return self
+
+    def todas(self):
+        return list(self._por_codigo.values())
+
+    def obtener(self, codigo, archivo=None):
+        estacion = self._por_codigo.get(codigo)
+        if estacion is not None:
+            return estacion
+
+        if codigo not in self.desconocidos and not self._completo:
+            estacion = Estacion.objects.filter(codigo_identificador=codigo).first()
+            if estacion is not None:
+                self._por_codigo[codigo] = estacion
+                return estacion
+
+        archivos = self.desconocidos.setdefault(codigo, [])
+        if archivo is not None:
+            archivos.append(archivo)
+        return None
+
+    def resumen_desconocidos(self):
+        """Texto con los códigos sin estación en la BD, o None si no hubo."""
+        if not self.desconocidos:
+            return None
+        total = sum(len(a) for a in self.desconocidos.values())
+        codigos = ', '.join(sorted(str(c) for c in self.desconocidos))
+        return f"{len(self.desconocidos)} códigos sin estación en la BD ({total} archivos omitidos): {codigos}"
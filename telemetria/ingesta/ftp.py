@@ -0,0 +1,178 @@
+import time
+import tempfile
+from ftplib import FTP, error_perm, error_temp, error_reply
+from decouple import config
+
+# Errores de red/servidor que justifican reconectar (error_perm no: es un "no" definitivo)
+ERRORES_RECONECTABLES = (OSError, EOFError, error_temp, error_reply)
+
+TAMANO_BLOQUE = 64 * 1024
+# Por encima de este tamaño una descarga se vuelca a disco en vez de quedar en RAM
+MAX_EN_MEMORIA = 1024 * 1024
+
+
+def es_archivo_datos(nombre):
+    return nombre.startswith('H_') and nombre.endswith('.dat')
+
+
+def listar_archivos(ftp, incluir=None):
+    """
+    Devuelve {nombre: (tamaño, mtime)} de los archivos H_*.dat.
+    Usa MLSD (un solo comando) y si el servidor no lo soporta (vsftpd)
+    cae a SIZE + MDTM por archivo. `incluir(nombre)` limita el listado a
+    algunos archivos (en el respaldo ahorra dos comandos por cada excluido).
+    """
+    incluir = incluir or (lambda nombre: True)
+    archivos = {}
+    try:
+        for nombre, datos in ftp.mlsd(facts=['size', 'modify']):
+            if es_archivo_datos(nombre) and incluir(nombre):
+                tamano = int(datos['size']) if 'size' in datos else None
+                archivos[nombre] = (tamano, datos.get('modify', '')[:14])
+        return archivos
+    except error_perm:
+        pass
+
+    ftp.voidcmd('TYPE I')  # SIZE requiere modo binario en muchos servidores
+    for nombre in ftp.nlst():
+        if not es_archivo_datos(nombre) or not incluir(nombre): continue
+        try:
+            tamano = ftp.size(nombre)
+        except error_perm:
+            tamano = None
+        try:
+            mtime = ftp.voidcmd('MDTM ' + nombre).split()[-1][:14]
+        except error_perm:
+            mtime = ''
+        archivos[nombre] = (tamano, mtime)
+    return archivos
+
+
+class ConexionFTP:
+    """
+    Conexión FTP autenticada que se reconecta sola si el servidor la corta,
+    para que una conexión caída no aborte toda la importación.
+    """
+
+    def __init__(self, host, user, passwd, remote_dir='/', timeout=60, reintentos=3, espera=2, port=21):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.passwd = passwd
+        self.remote_dir = remote_dir
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.espera = espera
+        self.ftp = None
+
+    @classmethod
+    def desde_config(cls):
+        return cls(
+            host=config('FTP_HOST'),
+            user=config('FTP_USER'),
+            passwd=config('FTP_PASS'),
+            remote_dir=config('FTP_REMOTE_DIR', default='/'),
+            timeout=config('FTP_TIMEOUT', default=60, cast=int),
+            port=config('FTP_PORT', default=21, cast=int),
+        )
+
+    def conectar(self):
+        self.cerrar()
+        ftp = FTP(timeout=self.timeout)
+        ftp.connect(self.host, self.port)
+        ftp.login(user=self.user, passwd=self.passwd)
+        if self.remote_dir != '/': ftp.cwd(self.remote_dir)
+        self.ftp = ftp
+        return ftp
+
+    def cerrar(self):
+        if self.ftp is None: return
+        try:
+            self.ftp.quit()
+        except Exception:
+            self.ftp.close()
+        self.ftp = None
+
+    def mantener(self):
+        """
+        Comprueba con NOOP que la conexión siga viva. Si el servidor la cerró por
+        inactividad se descarta sin esperas: se reabre al usarla.
+        """
+        if self.ftp is None: return
+        try:
+            self.ftp.voidcmd('NOOP')
+        except ERRORES_RECONECTABLES:
+            self.ftp.close()
+            self.ftp = None
+
+    def ejecutar(self, operacion):
+        """Ejecuta operacion(ftp), reconectando con espera exponencial ante cortes."""
+        for intento in range(self.reintentos + 1):
+            try:
+                if self.ftp is None:
+                    self.conectar()
+                return operacion(self.ftp)
+            except ERRORES_RECONECTABLES as e:
+                try:
+                    self.cerrar()
+                except Exception:
+                    self.ftp = None
+                if intento == self.reintentos:
+                    raise
+                print(f"   [~] Conexión FTP perdida ({e}), reintentando ({intento + 1}/{self.reintentos})...")
+                time.sleep(self.espera * 2 ** intento)
+
+    def listar_archivos(self, incluir=None):
+        return self.ejecutar(lambda ftp: listar_archivos(ftp, incluir))
+
+    def descargar(self, filename, desde=0):
+        """
+        Descarga el archivo (desde el byte `desde`) a un archivo temporal que
+        solo se mantiene en memoria si es pequeño. Se devuelve posicionado al inicio.
+        """
+        def retr(ftp):
+            # Archivo nuevo en cada intento: un reintento no mezcla bytes de la descarga cortada
+            destino = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+            try:
+                ftp.retrbinary("RETR " + filename, destino.write, TAMANO_BLOQUE, rest=desde or None)
+            except BaseException:
+                destino.close()
+                raise
+            destino.seek(0)
+            return destino
+        return self.ejecutar(retr)
+
+    def bloques(self, filename, desde=0):
+        """
+        Generador de bloques de bytes leídos directamente del socket de datos,
+        para procesar el archivo mientras llega sin guardarlo entero.
+        """
+        def abrir(ftp):
+            ftp.voidcmd('TYPE I')
+            return ftp.transfercmd("RETR " + filename, rest=desde or None)
+
+        conn = self.ejecutar(abrir)
+        completo = False
+        try:
+            with conn:
+                while True:
+                    bloque = conn.recv(TAMANO_BLOQUE)
+                    if not bloque: break
+                    yield bloque
+            self.ftp.voidresp()
+            completo = True
+        finally:
+            if not completo and self.ftp is not None:
+                # Transferencia cortada o abandonada: el canal de control queda
+                # desfasado, así que descartamos la conexión y se reabre al usarla.
+                self.ftp.close()
+                self.ftp = None
+
+
+def leer_bloques(archivo):
+    """Recorre un archivo (p. ej. el devuelto por ConexionFTP.descargar) por bloques y lo cierra."""
+    with archivo:
+        while True:
+            bloque = archivo.read(TAMANO_BLOQUE)
+            if not bloque: break
+            yield bloque
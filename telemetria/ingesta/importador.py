@@ -0,0 +1,119 @@
+from telemetria.models import ArchivoImportado
+from telemetria.ingesta.parser import obtener_codigo_estacion
+from telemetria.ingesta.pipeline import Tarea, ejecutar_secuencial, ejecutar_pipeline
+from telemetria.ingesta.escritor import guardar_lectura
+from telemetria.ingesta.columnas import REGISTRO
+from telemetria.ingesta.estaciones import CacheEstaciones
+from telemetria.ingesta.metricas import Metricas
+from telemetria.ingesta import columnar
+
+
+class Importador:
+    """
+    Orquesta una importación sobre cualquier fuente de archivos (ConexionFTP,
+    FuenteLocal): resuelve estaciones y manifiestos, ejecuta las etapas de
+    descarga/parseo y hace de único escritor en la BD.
+    """
+
+    def __init__(self, resync=False, usar_columnar=columnar.DISPONIBLE, completo=False, archivo=None, informe=None, prometheus=None):
+        # `completo` ignora manifiestos y marcas de agua: relee y reescribe todo
+        self.resync = resync or completo
+        self.completo = completo
+        self.archivo = archivo  # carpeta del archivo crudo (None = no archivar)
+        self.usar_columnar = usar_columnar
+        self.estaciones = CacheEstaciones()
+        self.por_estacion = {}  # codigo -> registros guardados en la última importación
+        self.metricas = Metricas()
+        # Rutas donde dejar el informe JSON y el texto Prometheus tras cada importación
+        self.informe = informe
+        self.prometheus = prometheus
+
+    def preparar(self):
+        """Precarga estaciones y mapas de columnas (una consulta cada uno)."""
+        self.estaciones.cargar()
+        REGISTRO.precargar()
+
+    def preparar_tareas(self, archivos):
+        """Resuelve estación y manifiesto de cada archivo y descarta los que no cambiaron."""
+        manifiestos = ArchivoImportado.objects.in_bulk(list(archivos), field_name='nombre')
+        tareas = []
+
+        for filename, (tamano, mtime) in sorted(archivos.items()):
+            # 1. IDENTIFICAR LA ESTACIÓN
+            codigo = obtener_codigo_estacion(filename)
+            estacion = self.estaciones.obtener(codigo, filename)
+            if estacion is None:
+                continue
+
+            manifiesto = manifiestos.get(filename)
+            if manifiesto and not self.resync and tamano is not None and manifiesto.sin_cambios(tamano, mtime):
+                print(f"   [=] {filename} sin cambios, se omite.")
+                continue
+
+            marca = None if self.completo else estacion.marca_agua
+            tareas.append(Tarea(filename, estacion, manifiesto, tamano, mtime, marca))
+        return tareas
+
+    def importar(self, fuente, archivos, workers=1, crear_fuente=None, detener=None):
+        """
+        Importa `archivos` ({nombre: (tamaño, mtime)}) desde `fuente`. Con
+        workers > 1 y una fábrica `crear_fuente`, usa el pipeline concurrente.
+        Si `detener()` se vuelve verdadero, termina de guardar el archivo en
+        curso y no empieza el siguiente. Devuelve la cantidad de registros guardados.
+        """
+        self.por_estacion = {}
+        self.metricas.nueva_ejecucion()
+        tareas = self.preparar_tareas(archivos)
+
+        if workers > 1 and crear_fuente is not None:
+            print(f"⚙️ Pipeline con {workers} conexiones FTP.")
+            resultados = ejecutar_pipeline(tareas, crear_fuente, workers, self.resync, usar_columnar=self.usar_columnar, archivo=self.archivo)
+        else:
+            resultados = ejecutar_secuencial(tareas, fuente, self.resync, usar_columnar=self.usar_columnar, archivo=self.archivo)
+
+        # Etapa de escritura: un solo escritor (SQLite no admite escrituras concurrentes)
+        total = 0
+        for tarea, lectura, error in resultados:
+            guardados = self.guardar(tarea, lectura, error)
+            codigo = tarea.estacion.codigo_identificador
+            self.por_estacion[codigo] = self.por_estacion.get(codigo, 0) + guardados
+            total += guardados
+            if detener is not None and detener():
+                resultados.close()
+                break
+
+        self.metricas.terminar()
+        if tareas:
+            print(self.metricas.resumen())
+        self.metricas.escribir(self.informe, self.prometheus)
+        return total
+
+    def guardar(self, tarea, lectura, error):
+        print(f"\nProcessing: {tarea.nombre} -> Estación: {tarea.estacion.nombre}")
+        if error is None:
+            try:
+                leidos, guardados = guardar_lectura(lectura)
+            except Exception as e:
+                error = e
+        if error is not None:
+            tarea.metrica.error = str(error)
+        self.metricas.registrar(tarea.metrica)
+        if error is not None:
+            print(f"   [X] Error procesando: {error}")
+            return 0
+
+        if guardados:
+            sin_cambios = f" ({leidos - guardados} sin cambios)" if leidos > guardados else ""
+            print(f"   [✔] {guardados} registros guardados para {tarea.estacion.nombre}{sin_cambios}")
+        elif leidos:
+            print(f"   [=] {leidos} registros ya guardados, sin cambios.")
+        elif tarea.marca is not None:
+            print(f"   [=] Sin registros posteriores a {tarea.marca[0]:%Y-%m-%d %H:%M:%S}.")
+        else:
+            print("   [!] Sin registros válidos.")
+        return guardados
+
+    def informar_desconocidos(self):
+        resumen = self.estaciones.resumen_desconocidos()
+        if resumen:
+            print(f"⚠️ {resumen}")
@@ -0,0 +1,233 @@
+import os
+import sys
+import time
+import mmap
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from telemetria.ingesta.ftp import es_archivo_datos, TAMANO_BLOQUE
+
+
+def mtime_utc(st_mtime):
+    # Mismo formato que MDTM/MLSD del FTP, para que el manifiesto sirva en ambos modos
+    return time.strftime('%Y%m%d%H%M%S', time.gmtime(st_mtime))
+
+
+def carpetas_estaciones(raiz):
+    """Subcarpetas de `raiz`, salvo las ocultas (p. ej. el archivo crudo .archivo)."""
+    with os.scandir(raiz) as entradas:
+        return [e.path for e in entradas if e.is_dir() and not e.name.startswith('.')]
+
+
+class FuenteLocal:
+    """
+    Lee los .dat directamente de RUTA_DATOS_TELEMETRIA (una carpeta por
+    codigo_identificador, como las crea Estacion.save). Expone la misma interfaz
+    que ConexionFTP para que el pipeline no distinga entre ambas.
+    """
+
+    def __init__(self, raiz):
+        self.raiz = str(raiz)
+        self.host = self.raiz
+        self.rutas = {}
+
+    def listar_archivos(self, incluir=None):
+        """Devuelve {nombre: (tamaño, mtime)} de los H_*.dat en la raíz y en cada carpeta de estación."""
+        archivos = {}
+        self.rutas = {}
+        carpetas = [self.raiz]
+        try:
+            carpetas += carpetas_estaciones(self.raiz)
+        except FileNotFoundError:
+            return archivos
+
+        for carpeta in carpetas:
+            try:
+                with os.scandir(carpeta) as entradas:
+                    for e in entradas:
+                        if not e.is_file() or not es_archivo_datos(e.name): continue
+                        if incluir is not None and not incluir(e.name): continue
+                        st = e.stat()
+                        archivos[e.name] = (st.st_size, mtime_utc(st.st_mtime))
+                        self.rutas[e.name] = e.path
+            except OSError:
+                continue
+        return archivos
+
+    def ruta(self, filename):
+        if filename not in self.rutas:
+            self.listar_archivos()
+        return self.rutas[filename]
+
+    def bloques(self, filename, desde=0):
+        """
+        Recorre el archivo desde el byte `desde` con mmap (sin copiarlo a un buffer
+        propio). Solo se mapea hasta el tamaño que tenía al abrirlo: lo que el
+        datalogger agregue después se leerá en la próxima pasada.
+        """
+        with open(self.ruta(filename), 'rb') as f:
+            tamano = os.fstat(f.fileno()).st_size
+            if tamano <= desde: return
+            with mmap.mmap(f.fileno(), tamano, access=mmap.ACCESS_READ) as mapa:
+                for inicio in range(desde, tamano, TAMANO_BLOQUE):
+                    yield mapa[inicio:inicio + TAMANO_BLOQUE]
+
+    def descargar(self, filename, desde=0):
+        archivo = open(self.ruta(filename), 'rb')
+        archivo.seek(desde)
+        return archivo
+
+    def mantener(self):
+        pass
+
+    def cerrar(self):
+        pass
+
+
+# ==========================================
+#  INOTIFY (Linux) vía ctypes, sin dependencias
+# ==========================================
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ISDIR = 0x40000000
+EVENTO = struct.Struct('iIII')
+
+
+class Inotify:
+    """Envoltorio mínimo de inotify. Lanza OSError si el sistema no lo soporta."""
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify solo existe en Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "libc sin inotify")
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self.carpetas = {}  # wd -> ruta
+
+    def vigilar(self, ruta, mascara):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(ruta), mascara)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falló en {ruta}")
+        self.carpetas[wd] = ruta
+        return wd
+
+    def leer(self, timeout):
+        """Espera hasta `timeout` segundos y devuelve [(carpeta, nombre, mascara)]."""
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return []
+        try:
+            datos = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        eventos = []
+        pos = 0
+        while pos + EVENTO.size <= len(datos):
+            wd, mascara, _cookie, largo = EVENTO.unpack_from(datos, pos)
+            pos += EVENTO.size
+            nombre = datos[pos:pos + largo].rstrip(b'\0').decode('utf-8', 'replace')
+            pos += largo
+            eventos.append((self.carpetas.get(wd), nombre, mascara))
+        return eventos
+
+    def cerrar(self):
+        os.close(self.fd)
+
+
+class Vigilante:
+    """
+    Detecta archivos .dat que el datalogger terminó de escribir bajo `raiz`.
+    Con inotify reacciona a IN_CLOSE_WRITE/IN_MOVED_TO; si no está disponible
+    sondea tamaño y mtime cada `intervalo` segundos. En ambos casos un archivo
+    se entrega recién cuando lleva `espera` segundos sin cambios.
+    """
+
+    MASCARA_CARPETA = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MODIFY | IN_CREATE
+
+    def __init__(self, fuente, intervalo=5, espera=2, usar_inotify=True):
+        self.fuente = fuente
+        self.intervalo = intervalo
+        self.espera = espera
+        self.pendientes = {}  # nombre -> momento del último cambio
+        self.inotify = None
+        self._ultimo_sondeo = {}
+        if usar_inotify:
+            try:
+                self.inotify = Inotify()
+            except OSError:
+                self.inotify = None
+        if self.inotify is not None:
+            self._vigilar_carpetas()
+        else:
+            # Foto inicial: solo cuenta lo que cambie a partir de ahora
+            self._ultimo_sondeo = fuente.listar_archivos()
+
+    @property
+    def modo(self):
+        return 'inotify' if self.inotify is not None else f'sondeo cada {self.intervalo}s'
+
+    def _vigilar_carpetas(self):
+        vigiladas = set(self.inotify.carpetas.values())
+        carpetas = [self.fuente.raiz]
+        try:
+            carpetas += carpetas_estaciones(self.fuente.raiz)
+        except FileNotFoundError:
+            pass
+        for carpeta in carpetas:
+            if carpeta not in vigiladas:
+                try:
+                    self.inotify.vigilar(carpeta, self.MASCARA_CARPETA)
+                except OSError:
+                    continue
+
+    def _esperar_eventos(self, timeout):
+        if self.inotify is not None:
+            for carpeta, nombre, mascara in self.inotify.leer(timeout):
+                if mascara & IN_ISDIR:
+                    # Carpeta nueva (estación recién creada): también la vigilamos
+                    self._vigilar_carpetas()
+                elif es_archivo_datos(nombre):
+                    self.pendientes[nombre] = time.monotonic()
+            return
+
+        time.sleep(timeout)
+        ahora = time.monotonic()
+        actual = self.fuente.listar_archivos()
+        for nombre, estado in actual.items():
+            if self._ultimo_sondeo.get(nombre) != estado:
+                self.pendientes[nombre] = ahora
+        self._ultimo_sondeo = actual
+
+    def esperar(self, detener=lambda: False):
+        """
+        Bloquea hasta que haya archivos estables y devuelve {nombre: (tamaño, mtime)}.
+        Devuelve {} si `detener()` pasa a ser verdadero.
+        """
+        while not detener():
+            timeout = self.espera if self.pendientes else self.intervalo
+            self._esperar_eventos(min(timeout, self.intervalo))
+
+            limite = time.monotonic() - self.espera
+            listos = [n for n, t in self.pendientes.items() if t <= limite]
+            if not listos:
+                continue
+
+            actual = self.fuente.listar_archivos()
+            for nombre in listos:
+                del self.pendientes[nombre]
+            return {n: actual[n] for n in listos if n in actual}
+        return {}
+
+    def cerrar(self):
+        if self.inotify is not None:
+            self.inotify.cerrar()
@@ -0,0 +1,244 @@
+"""
+Instrumentación de la ingesta: tiempos por etapa y archivo (descarga, parseo,
+escritura), filas rechazadas por motivo y desfase de cada estación.
+
+Cada Tarea lleva su MetricaArchivo, que llenan las etapas a medida que pasan
+por ella; el Importador las junta en Metricas, que arma el informe JSON de la
+ejecución y el texto en formato Prometheus (archivo para el textfile collector
+de node_exporter, o un endpoint HTTP local con servir()).
+"""
+import os
+import json
+import time
+import threading
+from collections import Counter
+from datetime import datetime, timezone as tz
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Motivos de descarte de filas (ver parser.iterar_registros y columnar)
+FECHA_INVALIDA = 'fecha_invalida'
+CONVERSION = 'error_conversion'
+LINEA_INVALIDA = 'linea_invalida'
+YA_IMPORTADA = 'ya_importada'
+
+ETAPAS = ('descarga', 'parseo', 'escritura')
+
+
+def _iso(valor):
+    return valor.isoformat() if valor is not None else None
+
+
+class MetricaArchivo:
+    """Lo medido para un archivo. Los tiempos son segundos de reloj de cada etapa."""
+
+    def __init__(self, nombre, estacion):
+        self.nombre = nombre
+        self.estacion = estacion  # codigo_identificador
+        self.bytes = 0
+        self.segundos = dict.fromkeys(ETAPAS, 0.0)
+        self.leidos = 0
+        self.escritos = 0
+        self.rechazos = Counter()
+        self.ultimo_archivo = None   # timestamp más nuevo leído del archivo
+        self.ultimo_guardado = None  # más nuevo que había en la BD antes de escribir
+        self.ultimo_en_bd = None     # más nuevo en la BD después de escribir
+        self.error = None
+
+    @property
+    def desfase(self):
+        """Segundos que el archivo trae por delante de lo que había guardado."""
+        if self.ultimo_guardado is None or self.error is not None:
+            return None
+        if self.ultimo_archivo is None:
+            return 0.0  # nada posterior a la marca de agua
+        return max((self.ultimo_archivo - self.ultimo_guardado).total_seconds(), 0.0)
+
+    def como_dict(self):
+        parseo = self.segundos['parseo']
+        return {
+            'archivo': self.nombre,
+            'estacion': self.estacion,
+            'bytes': self.bytes,
+            'segundos': {e: round(s, 4) for e, s in self.segundos.items()},
+            'filas_leidas': self.leidos,
+            'filas_escritas': self.escritos,
+            'filas_por_segundo': round(self.leidos / parseo) if parseo > 0 else None,
+            'rechazos': dict(self.rechazos),
+            'ultimo_archivo': _iso(self.ultimo_archivo),
+            'ultimo_guardado': _iso(self.ultimo_guardado),
+            'desfase_segundos': self.desfase,
+            'error': self.error,
+        }
+
+
+class Metricas:
+    """
+    Acumula las MetricaArchivo de una ejecución (`archivos`, se vacía con
+    nueva_ejecucion()) y los totales del proceso, que en modo demonio siguen
+    creciendo entre ciclos como los contadores de Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.archivos = []
+        self.inicio = time.time()
+        self.fin = None
+        # Totales del proceso, por estación
+        self.bytes = Counter()
+        self.segundos = Counter()  # (estacion, etapa) -> segundos
+        self.filas = Counter()     # (estacion, 'leidas'|'escritas') -> filas
+        self.rechazos = Counter()  # (estacion, motivo) -> filas
+        self.resultados = Counter()  # 'ok'|'error' -> archivos
+        self.estaciones = {}       # codigo -> último desfase/guardado conocido
+
+    def nueva_ejecucion(self):
+        with self._lock:
+            self.archivos = []
+            self.inicio = time.time()
+            self.fin = None
+
+    def registrar(self, metrica):
+        with self._lock:
+            self.archivos.append(metrica)
+            codigo = metrica.estacion
+            self.bytes[codigo] += metrica.bytes
+            for etapa, segundos in metrica.segundos.items():
+                self.segundos[(codigo, etapa)] += segundos
+            self.filas[(codigo, 'leidas')] += metrica.leidos
+            self.filas[(codigo, 'escritas')] += metrica.escritos
+            for motivo, n in metrica.rechazos.items():
+                self.rechazos[(codigo, motivo)] += n
+            self.resultados['error' if metrica.error else 'ok'] += 1
+
+            estado = self.estaciones.setdefault(codigo, {})
+            if metrica.desfase is not None:
+                estado['desfase'] = metrica.desfase
+            if metrica.ultimo_en_bd is not None:
+                estado['ultimo'] = metrica.ultimo_en_bd
+
+    def terminar(self):
+        self.fin = time.time()
+
+    # ------------------------------------------
+    #  Salidas
+    # ------------------------------------------
+
+    def informe(self):
+        """Informe JSON-serializable de la última ejecución."""
+        with self._lock:
+            archivos = [m.como_dict() for m in self.archivos]
+            ahora = datetime.now(tz.utc)
+            estaciones = {
+                codigo: {
+                    'ultimo_guardado': _iso(estado.get('ultimo')),
+                    'retraso_segundos': (ahora - estado['ultimo']).total_seconds() if estado.get('ultimo') else None,
+                    'desfase_segundos': estado.get('desfase'),
+                }
+                for codigo, estado in sorted(self.estaciones.items())
+            }
+        totales = {
+            'archivos': len(archivos),
+            'con_error': sum(1 for a in archivos if a['error']),
+            'bytes': sum(a['bytes'] for a in archivos),
+            'filas_leidas': sum(a['filas_leidas'] for a in archivos),
+            'filas_escritas': sum(a['filas_escritas'] for a in archivos),
+            'segundos': {e: round(sum(a['segundos'][e] for a in archivos), 4) for e in ETAPAS},
+            'rechazos': dict(sum((Counter(a['rechazos']) for a in archivos), Counter())),
+        }
+        fin = self.fin or time.time()
+        return {
+            'inicio': datetime.fromtimestamp(self.inicio, tz.utc).isoformat(),
+            'duracion_segundos': round(fin - self.inicio, 3),
+            'totales': totales,
+            'estaciones': estaciones,
+            'archivos': archivos,
+        }
+
+    def prometheus(self):
+        """Totales del proceso en el formato de texto de Prometheus (0.0.4)."""
+        lineas = []
+
+        def metrica(nombre, tipo, ayuda, muestras):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, valor in muestras:
+                texto = ','.join(f'{k}="{_escapar(v)}"' for k, v in etiquetas.items())
+                lineas.append(f"{nombre}{{{texto}}} {valor}" if texto else f"{nombre} {valor}")
+
+        ahora = datetime.now(tz.utc)
+        with self._lock:
+            metrica('telemetria_ingesta_archivos_total', 'counter', 'Archivos procesados por resultado.',
+                    [({'resultado': r}, n) for r, n in sorted(self.resultados.items())])
+            metrica('telemetria_ingesta_bytes_total', 'counter', 'Bytes leídos de la fuente.',
+                    [({'estacion': c}, n) for c, n in sorted(self.bytes.items())])
+            metrica('telemetria_ingesta_segundos_total', 'counter', 'Segundos acumulados por etapa.',
+                    [({'estacion': c, 'etapa': e}, round(s, 6)) for (c, e), s in sorted(self.segundos.items())])
+            metrica('telemetria_ingesta_filas_total', 'counter', 'Filas leídas y escritas.',
+                    [({'estacion': c, 'tipo': t}, n) for (c, t), n in sorted(self.filas.items())])
+            metrica('telemetria_ingesta_rechazos_total', 'counter', 'Filas descartadas por motivo.',
+                    [({'estacion': c, 'motivo': m}, n) for (c, m), n in sorted(self.rechazos.items())])
+            metrica('telemetria_ingesta_desfase_segundos', 'gauge',
+                    'Cuánto adelantaba el último archivo a lo guardado en la BD.',
+                    [({'estacion': c}, e['desfase']) for c, e in sorted(self.estaciones.items()) if e.get('desfase') is not None])
+            metrica('telemetria_ingesta_retraso_segundos', 'gauge', 'Antigüedad del dato más nuevo guardado.',
+                    [({'estacion': c}, round((ahora - e['ultimo']).total_seconds(), 3))
+                     for c, e in sorted(self.estaciones.items()) if e.get('ultimo') is not None])
+            metrica('telemetria_ingesta_ultima_ejecucion_timestamp_seconds', 'gauge', 'Fin de la última ejecución.',
+                    [({}, round(self.fin, 3))] if self.fin else [])
+        return '\n'.join(lineas) + '\n'
+
+    def escribir(self, informe=None, prometheus=None):
+        """Escribe el informe JSON y/o el texto Prometheus (reemplazo atómico: un lector nunca ve medio archivo)."""
+        if informe:
+            _escribir_atomico(informe, json.dumps(self.informe(), ensure_ascii=False, indent=2))
+        if prometheus:
+            _escribir_atomico(prometheus, self.prometheus())
+
+    def resumen(self):
+        """Una línea con el tiempo de cada etapa de la última ejecución."""
+        with self._lock:
+            segundos = {e: sum(m.segundos[e] for m in self.archivos) for e in ETAPAS}
+            leidos = sum(m.leidos for m in self.archivos)
+            rechazos = sum((m.rechazos for m in self.archivos), Counter())
+        ritmo = f" ({leidos / segundos['parseo']:,.0f} filas/s)" if segundos['parseo'] > 0 else ""
+        texto = ', '.join(f"{e} {s:.2f}s" for e, s in segundos.items())
+        descartes = f" | descartadas: {', '.join(f'{m} {n}' for m, n in rechazos.most_common())}" if rechazos else ""
+        return f"⏱️ {texto}{ritmo}{descartes}"
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escribir_atomico(ruta, texto):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
+
+
+def servir(metricas, puerto, host='127.0.0.1'):
+    """Sirve /metrics (Prometheus) y /informe (JSON) en un hilo aparte. Devuelve el servidor."""
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/metrics'):
+                cuerpo, tipo = metricas.prometheus(), 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path.startswith('/informe'):
+                cuerpo, tipo = json.dumps(metricas.informe(), ensure_ascii=False), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            datos = cuerpo.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', tipo)
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    threading.Thread(target=servidor.serve_forever, name='metricas', daemon=True).start()
+    return servidor
@@ -0,0 +1,163 @@
+import csv
+from collections import Counter
+from datetime import datetime
+from django.utils.timezone import make_aware
+from telemetria.models import DatosSensor
+from telemetria.ingesta.metricas import FECHA_INVALIDA, CONVERSION, LINEA_INVALIDA, YA_IMPORTADA
+
+# ==========================================
+#  MAPEO DE CAMPOS (columna del .dat -> campo Django)
+# ==========================================
+MAPEO_CAMPOS = {
+    'record_id':          ['R', 'RECORD'],
+    'bateria_voltaje':    ['BattV'],
+    'ptemp_c':            ['PTemp'],
+    'oxigeno_disuelto':   ['COxigeno_dis(mg/L)', 'COxigeno_dis'],
+    'oxigeno_max':        ['COxigeno_dis_max'],
+    'oxigeno_tmax':       ['COxigeno_dis_Tmax'],
+    'porcentaje_oxigeno': ['Porcent_Oxigeno'],
+    'presion_oxigeno':    ['Presionp_oxigeno'],
+    'temperatura_agua':   ['Temperatura'],
+    'conductividad':      ['Conductividad'],
+    'salinidad':          ['Salinidad(%)'],
+    'salinidad_max':      ['Salinidad_max'],
+    'salinidad_tmax':     ['Salinidad_Tmax'],
+    'solidos_disueltos':  ['TSD'],
+    'densidad':           ['Densidad'],
+    'ph':                 ['pH(pH)'],
+    'ph_max':             ['pH_max'],
+    'ph_tmax':            ['pH_Tmax'],
+    'orp':                ['ORP']
+}
+
+CAMPOS_FECHA = ['oxigeno_tmax', 'salinidad_tmax', 'ph_tmax']
+
+
+def to_float(valor):
+    if not valor: return None
+    try:
+        numero = float(str(valor).strip())
+    except:
+        return None
+    # 'NAN' es lo que escribe el datalogger cuando no hubo lectura: se guarda como nulo
+    return None if numero != numero else numero
+
+
+def to_date(valor):
+    if not valor: return None
+    try:
+        limpio = str(valor).replace('"', '').strip()
+        if limpio in ['nan', 'NAN', '0', '']: return None
+        fecha = datetime.strptime(limpio, "%Y-%m-%d %H:%M:%S")
+        return make_aware(fecha)
+    except:
+        return None
+
+
+def obtener_codigo_estacion(filename):
+    """
+    Extrae el código del nombre del archivo.
+    Ejemplo: 'H_..._FAO_21738.dat' -> Devuelve '21738'
+    """
+    try:
+        # Quitamos la extensión .dat
+        nombre_sin_ext = filename.replace('.dat', '')
+        # Separamos por guion bajo y tomamos el último elemento
+        partes = nombre_sin_ext.split('_')
+        codigo = partes[-1]
+        return codigo
+    except:
+        return None
+
+
+def mapear_columnas(encabezado):
+    """Devuelve {campo_django: índice de columna} para un encabezado ya separado."""
+    indices = {}
+    try:
+        idx_fecha = next(i for i, col in enumerate(encabezado) if 'Fecha' in col or 'TIMESTAMP' in col)
+        indices['main_fecha'] = idx_fecha
+    except StopIteration:
+        indices['main_fecha'] = 0
+
+    for campo_django, posibles_nombres in MAPEO_CAMPOS.items():
+        indices[campo_django] = None
+        for i, col_csv in enumerate(encabezado):
+            for nombre in posibles_nombres:
+                if nombre in col_csv:
+                    indices[campo_django] = i
+                    break
+            if indices[campo_django] is not None: break
+    return indices
+
+
+def lineas_incrementales(bloques):
+    """
+    Decodificador incremental: recibe bloques de bytes y produce
+    (linea, offset_fin) por cada línea completa, sin juntar el archivo entero.
+    Una última línea sin '\\n' (a medio escribir) no se entrega.
+    """
+    resto = b''
+    offset = 0
+    for bloque in bloques:
+        datos = resto + bloque if resto else bloque
+        inicio = 0
+        while True:
+            fin = datos.find(b'\n', inicio)
+            if fin < 0: break
+            offset += fin + 1 - inicio
+            yield datos[inicio:fin].decode('latin-1'), offset
+            inicio = fin + 1
+        resto = datos[inicio:]
+
+
+def iterar_registros(lineas, mapa, estacion, marca=None, rechazos=None):
+    """
+    Convierte las líneas de datos en instancias de DatosSensor (sin guardar), una a una.
+    `mapa` es el MapaColumnas compilado del encabezado (ver ingesta.columnas).
+    Las filas con (timestamp, record_id) <= `marca` (ya guardadas) se descartan
+    antes de convertir el resto de sus columnas. Las filas descartadas se
+    cuentan por motivo en `rechazos` (un Counter, ver ingesta.metricas).
+    """
+    indice_fecha = mapa.indice_fecha
+    campos = mapa.campos
+    pares = mapa.pares
+    if rechazos is None:
+        rechazos = Counter()
+
+    for linea in lineas:
+        linea = linea.strip()
+        if not linea: continue
+        if not linea.startswith('"20'):
+            # Las líneas de unidades/procesamiento del TOA5 van entre comillas: no son rechazos
+            if not linea.startswith('"'): rechazos[LINEA_INVALIDA] += 1
+            continue
+
+        try:
+            partes = next(csv.reader([linea]))
+
+            # Fecha Principal
+            fecha_obj = to_date(partes[indice_fecha])
+            if not fecha_obj:
+                rechazos[FECHA_INVALIDA] += 1
+                continue
+            if marca is not None and fecha_obj < marca[0]:
+                rechazos[YA_IMPORTADA] += 1
+                continue
+
+            n = len(partes)
+            valores = dict(zip(campos, [conv(partes[idx] if idx < n else '') for idx, conv in pares]))
+            valores.setdefault('record_id', 0)
+            if marca is not None and (fecha_obj, valores['record_id']) <= marca:
+                rechazos[YA_IMPORTADA] += 1
+                continue
+
+            dato = DatosSensor(
+                estacion=estacion,  # <--- VINCULACIÓN IMPORTANTE
+                timestamp=fecha_obj,
+                **valores
+            )
+        except Exception:
+            rechazos[CONVERSION] += 1
+            continue
+
+        yield dato
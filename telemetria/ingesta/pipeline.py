@@ -0,0 +1,255 @@
+import time
+import queue
+import threading
+from itertools import islice
+from telemetria.ingesta.ftp import leer_bloques
+from telemetria.ingesta.parser import lineas_incrementales, iterar_registros
+from telemetria.ingesta.columnas import REGISTRO
+from telemetria.ingesta.archivo import Captura
+from telemetria.ingesta.metricas import MetricaArchivo
+from telemetria.ingesta import columnar
+
+# Registros por bulk_create: acota la memoria sin importar el tamaño del archivo
+TAMANO_LOTE = 2000
+
+
+class Tarea:
+    """
+    Un archivo .dat a importar, ya resuelto contra su estación y su manifiesto.
+    `marca` es la marca de agua de la estación al preparar la tarea: las filas
+    hasta ella no se vuelven a convertir ni a escribir. `metrica` acumula lo
+    que miden las etapas al pasar el archivo por ellas.
+    """
+
+    def __init__(self, nombre, estacion, manifiesto=None, tamano=None, mtime=None, marca=None):
+        self.nombre = nombre
+        self.estacion = estacion
+        self.manifiesto = manifiesto
+        self.tamano = tamano
+        self.mtime = mtime
+        self.marca = marca
+        self.metrica = MetricaArchivo(nombre, estacion.codigo_identificador)
+
+
+class Lectura:
+    """
+    Lectura en streaming de un archivo: convierte sus bloques de bytes en lotes
+    de DatosSensor y registra hasta qué byte se consumió (para el manifiesto).
+    Con `archivo` (carpeta del archivo crudo) guarda además una copia
+    comprimida de lo leído; queda en `crudo` al terminar.
+    """
+
+    def __init__(self, tarea, bloques, inicio=0, encabezado=None, usar_columnar=columnar.DISPONIBLE, archivo=None):
+        self.tarea = tarea
+        self.usar_columnar = usar_columnar
+        self.bloques = bloques
+        self.inicio = inicio
+        self.offset = inicio
+        self.encabezado = encabezado
+        self.mapa = None
+        self.captura = Captura(archivo) if archivo else None
+        self.crudo = None
+
+    @property
+    def tamano(self):
+        return self.tarea.tamano if self.tarea.tamano is not None else self.offset
+
+    def _bloques_medidos(self):
+        # El tiempo esperando cada bloque es de descarga (socket o archivo temporal)
+        metrica = self.tarea.metrica
+        bloques = iter(self.bloques)
+        while True:
+            inicio = time.perf_counter()
+            bloque = next(bloques, None)
+            metrica.segundos['descarga'] += time.perf_counter() - inicio
+            if bloque is None: return
+            metrica.bytes += len(bloque)
+            yield bloque
+
+    def lineas(self):
+        for linea, fin in lineas_incrementales(self._bloques_medidos()):
+            self.offset = self.inicio + fin
+            if self.captura is not None:
+                self.captura.escribir(linea)
+            yield linea
+
+    def registros(self):
+        lineas = self.lineas()
+        if self.encabezado is None:
+            self.encabezado = next(lineas, None)
+            if self.encabezado is None: return
+        elif self.captura is not None:
+            # Solo llega la cola: el crudo lleva el encabezado para leerse solo
+            self.captura.escribir(self.encabezado)
+        self.mapa = REGISTRO.obtener(self.tarea.estacion, self.encabezado)
+        rechazos = self.tarea.metrica.rechazos
+        if self.usar_columnar:
+            yield from columnar.iterar_registros_columnar(lineas, self.mapa, self.tarea.estacion, marca=self.tarea.marca, rechazos=rechazos)
+        else:
+            yield from iterar_registros(lineas, self.mapa, self.tarea.estacion, self.tarea.marca, rechazos)
+
+    def lotes(self, tamano=TAMANO_LOTE):
+        registros = self.registros()
+        segundos = self.tarea.metrica.segundos
+        while True:
+            # Parseo = tiempo armando el lote menos lo que se esperó a la descarga
+            inicio, descarga = time.perf_counter(), segundos['descarga']
+            lote = list(islice(registros, tamano))
+            segundos['parseo'] += time.perf_counter() - inicio - (segundos['descarga'] - descarga)
+            if not lote: break
+            yield lote
+        if self.captura is not None:
+            self.crudo = self.captura.confirmar()
+            if self.crudo is not None:
+                self.crudo['inicio'] = self.inicio
+
+    def cerrar(self):
+        # Libera la transferencia/archivo temporal si el escritor no llegó al final
+        self.bloques.close()
+        if self.captura is not None:
+            self.captura.descartar()
+
+
+# ==========================================
+#  ETAPAS
+# ==========================================
+
+def _con_primero(primero, bloques):
+    yield primero
+    yield from bloques
+
+
+def descargar(conexion, tarea, resync=False, a_temporal=False):
+    """
+    Abre la descarga de lo nuevo del archivo usando el manifiesto.
+    Devuelve (bloques, offset_inicial, encabezado). Si el archivo se achicó,
+    es más antiguo o fue reemplazado, hace una resincronización completa.
+    Con `a_temporal` el archivo se baja entero a un temporal (liberando la
+    conexión); si no, los bloques se leen del socket a medida que se consumen.
+    """
+    if a_temporal:
+        abrir = lambda nombre, desde=0: leer_bloques(conexion.descargar(nombre, desde))
+    else:
+        abrir = conexion.bloques
+
+    manifiesto, filename = tarea.manifiesto, tarea.nombre
+    offset = manifiesto.offset if manifiesto else 0
+    rotado = (
+        resync or not manifiesto or not manifiesto.encabezado or offset <= 0
+        or (tarea.tamano is not None and tarea.tamano < offset)
+        or (tarea.mtime and manifiesto.mtime and tarea.mtime < manifiesto.mtime)
+    )
+
+    if not rotado:
+        # Pedimos desde el último byte ya procesado: debe ser el '\n' que
+        # cerraba la última línea. Si no lo es, el archivo fue reescrito.
+        bloques = abrir(filename, offset - 1)
+        primero = next(bloques, b'')
+        if primero[:1] == b'\n':
+            return _con_primero(primero[1:], bloques), offset, manifiesto.encabezado
+        bloques.close()
+        print(f"   [↺] {filename} fue rotado/reescrito: resincronizando completo.")
+    elif manifiesto and not resync:
+        print(f"   [↺] {filename} se achicó o fue rotado: resincronizando completo.")
+
+    return abrir(filename), 0, None
+
+
+# ==========================================
+#  EJECUCIÓN
+# ==========================================
+
+def ejecutar_secuencial(tareas, conexion, resync=False, usar_columnar=columnar.DISPONIBLE, archivo=None):
+    """
+    Procesa los archivos uno tras otro leyendo directo del socket: el escritor
+    consume los lotes mientras el archivo todavía se está descargando.
+    Produce (tarea, lectura, error).
+    """
+    for tarea in tareas:
+        inicio = time.perf_counter()
+        try:
+            descarga = descargar(conexion, tarea, resync)
+        except Exception as e:
+            yield tarea, None, e
+            continue
+        tarea.metrica.segundos['descarga'] += time.perf_counter() - inicio
+        lectura = Lectura(tarea, *descarga, usar_columnar=usar_columnar, archivo=archivo)
+        try:
+            yield tarea, lectura, None
+        finally:
+            lectura.cerrar()
+
+
+def ejecutar_pipeline(tareas, crear_conexion, workers, resync=False, capacidad=None, usar_columnar=columnar.DISPONIBLE, archivo=None):
+    """
+    Descargas concurrentes: `workers` hilos con su propia conexión FTP bajan
+    los archivos a temporales mientras el llamador parsea y escribe, en su
+    propio hilo y en el orden de `tareas`. Solo la espera de red se solapa:
+    el parseo y la escritura necesitan el GIL y en hilos aparte se lo
+    disputarían sin ganar nada. Como mucho `capacidad` archivos están
+    bajándose o esperando al escritor; si la escritura es la etapa lenta, las
+    descargas esperan en vez de acumularse en disco.
+    Produce (tarea, lectura, error) en el hilo del llamador.
+    """
+    tareas = list(tareas)
+    capacidad = max(capacidad or workers * 2, 1)
+    pendientes = queue.Queue()
+    for indice, tarea in enumerate(tareas):
+        pendientes.put((indice, tarea))
+    listas = {}  # índice de la tarea -> (descarga, error)
+    condicion = threading.Condition()
+    cupos = threading.Semaphore(capacidad)
+    detenido = threading.Event()
+
+    def descargador():
+        conexion = None
+        try:
+            while not detenido.is_set():
+                # El cupo se toma antes que la tarea: la más antigua sin entregar ya tiene el suyo
+                if not cupos.acquire(timeout=0.1) or detenido.is_set(): continue
+                try:
+                    indice, tarea = pendientes.get_nowait()
+                except queue.Empty:
+                    cupos.release()
+                    return
+                inicio = time.perf_counter()
+                try:
+                    conexion = conexion or crear_conexion()
+                    resultado = (descargar(conexion, tarea, resync, a_temporal=True), None)
+                except Exception as e:
+                    resultado = (None, e)
+                tarea.metrica.segundos['descarga'] += time.perf_counter() - inicio
+                with condicion:
+                    listas[indice] = resultado
+                    condicion.notify_all()
+        finally:
+            if conexion is not None:
+                conexion.cerrar()
+
+    hilos = [threading.Thread(target=descargador, name=f"ftp-{i}", daemon=True) for i in range(workers)]
+    for hilo in hilos:
+        hilo.start()
+
+    try:
+        for indice, tarea in enumerate(tareas):
+            with condicion:
+                condicion.wait_for(lambda: indice in listas)
+                descarga, error = listas.pop(indice)
+            if error is not None:
+                yield tarea, None, error
+            else:
+                lectura = Lectura(tarea, *descarga, usar_columnar=usar_columnar, archivo=archivo)
+                try:
+                    yield tarea, lectura, None
+                finally:
+                    lectura.cerrar()
+            # Solo cuando el escritor pide el siguiente: cerrar el generador no libera otra descarga
+            cupos.release()
+    finally:
+        # También al cerrar el generador a mitad (detener): no se empieza nada nuevo
+        detenido.set()
+        for hilo in hilos:
+            hilo.join()
+        for descarga, _ in listas.values():
+            if descarga is not None:
+                descarga[0].close()
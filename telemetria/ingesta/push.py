@@ -0,0 +1,212 @@
+"""
+Ingesta por HTTP (push del datalogger): conversión del cuerpo del POST a
+registros con el mismo mapeo que el importador, y un escritor que agrupa los
+envíos concurrentes de muchas estaciones en una sola transacción.
+"""
+import io
+import csv
+import json
+import queue
+import threading
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+from telemetria.ingesta.pipeline import Tarea, Lectura
+from telemetria.ingesta.columnas import REGISTRO
+from telemetria.ingesta.metricas import YA_IMPORTADA
+from telemetria.ingesta.escritor import guardar_registros, ultima_marca, avanzar_marca, registrar_cambios, TOLERANCIA_FUTURO
+from telemetria.resumenes import horas_de, actualizar_resumenes
+
+
+class CargaInvalida(ValueError):
+    """El cuerpo del POST no se puede interpretar como datos del datalogger."""
+
+
+class FilasRechazadas(CargaInvalida):
+    """
+    Alguna fila del POST no se pudo convertir (fecha o valores inválidos). No
+    se guarda nada: el datalogger conserva el envío completo para reenviarlo.
+    `rechazos` es {motivo: filas}, `recibidos` las filas que sí se leyeron.
+    """
+
+    def __init__(self, rechazos, recibidos):
+        self.rechazos = rechazos
+        self.recibidos = recibidos
+        super().__init__(f"{sum(rechazos.values())} filas rechazadas")
+
+
+# ==========================================
+#  CUERPO DEL POST -> REGISTROS
+# ==========================================
+
+def json_a_csv(cuerpo):
+    """
+    Filas JSON ([{...}] o {"filas": [{...}]}) -> texto CSV con encabezado, con
+    la columna de fecha primero y entre comillas como en un .dat.
+    """
+    try:
+        datos = json.loads(cuerpo)
+    except ValueError as e:
+        raise CargaInvalida(f"JSON inválido: {e}")
+    filas = datos.get('filas') if isinstance(datos, dict) else datos
+    if not isinstance(filas, list) or not all(isinstance(f, dict) for f in filas):
+        raise CargaInvalida("se esperaba una lista de objetos (o {\"filas\": [...]})")
+    if not filas:
+        return b''
+
+    columnas = list(dict.fromkeys(c for f in filas for c in f))
+    fecha = next((c for c in columnas if 'TIMESTAMP' in c or 'Fecha' in c), None)
+    if fecha is None:
+        raise CargaInvalida("las filas no traen TIMESTAMP")
+    columnas.remove(fecha)
+    columnas.insert(0, fecha)
+
+    salida = io.StringIO()
+    escritor = csv.writer(salida, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    escritor.writerow(columnas)
+    for fila in filas:
+        escritor.writerow(['' if fila.get(c) is None else fila.get(c) for c in columnas])
+    return salida.getvalue().encode('latin-1', 'replace')
+
+
+def leer_carga(estacion, cuerpo, tipo_contenido=''):
+    """
+    Convierte el cuerpo de un POST (TOA5, CSV con encabezado o JSON) en
+    DatosSensor sin guardar. Devuelve (mapa, registros); lanza FilasRechazadas
+    si alguna fila no se pudo convertir (las ya guardadas no cuentan).
+    """
+    if 'json' in tipo_contenido:
+        cuerpo = json_a_csv(cuerpo)
+    if cuerpo.startswith(b'"TOA5"'):
+        # TOA5: la 1ª línea describe el datalogger; los nombres de campo vienen en la 2ª
+        # (las de unidades y procesamiento no empiezan con fecha y el parser las salta)
+        cuerpo = cuerpo.split(b'\n', 1)[1] if b'\n' in cuerpo else b''
+    if not cuerpo.strip():
+        raise CargaInvalida("cuerpo vacío")
+    if not cuerpo.endswith(b'\n'):
+        cuerpo += b'\n'
+    # Los archivos sin columna de fecha se leen igual (columna 0); por HTTP se exige el encabezado
+    encabezado = cuerpo.split(b'\n', 1)[0]
+    if b'TIMESTAMP' not in encabezado and b'Fecha' not in encabezado:
+        raise CargaInvalida("falta la línea de encabezado con TIMESTAMP")
+
+    lectura = Lectura(Tarea(f"http:{estacion.codigo_identificador}", estacion, marca=estacion.marca_agua), iter([cuerpo]))
+    registros = list(lectura.registros())
+    rechazos = {motivo: n for motivo, n in lectura.tarea.metrica.rechazos.items() if motivo != YA_IMPORTADA and n}
+    if rechazos:
+        raise FilasRechazadas(rechazos, len(registros))
+    return lectura.mapa, registros
+
+
+# ==========================================
+#  ESCRITOR COALESCENTE
+# ==========================================
+
+class Envio:
+    """Registros de un POST esperando a que el escritor los confirme."""
+
+    def __init__(self, estacion, mapa, registros):
+        self.estacion = estacion
+        self.mapa = mapa
+        self.registros = registros
+        self.escritos = 0
+        self.error = None
+        self.listo = threading.Event()
+
+
+class EscritorCoalescente:
+    """
+    Un hilo escritor por proceso: junta los envíos que llegan durante `ventana`
+    segundos (o hasta `max_registros`) y los escribe en una única transacción
+    (group commit). Cada request espera la confirmación de su envío, así el
+    datalogger solo descarta datos que ya están en la BD. Con la cola llena
+    se rechaza el envío en vez de acumular memoria.
+    """
+
+    def __init__(self, ventana=0.25, max_registros=50000, capacidad=2000):
+        self.ventana = ventana
+        self.max_registros = max_registros
+        self.cola = queue.Queue(maxsize=capacidad)
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='ingesta-http', daemon=True)
+                self._hilo.start()
+
+    def enviar(self, estacion, mapa, registros, timeout=30):
+        """Encola y espera la escritura. Devuelve cuántos registros se escribieron; lanza queue.Full o TimeoutError."""
+        self._iniciar()
+        envio = Envio(estacion, mapa, registros)
+        self.cola.put(envio, timeout=1)
+        if not envio.listo.wait(timeout):
+            raise TimeoutError("el escritor no confirmó el envío a tiempo")
+        if envio.error is not None:
+            raise envio.error
+        return envio.escritos
+
+    def _juntar(self):
+        envios = [self.cola.get()]
+        total = len(envios[0].registros)
+        limite = threading.Event()
+        temporizador = threading.Timer(self.ventana, limite.set)
+        temporizador.start()
+        try:
+            while total < self.max_registros and not limite.is_set():
+                try:
+                    envio = self.cola.get(timeout=0.01)
+                except queue.Empty:
+                    continue
+                envios.append(envio)
+                total += len(envio.registros)
+        finally:
+            temporizador.cancel()
+        return envios
+
+    def _escribir(self, envios):
+        limite = timezone.now() + TOLERANCIA_FUTURO
+        with transaction.atomic():
+            for envio in envios:
+                with transaction.atomic():
+                    envio.escritos = guardar_registros(envio.registros, envio.mapa.campos) if envio.registros else 0
+                    if envio.escritos:
+                        actualizar_resumenes(envio.estacion, horas_de(envio.registros))
+                        registrar_cambios(envio.estacion)
+                    avanzar_marca(envio.estacion, ultima_marca(envio.registros, limite))
+                    REGISTRO.registrar(envio.estacion, envio.mapa)
+
+    def _escribir_o_restaurar(self, envios):
+        """
+        _escribir(); si falla, el rollback deshace en la BD la marca de agua y
+        la VersionEncabezado, pero no lo que avanzar_marca y REGISTRO.registrar
+        dejaron en memoria (la estación y el mapa cacheado en REGISTRO): se
+        restaura, si no el reintento los creería guardados y no los escribiría.
+        """
+        estado = [(e.estacion, e.estacion.ultimo_timestamp, e.estacion.ultimo_record_id, e.mapa, e.mapa.version) for e in envios]
+        try:
+            self._escribir(envios)
+        except Exception:
+            for estacion, timestamp, record_id, mapa, version in reversed(estado):
+                estacion.ultimo_timestamp, estacion.ultimo_record_id = timestamp, record_id
+                mapa.version = version
+            raise
+
+    def _bucle(self):
+        while True:
+            envios = self._juntar()
+            close_old_connections()
+            try:
+                self._escribir_o_restaurar(envios)
+            except Exception:
+                # Un envío con problemas no debe tumbar a los demás: se reintenta de a uno
+                for envio in envios:
+                    try:
+                        self._escribir_o_restaurar([envio])
+                    except Exception as e:
+                        envio.error = e
+            for envio in envios:
+                envio.listo.set()
+
+
+ESCRITOR = EscritorCoalescente()
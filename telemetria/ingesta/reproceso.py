@@ -0,0 +1,100 @@
+"""
+Reproceso del archivo crudo: vuelve a parsear los .dat.gz guardados en
+RUTA_DATOS_TELEMETRIA/.archivo y los reescribe en DatosSensor sin tocar el FTP.
+
+El mapeo de columnas se infiere de nuevo con MAPEO_CAMPOS (no se usan las
+VersionEncabezado guardadas): es la forma de aplicar una corrección del mapeo
+a los datos ya importados. Los crudos se parsean en procesos aparte y el
+proceso principal es el único escritor, en el mismo orden en que se archivaron.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.db import connections, transaction
+from django.utils import timezone
+from telemetria.models import DatosSensor
+from telemetria.ingesta.pipeline import Tarea, Lectura, TAMANO_LOTE
+from telemetria.ingesta.archivo import abrir_crudo
+from telemetria.ingesta.escritor import guardar_registros, ultima_marca, avanzar_marca, registrar_cambios, TOLERANCIA_FUTURO
+from telemetria.resumenes import horas_de, actualizar_resumenes
+from telemetria.ingesta import columnar
+
+# Los registros viajan entre procesos como tuplas en este orden (más livianas que instancias)
+CAMPOS = tuple(f.attname for f in DatosSensor._meta.concrete_fields if not f.primary_key)
+
+
+def _iniciar_proceso():
+    # Con 'spawn'/'forkserver' el proceso hijo arranca sin Django configurado
+    django.setup()
+
+
+def parsear_crudo(firma, nombre, estacion, raiz=None, usar_columnar=columnar.DISPONIBLE):
+    """
+    Descomprime y parsea un crudo. Devuelve (campos mapeados, registros como
+    tuplas en el orden de CAMPOS).
+    """
+    lectura = Lectura(Tarea(nombre, estacion), abrir_crudo(firma, raiz), usar_columnar=usar_columnar)
+    try:
+        filas = [tuple(getattr(r, c) for c in CAMPOS) for r in lectura.registros()]
+        return (lectura.mapa.campos if lectura.mapa else ()), filas
+    finally:
+        lectura.cerrar()
+
+
+def guardar_filas(crudo, parseado):
+    """
+    Escribe las filas de un crudo en una transacción y avanza la marca de agua
+    de su estación (y sus resúmenes). Devuelve (registros leídos, registros escritos).
+    """
+    campos, filas = parseado
+    escritos = 0
+    marca = None
+    horas = set()
+    limite = timezone.now() + TOLERANCIA_FUTURO
+    with transaction.atomic():
+        for i in range(0, len(filas), TAMANO_LOTE):
+            registros = [DatosSensor(**dict(zip(CAMPOS, fila))) for fila in filas[i:i + TAMANO_LOTE]]
+            nuevos = guardar_registros(registros, campos)
+            if nuevos:
+                horas |= horas_de(registros)
+            escritos += nuevos
+            marca = ultima_marca(registros, limite, marca)
+        if escritos:
+            actualizar_resumenes(crudo.estacion, horas)
+            registrar_cambios(crudo.estacion)
+        avanzar_marca(crudo.estacion, marca)
+    return len(filas), escritos
+
+
+def reprocesar(crudos, workers=1, raiz=None, usar_columnar=columnar.DISPONIBLE):
+    """
+    Reprocesa los ArchivoCrudo dados (con su estación cargada) y produce
+    (crudo, (leídos, escritos), error) por cada uno, en orden. Con workers > 1 el parseo
+    corre en un pool de procesos con a lo sumo 2 × workers crudos en vuelo.
+    """
+    if workers <= 1:
+        for crudo in crudos:
+            try:
+                yield crudo, guardar_filas(crudo, parsear_crudo(crudo.firma, crudo.nombre, crudo.estacion, raiz, usar_columnar)), None
+            except Exception as e:
+                yield crudo, (0, 0), e
+        return
+
+    # Los hijos no deben heredar la conexión abierta a la BD
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_proceso) as pool:
+        en_vuelo = deque()
+
+        def siguiente():
+            crudo, futuro = en_vuelo.popleft()
+            try:
+                return crudo, guardar_filas(crudo, futuro.result()), None
+            except Exception as e:
+                return crudo, (0, 0), e
+
+        for crudo in crudos:
+            en_vuelo.append((crudo, pool.submit(parsear_crudo, crudo.firma, crudo.nombre, crudo.estacion, raiz, usar_columnar)))
+            if len(en_vuelo) >= workers * 2:
+                yield siguiente()
+        while en_vuelo:
+            yield siguiente()
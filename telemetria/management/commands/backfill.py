@@ -0,0 +1,151 @@
+import os
+import time
+import queue
+import tarfile
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from telemetria.ingesta.estaciones import CacheEstaciones
+from telemetria.ingesta.escritor import guardar_registros, ultima_marca, avanzar_marca, registrar_cambios, TOLERANCIA_FUTURO
+from telemetria.ingesta.backfill import (
+    TAMANO_LOTE, archivos_por_estacion, extraer_tar, desempacar,
+    iniciar_proceso, parsear_estacion, sin_indices_secundarios,
+)
+from telemetria.ingesta import columnar
+from telemetria import resumenes
+
+# Segundos entre reportes de avance
+INTERVALO_AVANCE = 5
+
+class Command(BaseCommand):
+    help = 'Carga histórica: importa en paralelo (un proceso por estación) una carpeta o tarball de archivos .dat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('origen', help='Carpeta (se recorre completa) o tarball (.tar, .tar.gz, ...) con los H_*.dat.')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Procesos que parsean en paralelo (cada uno toma una estación completa).'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=TAMANO_LOTE,
+            help='Registros por lote enviado al escritor.'
+        )
+        parser.add_argument(
+            '--diferir-indices', action='store_true',
+            help='Borra los índices secundarios de DatosSensor durante la carga y los recrea al final.'
+        )
+        parser.add_argument(
+            '--por-filas', action='store_true',
+            help='Usa el parseo fila por fila en vez del columnar con NumPy.'
+        )
+
+    def handle(self, *args, **kwargs):
+        origen = kwargs['origen']
+        if os.path.isdir(origen):
+            return self.cargar(origen, **kwargs)
+        if not os.path.isfile(origen) or not tarfile.is_tarfile(origen):
+            raise CommandError(f"{origen} no es una carpeta ni un tarball legible")
+
+        with tempfile.TemporaryDirectory(prefix='backfill-') as carpeta:
+            print(f"📦 Extrayendo {origen}...")
+            extraer_tar(origen, carpeta)
+            return self.cargar(carpeta, **kwargs)
+
+    def cargar(self, carpeta, **kwargs):
+        grupos = archivos_por_estacion(carpeta)
+        estaciones = CacheEstaciones().cargar()
+        trabajos = []
+        for codigo, rutas in sorted(grupos.items(), key=lambda g: -sum(os.path.getsize(r) for r in g[1])):
+            estacion = estaciones.obtener(codigo, os.path.basename(rutas[0]))
+            if estacion is not None:
+                trabajos.append((estacion, rutas))
+        resumen = estaciones.resumen_desconocidos()
+        if resumen:
+            print(f"⚠️ {resumen}")
+        if not trabajos:
+            print("No hay archivos de estaciones conocidas para cargar.")
+            return
+
+        total_archivos = sum(len(r) for _, r in trabajos)
+        procesos = max(1, min(kwargs['workers'], len(trabajos)))
+        print(f"📂 {total_archivos} archivos de {len(trabajos)} estaciones, {procesos} procesos.")
+
+        if kwargs.get('diferir_indices'):
+            with sin_indices_secundarios() as indices:
+                print(f"🔧 Índices secundarios desactivados durante la carga: {', '.join(indices) or 'ninguno'}")
+                self.procesar(trabajos, procesos, total_archivos, **kwargs)
+                print("🔧 Recreando índices secundarios...")
+        else:
+            self.procesar(trabajos, procesos, total_archivos, **kwargs)
+
+    def procesar(self, trabajos, procesos, total_archivos, **kwargs):
+        usar_columnar = columnar.DISPONIBLE and not kwargs.get('por_filas')
+        por_pk = {e.pk: e for e, _ in trabajos}
+        marcas = {}
+        rangos = {}  # pk -> (primer, último) timestamp escrito, para sus resúmenes
+        limite = timezone.now() + TOLERANCIA_FUTURO
+        leidos = escritos = archivos = errores = 0
+        pendientes = len(trabajos)
+
+        # Los hijos no deben heredar la conexión abierta a la BD
+        connections.close_all()
+        contexto = multiprocessing.get_context()
+        # Cola acotada: si el escritor es el cuello de botella, los procesos esperan
+        cola = contexto.Queue(maxsize=procesos * 4)
+        inicio = ultimo_reporte = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto, initializer=iniciar_proceso, initargs=(cola,)) as pool:
+            futuros = [
+                pool.submit(parsear_estacion, estacion, rutas, usar_columnar, kwargs['lote'])
+                for estacion, rutas in trabajos
+            ]
+
+            while pendientes:
+                try:
+                    tipo, pk, *datos = cola.get(timeout=INTERVALO_AVANCE)
+                except queue.Empty:
+                    # Un proceso que murió (p. ej. sin memoria) nunca manda su 'fin'
+                    for futuro in futuros:
+                        if futuro.done() and futuro.exception() is not None:
+                            raise CommandError(f"Un proceso del backfill falló: {futuro.exception()}")
+                    continue
+                if tipo == 'lote':
+                    campos, columnas = datos
+                    registros = desempacar(columnas, pk)
+                    with transaction.atomic():
+                        nuevos = guardar_registros(registros, campos)
+                    if nuevos:
+                        fechas = [r.timestamp for r in registros]
+                        primero, ultimo = rangos.get(pk, (min(fechas), max(fechas)))
+                        rangos[pk] = (min(primero, *fechas), max(ultimo, *fechas))
+                    escritos += nuevos
+                    leidos += len(registros)
+                    marcas[pk] = ultima_marca(registros, limite, marcas.get(pk))
+                elif tipo == 'archivo':
+                    archivos += 1
+                elif tipo == 'error':
+                    errores += 1
+                    print(f"   [X] {datos[0]}: {datos[1]}")
+                elif tipo == 'fin':
+                    pendientes -= 1
+                    avanzar_marca(por_pk[pk], marcas.get(pk))
+                    if pk in rangos:
+                        # Los resúmenes se rehacen una vez por estación, no por lote
+                        for _ in resumenes.reconstruir(por_pk[pk], *rangos[pk]): pass
+                        registrar_cambios(por_pk[pk])
+                    print(f"   [✔] {por_pk[pk].nombre} terminada.")
+
+                ahora = time.monotonic()
+                if ahora - ultimo_reporte >= INTERVALO_AVANCE:
+                    ultimo_reporte = ahora
+                    ritmo = leidos / (ahora - inicio)
+                    print(f"   ⏱️ {archivos}/{total_archivos} archivos, {len(trabajos) - pendientes}/{len(trabajos)} estaciones, "
+                          f"{leidos} registros ({ritmo:,.0f}/s)")
+
+        duracion = time.monotonic() - inicio
+        print(f"✅ --- Backfill Finalizado: {leidos} registros leídos, {escritos} escritos en {duracion:.1f}s "
+              f"({leidos / max(duracion, 1e-9):,.0f}/s, {errores} archivos con error) ---")
+
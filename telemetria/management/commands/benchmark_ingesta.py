@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from telemetria.ingesta import benchmark
+
+class Command(BaseCommand):
+    help = ('Benchmark de importar_ftp con archivos sintéticos y un FTP local: mide filas/s, tiempo de escritura '
+            'y pico de memoria por escenario y falla si alguno empeora respecto de la línea base.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escenario', action='append', choices=sorted(benchmark.ESCENARIOS), default=[],
+            help='Escenario a correr (se puede repetir). Por defecto, todos.'
+        )
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.3,
+            help='Empeoramiento admitido respecto de la base, como fracción (0.3 = 30%%).'
+        )
+        parser.add_argument(
+            '--base', default=benchmark.RUTA_BASE,
+            help='Archivo JSON con la línea base de esta máquina (si no existe, la primera corrida la crea).'
+        )
+        parser.add_argument(
+            '--guardar-base', action='store_true',
+            help='Guarda los resultados como nueva línea base en vez de comparar (correr en la máquina de referencia).'
+        )
+        # Uso interno: corre un escenario en este proceso e imprime el resultado en JSON
+        parser.add_argument('--hijo', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **kwargs):
+        if not benchmark.DISPONIBLE:
+            raise CommandError("El benchmark necesita pyftpdlib (pip install pyftpdlib).")
+
+        if kwargs.get('hijo'):
+            resultado = benchmark.ejecutar_escenario(benchmark.ESCENARIOS[kwargs['hijo']])
+            print(json.dumps(resultado))
+            return
+
+        nombres = kwargs['escenario'] or list(benchmark.ESCENARIOS)
+        base = benchmark.cargar_base(kwargs['base'])
+        resultados, fallas = [], []
+        for nombre in nombres:
+            print(f"🏁 Escenario {nombre}...")
+            resultado = self.correr(nombre)
+            resultados.append(resultado)
+            print(f"   {resultado['filas']:,} filas en {resultado['segundos']:.2f}s → {resultado['filas_por_segundo']:,} filas/s | "
+                  f"descarga {resultado['descarga_s']:.2f}s, parseo {resultado['parseo_s']:.2f}s, "
+                  f"escritura {resultado['escritura_s']:.2f}s | pico {resultado['memoria_pico_mb']:.0f} MB")
+            if not kwargs['guardar_base']:
+                for mensaje in benchmark.regresiones(resultado, base, kwargs['tolerancia']):
+                    print(f"   [X] Regresión en {mensaje}")
+                    fallas.append(f"{nombre}: {mensaje}")
+
+        if kwargs['guardar_base']:
+            benchmark.guardar_base(resultados, kwargs['base'])
+            print(f"💾 Línea base guardada en {kwargs['base']}")
+            return
+
+        # Los tiempos dependen de la máquina: sin referencia previa, esta corrida pasa a serlo
+        nuevos = [r for r in resultados if r['escenario'] not in base]
+        if nuevos:
+            benchmark.guardar_base(nuevos, kwargs['base'])
+            print(f"💾 Sin línea base para {', '.join(r['escenario'] for r in nuevos)}: se guardó esta corrida en {kwargs['base']}")
+        if fallas:
+            raise CommandError(f"{len(fallas)} regresiones respecto de la línea base.")
+        print("✅ --- Sin regresiones ---")
+
+    def correr(self, nombre):
+        """Corre el escenario en un proceso nuevo: así su pico de memoria (ru_maxrss) es solo suyo."""
+        proceso = subprocess.Popen(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_ingesta', '--hijo', nombre],
+            stdout=subprocess.PIPE, text=True,
+        )
+        salida = proceso.stdout.read()
+        proceso.stdout.close()
+        _, estado, uso = os.wait4(proceso.pid, 0)
+        proceso.returncode = os.waitstatus_to_exitcode(estado)
+        if proceso.returncode != 0:
+            raise CommandError(f"El escenario {nombre} falló (código {proceso.returncode}).")
+
+        resultado = json.loads(salida.strip().splitlines()[-1])
+        # ru_maxrss viene en KB en Linux y en bytes en macOS
+        pico = uso.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        resultado['memoria_pico_mb'] = round(pico, 1)
+        return resultado
@@ -0,0 +1,49 @@
+import time
+from datetime import datetime, timezone as tz
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from telemetria.models import Estacion
+from telemetria import resumenes
+from telemetria.ingesta.escritor import registrar_cambios
+
+class Command(BaseCommand):
+    help = ('Rehace los resúmenes por hora y por día (ResumenSensor) desde DatosSensor. '
+            'Correr una vez después de migrar, o si se borraron o cargaron lecturas por fuera del importador.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estacion', action='append', default=[],
+            help='Código de estación (se puede repetir). Por defecto, todas.'
+        )
+        parser.add_argument('--desde', help='Primer día a rehacer (AAAA-MM-DD). Por defecto, la primera lectura.')
+        parser.add_argument('--hasta', help='Último día a rehacer (AAAA-MM-DD). Por defecto, la última lectura.')
+
+    def handle(self, *args, **kwargs):
+        desde, hasta = self.fecha(kwargs['desde']), self.fecha(kwargs['hasta'])
+        estaciones = Estacion.objects.order_by('codigo_identificador')
+        if kwargs['estacion']:
+            estaciones = estaciones.filter(codigo_identificador__in=kwargs['estacion'])
+
+        inicio = time.monotonic()
+        for estacion in estaciones:
+            tramos = 0
+            for _ in resumenes.reconstruir(estacion, desde, hasta):
+                tramos += 1
+            if tramos:
+                # Las respuestas por hora/día cambian: nuevos ETag y aviso a los dashboards
+                registrar_cambios(estacion)
+                print(f"   [✔] {estacion.nombre}: {tramos} tramos de hasta {resumenes.TRAMO_RECONSTRUCCION.days} días")
+            else:
+                print(f"   [=] {estacion.nombre}: sin lecturas")
+        print(f"✅ --- Resúmenes reconstruidos en {time.monotonic() - inicio:.1f}s ---")
+
+    def fecha(self, valor):
+        if not valor:
+            return None
+        try:
+            dia = parse_date(valor)
+        except ValueError:
+            dia = None
+        if dia is None:
+            raise CommandError(f"Fecha inválida: {valor} (se espera AAAA-MM-DD)")
+        return datetime.combine(dia, datetime.min.time(), tzinfo=tz.utc)
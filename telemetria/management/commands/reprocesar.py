@@ -0,0 +1,46 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from telemetria.models import ArchivoCrudo
+from telemetria.ingesta.reproceso import reprocesar
+from telemetria.ingesta import columnar
+
+class Command(BaseCommand):
+    help = 'Reprocesa el archivo crudo (RUTA_DATOS_TELEMETRIA/.archivo) hacia DatosSensor sin conectarse al FTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estacion', action='append', default=[],
+            help='Código de estación a reprocesar (se puede repetir). Por defecto, todas.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Procesos que descomprimen y parsean en paralelo (la escritura es siempre una sola).'
+        )
+        parser.add_argument(
+            '--por-filas', action='store_true',
+            help='Usa el parseo fila por fila en vez del columnar con NumPy.'
+        )
+
+    def handle(self, *args, **kwargs):
+        crudos = ArchivoCrudo.objects.filter(estacion__isnull=False).select_related('estacion')
+        if kwargs['estacion']:
+            crudos = crudos.filter(estacion__codigo_identificador__in=kwargs['estacion'])
+        crudos = list(crudos)
+        workers = max(1, kwargs['workers'])
+        print(f"🗄️ {len(crudos)} archivos crudos a reprocesar con {workers} procesos.")
+
+        inicio = time.monotonic()
+        total = escritos = errores = 0
+        resultados = reprocesar(crudos, workers, usar_columnar=columnar.DISPONIBLE and not kwargs.get('por_filas'))
+        for crudo, (leidos, guardados), error in resultados:
+            if error is not None:
+                errores += 1
+                print(f"   [X] {crudo.nombre} ({crudo.firma[:12]}): {error}")
+                continue
+            total += leidos
+            escritos += guardados
+            print(f"   [✔] {crudo.nombre} @{crudo.inicio}: {leidos} registros, {guardados} escritos")
+
+        duracion = time.monotonic() - inicio
+        print(f"✅ --- Reproceso Finalizado: {total} registros ({escritos} escritos) en {duracion:.1f}s ({errores} con error) ---")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from telemetria.models import Estacion
+
+class Command(BaseCommand):
+    help = 'Genera (o reemplaza) el token con el que el datalogger de una estación envía datos a /api/v1/ingesta/<codigo>/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('codigo', help='Código identificador de la estación.')
+
+    def handle(self, *args, **kwargs):
+        estacion = Estacion.objects.filter(codigo_identificador=kwargs['codigo']).first()
+        if estacion is None:
+            raise CommandError(f"No existe la estación {kwargs['codigo']}")
+        token = estacion.generar_token_ingesta()
+        print(f"🔑 Token de ingesta para {estacion.nombre} (guárdelo: no se puede volver a mostrar):")
+        print(token)
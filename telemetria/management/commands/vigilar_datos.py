@@ -0,0 +1,58 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from telemetria.ingesta.local import FuenteLocal, Vigilante
+from telemetria.ingesta.importador import Importador
+from telemetria.ingesta.parser import obtener_codigo_estacion
+from telemetria.ingesta.archivo import raiz_archivo
+from telemetria.ingesta import columnar
+
+# Como mucho una recarga de estaciones por minuto cuando aparecen códigos desconocidos
+RECARGA_ESTACIONES = 60
+
+class Command(BaseCommand):
+    help = 'Demonio: importa cada .dat de RUTA_DATOS_TELEMETRIA segundos después de que el datalogger termina de escribirlo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre sondeos (si no hay inotify).')
+        parser.add_argument('--espera', type=float, default=2, help='Segundos sin cambios antes de importar un archivo.')
+        parser.add_argument('--sondeo', action='store_true', help='Fuerza el sondeo por mtime/tamaño aunque haya inotify.')
+        parser.add_argument('--por-filas', action='store_true', help='Usa el parseo fila por fila en vez del columnar con NumPy.')
+        parser.add_argument('--sin-archivo', action='store_true', help='No guarda la copia comprimida de lo leído en RUTA_DATOS_TELEMETRIA/.archivo.')
+
+    def handle(self, *args, **kwargs):
+        fuente = FuenteLocal(settings.RUTA_DATOS_TELEMETRIA)
+        importador = Importador(
+            usar_columnar=columnar.DISPONIBLE and not kwargs.get('por_filas'),
+            archivo=None if kwargs.get('sin_archivo') else raiz_archivo(),
+        )
+        importador.preparar()
+        ultima_carga = time.monotonic()
+
+        # Puesta al día: lo que llegó mientras el demonio estaba detenido
+        print(f"📁 Importando pendientes en {fuente.raiz}...")
+        importador.importar(fuente, fuente.listar_archivos())
+
+        vigilante = Vigilante(
+            fuente,
+            intervalo=kwargs['intervalo'],
+            espera=kwargs['espera'],
+            usar_inotify=not kwargs.get('sondeo'),
+        )
+        print(f"👀 Vigilando {fuente.raiz} ({vigilante.modo}). Ctrl+C para salir.")
+
+        try:
+            while True:
+                archivos = vigilante.esperar()
+                if not archivos: continue
+                # Estaciones creadas mientras el demonio corría
+                desconocido = any(obtener_codigo_estacion(n) in importador.estaciones.desconocidos for n in archivos)
+                if desconocido and time.monotonic() - ultima_carga > RECARGA_ESTACIONES:
+                    importador.preparar()
+                    ultima_carga = time.monotonic()
+                importador.importar(fuente, archivos)
+                importador.informar_desconocidos()
+        except KeyboardInterrupt:
+            print("\n🛑 Vigilancia detenida.")
+        finally:
+            vigilante.cerrar()
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0004_empresa_plan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoImportado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Nombre del archivo en el FTP (ej: H_..._21738.dat)', max_length=255, unique=True)),
+                ('tamano', models.BigIntegerField(default=0, verbose_name='Tamaño (bytes)')),
+                ('mtime', models.CharField(blank=True, help_text='Fecha de modificación reportada por el FTP (YYYYMMDDHHMMSS)', max_length=20)),
+                ('offset', models.BigIntegerField(default=0, help_text='Último byte procesado (fin de la última línea completa)')),
+                ('encabezado', models.TextField(blank=True, help_text='Primera línea del archivo, reutilizada al leer solo la cola')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Archivo Importado',
+                'verbose_name_plural': 'Archivos Importados',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0005_archivoimportado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionEncabezado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('firma', models.CharField(help_text='SHA-1 de la línea de encabezado', max_length=40)),
+                ('encabezado', models.TextField()),
+                ('columnas', models.JSONField(default=dict, help_text='Índice de columna por campo de DatosSensor')),
+                ('fecha_deteccion', models.DateTimeField(auto_now_add=True)),
+                ('estacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versiones_encabezado', to='telemetria.estacion')),
+            ],
+            options={
+                'verbose_name': 'Versión de Encabezado',
+                'verbose_name_plural': 'Versiones de Encabezado',
+                'ordering': ['estacion', '-version'],
+                'unique_together': {('estacion', 'firma'), ('estacion', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0006_versionencabezado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estacion',
+            name='intervalo_envio',
+            field=models.PositiveIntegerField(blank=True, help_text='Minutos entre envíos del datalogger. Vacío = se estima', null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:38
+
+from datetime import timedelta
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def inicializar_marcas(apps, schema_editor):
+    # Las estaciones con datos arrancan con la marca en su último registro
+    # (ignorando fechas futuras de relojes adelantados, como el importador)
+    limite = timezone.now() + timedelta(days=1)
+    Estacion = apps.get_model('telemetria', 'Estacion')
+    DatosSensor = apps.get_model('telemetria', 'DatosSensor')
+    for estacion in Estacion.objects.all():
+        ultimo = (DatosSensor.objects.filter(estacion=estacion, timestamp__lte=limite)
+                  .order_by('-timestamp', '-record_id')
+                  .values_list('timestamp', 'record_id').first())
+        if ultimo:
+            Estacion.objects.filter(pk=estacion.pk).update(ultimo_timestamp=ultimo[0], ultimo_record_id=ultimo[1])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0007_estacion_intervalo_envio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estacion',
+            name='ultimo_record_id',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='estacion',
+            name='ultimo_timestamp',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(inicializar_marcas, migrations.RunPython.noop),
+    ]
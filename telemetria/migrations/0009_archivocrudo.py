@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0008_estacion_marca_agua'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoCrudo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('firma', models.CharField(help_text='SHA-256 del contenido sin comprimir', max_length=64, unique=True)),
+                ('nombre', models.CharField(help_text='Archivo de origen (ej: H_..._21738.dat)', max_length=255)),
+                ('inicio', models.BigIntegerField(default=0, help_text='Byte del archivo de origen donde empiezan las líneas archivadas')),
+                ('tamano', models.BigIntegerField(default=0, verbose_name='Tamaño (bytes)')),
+                ('tamano_comprimido', models.BigIntegerField(default=0, verbose_name='Tamaño comprimido (bytes)')),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True)),
+                ('estacion', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archivos_crudos', to='telemetria.estacion')),
+            ],
+            options={
+                'verbose_name': 'Archivo Crudo',
+                'verbose_name_plural': 'Archivos Crudos',
+                'ordering': ['fecha_archivo', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0009_archivocrudo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datossensor',
+            name='hash_contenido',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0010_datossensor_hash_contenido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estacion',
+            name='token_ingesta',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0011_estacion_token_ingesta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenSensor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolucion', models.CharField(choices=[('hora', 'Hora'), ('dia', 'Día')], max_length=4)),
+                ('inicio', models.DateTimeField(verbose_name='Inicio del bucket')),
+                ('campo', models.CharField(help_text='Nombre del campo de DatosSensor', max_length=40)),
+                ('minimo', models.FloatField()),
+                ('maximo', models.FloatField()),
+                ('suma', models.FloatField()),
+                ('conteo', models.PositiveIntegerField(help_text='Lecturas con valor en el bucket')),
+                ('primero', models.FloatField(help_text='Primer valor del bucket')),
+                ('ultimo', models.FloatField(help_text='Último valor del bucket')),
+                ('estacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='telemetria.estacion')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Lecturas',
+                'verbose_name_plural': 'Resúmenes de Lecturas',
+                'unique_together': {('estacion', 'resolucion', 'inicio', 'campo')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telemetria', '0012_resumensensor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estacion',
+            name='datos_modificados',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='estacion',
+            name='generacion_datos',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings
 import os
+import hmac
+import hashlib
+import secrets
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -85,6 +88,21 @@ class Estacion(models.Model):
     limite_oxigeno_min = models.FloatField(default=4.0, help_text="Alerta si baja de este valor")
     limite_bateria_min = models.FloatField(default=11.5, help_text="Alerta si baja de este valor")
 
+    # Cada cuánto sube archivos el datalogger (lo usa el demonio de ingesta para agendar la estación)
+    intervalo_envio = models.PositiveIntegerField(null=True, blank=True, help_text="Minutos entre envíos del datalogger. Vacío = se estima")
+
+    # Marca de agua del importador: último (timestamp, record_id) guardado
+    ultimo_timestamp = models.DateTimeField(null=True, blank=True, editable=False)
+    ultimo_record_id = models.IntegerField(null=True, blank=True, editable=False)
+
+    # Sube cada vez que una importación escribe lecturas de la estación (también
+    # correcciones de datos viejos): con ella la API de lecturas arma su ETag
+    generacion_datos = models.PositiveBigIntegerField(default=0, editable=False)
+    datos_modificados = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Token para que el datalogger envíe datos por HTTP (solo se guarda su SHA-256)
+    token_ingesta = models.CharField(max_length=64, blank=True, editable=False)
+
     class Meta:
         verbose_name = "Estación"
         verbose_name_plural = "Estaciones"
@@ -110,6 +128,30 @@ class Estacion(models.Model):
         else:
             print(f"ℹ️ La carpeta ya existía: {ruta_carpeta}")
 
+    def generar_token_ingesta(self):
+        """Crea un token nuevo para la API de ingesta y devuelve el texto plano (no se puede recuperar después)."""
+        token = secrets.token_urlsafe(32)
+        self.token_ingesta = hashlib.sha256(token.encode()).hexdigest()
+        Estacion.objects.filter(pk=self.pk).update(token_ingesta=self.token_ingesta)
+        return token
+
+    def verificar_token_ingesta(self, token):
+        if not self.token_ingesta or not token:
+            return False
+        return hmac.compare_digest(self.token_ingesta, hashlib.sha256(token.encode()).hexdigest())
+
+    @property
+    def marca_agua(self):
+        """(timestamp, record_id) del último registro importado, o None si no hay."""
+        if self.ultimo_timestamp is None:
+            return None
+        return (self.ultimo_timestamp, self.ultimo_record_id or 0)
+
+    @property
+    def version_encabezado(self):
+        """Versión de encabezado (programa del datalogger) más reciente detectada por el importador."""
+        return self.versiones_encabezado.order_by('-version').first()
+
     def __str__(self):
         return f"{self.nombre} ({self.codigo_identificador})"
 
@@ -154,6 +196,10 @@ class DatosSensor(models.Model):
     
     orp = models.FloatField(null=True, blank=True, verbose_name="ORP (mV)")
 
+    # Hash de los valores con que el importador escribió la fila: una reimportación
+    # solo reescribe las filas cuyo contenido cambió
+    hash_contenido = models.BigIntegerField(null=True, blank=True, editable=False)
+
     class Meta:
         # Evita duplicados por estación
         unique_together = ('estacion', 'timestamp', 'record_id')
@@ -165,6 +211,42 @@ class DatosSensor(models.Model):
         return f"{self.estacion.codigo_identificador} - {self.timestamp}"
 
 
+# ==========================================
+# 4b. RESÚMENES POR HORA Y POR DÍA (Rollups de DatosSensor)
+# ==========================================
+class ResumenSensor(models.Model):
+    # Una fila por estación, resolución, inicio del bucket (UTC) y campo de
+    # DatosSensor. Las mantiene el importador (ver telemetria/resumenes.py).
+    RESOLUCIONES = [
+        ('hora', 'Hora'),
+        ('dia', 'Día'),
+    ]
+    estacion = models.ForeignKey(Estacion, on_delete=models.CASCADE, related_name='resumenes')
+    resolucion = models.CharField(max_length=4, choices=RESOLUCIONES)
+    inicio = models.DateTimeField(verbose_name="Inicio del bucket")
+    campo = models.CharField(max_length=40, help_text="Nombre del campo de DatosSensor")
+
+    minimo = models.FloatField()
+    maximo = models.FloatField()
+    suma = models.FloatField()
+    conteo = models.PositiveIntegerField(help_text="Lecturas con valor en el bucket")
+    primero = models.FloatField(help_text="Primer valor del bucket")
+    ultimo = models.FloatField(help_text="Último valor del bucket")
+
+    class Meta:
+        # El índice único también sirve para leer un rango de una estación
+        unique_together = ('estacion', 'resolucion', 'inicio', 'campo')
+        verbose_name = "Resumen de Lecturas"
+        verbose_name_plural = "Resúmenes de Lecturas"
+
+    @property
+    def promedio(self):
+        return self.suma / self.conteo
+
+    def __str__(self):
+        return f"{self.estacion_id} {self.resolucion} {self.inicio:%Y-%m-%d %H:%M} {self.campo}"
+
+
 # ==========================================
 # 5. NOTIFICACIONES (Alertas del Sistema)
 # ==========================================
@@ -186,6 +268,79 @@ class Notificacion(models.Model):
     def __str__(self):
         return f"[{self.tipo.upper()}] {self.estacion.nombre}: {self.mensaje}"
 
+
+# ==========================================
+# 6. MANIFIESTO DE IMPORTACIÓN (Estado por archivo .dat)
+# ==========================================
+class ArchivoImportado(models.Model):
+    # Los dataloggers solo agregan líneas al final del archivo: guardamos hasta
+    # qué byte ya procesamos para pedir por FTP (REST) únicamente la cola nueva.
+    nombre = models.CharField(max_length=255, unique=True, help_text="Nombre del archivo en el FTP (ej: H_..._21738.dat)")
+    tamano = models.BigIntegerField(default=0, verbose_name="Tamaño (bytes)")
+    mtime = models.CharField(max_length=20, blank=True, help_text="Fecha de modificación reportada por el FTP (YYYYMMDDHHMMSS)")
+    offset = models.BigIntegerField(default=0, help_text="Último byte procesado (fin de la última línea completa)")
+    encabezado = models.TextField(blank=True, help_text="Primera línea del archivo, reutilizada al leer solo la cola")
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Archivo Importado"
+        verbose_name_plural = "Archivos Importados"
+
+    def sin_cambios(self, tamano, mtime):
+        return self.tamano == tamano and self.mtime == (mtime or '')
+
+    def __str__(self):
+        return f"{self.nombre} ({self.offset}/{self.tamano} bytes)"
+
+
+# ==========================================
+# 7. VERSIONES DE ENCABEZADO (Programa del datalogger)
+# ==========================================
+class VersionEncabezado(models.Model):
+    # Cada encabezado distinto (identificado por su hash) que envía una estación
+    # queda registrado con el mapeo de columnas que le corresponde. Un encabezado
+    # nuevo indica que cambió el programa del datalogger.
+    estacion = models.ForeignKey(Estacion, on_delete=models.CASCADE, related_name='versiones_encabezado')
+    version = models.PositiveIntegerField()
+    firma = models.CharField(max_length=40, help_text="SHA-1 de la línea de encabezado")
+    encabezado = models.TextField()
+    columnas = models.JSONField(default=dict, help_text="Índice de columna por campo de DatosSensor")
+    fecha_deteccion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = [('estacion', 'firma'), ('estacion', 'version')]
+        ordering = ['estacion', '-version']
+        verbose_name = "Versión de Encabezado"
+        verbose_name_plural = "Versiones de Encabezado"
+
+    def __str__(self):
+        return f"{self.estacion.codigo_identificador} v{self.version} ({self.firma[:8]})"
+
+
+# ==========================================
+# 8. ARCHIVO CRUDO (Copia comprimida de lo descargado)
+# ==========================================
+class ArchivoCrudo(models.Model):
+    # Cada tramo descargado de un .dat (encabezado + líneas nuevas) se guarda
+    # comprimido en RUTA_DATOS_TELEMETRIA/.archivo, con el SHA-256 de su contenido
+    # como nombre: una resubida idéntica se guarda una sola vez. Sirve para
+    # reprocesar sin volver a descargar del FTP.
+    firma = models.CharField(max_length=64, unique=True, help_text="SHA-256 del contenido sin comprimir")
+    nombre = models.CharField(max_length=255, help_text="Archivo de origen (ej: H_..._21738.dat)")
+    estacion = models.ForeignKey(Estacion, on_delete=models.SET_NULL, null=True, related_name='archivos_crudos')
+    inicio = models.BigIntegerField(default=0, help_text="Byte del archivo de origen donde empiezan las líneas archivadas")
+    tamano = models.BigIntegerField(default=0, verbose_name="Tamaño (bytes)")
+    tamano_comprimido = models.BigIntegerField(default=0, verbose_name="Tamaño comprimido (bytes)")
+    fecha_archivo = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['fecha_archivo', 'id']
+        verbose_name = "Archivo Crudo"
+        verbose_name_plural = "Archivos Crudos"
+
+    def __str__(self):
+        return f"{self.nombre} @{self.inicio} ({self.firma[:12]})"
+
 @receiver(post_save, sender=User)
 def crear_perfil_usuario(sender, instance, created, **kwargs):
     if created:
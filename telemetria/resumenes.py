@@ -0,0 +1,285 @@
+"""
+Resúmenes por hora y por día (ResumenSensor) de cada campo numérico de
+DatosSensor: mínimo, máximo, suma, conteo, primero y último del bucket.
+
+- El importador los mantiene dentro de su misma transacción: anota las horas
+  en las que escribió filas y al final recalcula solo esos buckets (los de
+  hora desde las lecturas, los de día desde sus horas). Recalcular en vez de
+  sumar hace que una reimportación con valores corregidos también quede bien.
+- reconstruir() los rehace para un rango completo (comando reconstruir_resumenes).
+- La API de lecturas elige con resolucion_para() si lee DatosSensor o un resumen
+  (acolumnas_resumidas(), con el ORM async).
+
+Los buckets van en UTC. Con NumPy la agregación por hora es vectorizada; sin
+NumPy se usa la misma lógica en Python puro.
+"""
+import math
+from datetime import timedelta, timezone as tz
+from django.db import models, transaction, connection
+from telemetria.models import DatosSensor, ResumenSensor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional, igual que en la ingesta
+    np = None
+
+HORA = 'hora'
+DIA = 'dia'
+DURACION = {HORA: timedelta(hours=1), DIA: timedelta(days=1)}
+
+# Campos resumidos: los de valor numérico (los *_tmax son fechas)
+CAMPOS = tuple(f.name for f in DatosSensor._meta.concrete_fields if isinstance(f, models.FloatField))
+
+# Columnas de ResumenSensor en el orden de los buckets calculados
+COLUMNAS = ('estacion', 'resolucion', 'inicio', 'campo', 'minimo', 'maximo', 'suma', 'conteo', 'primero', 'ultimo')
+
+# Hasta qué ventana se leen las lecturas crudas y hasta cuál los resúmenes por hora
+VENTANA_CRUDA = timedelta(days=7)
+VENTANA_HORA = timedelta(days=92)
+
+# Horas leídas de DatosSensor por consulta al recalcular (acota la memoria)
+HORAS_POR_LECTURA = timedelta(days=1)
+
+# Rango que reconstruir() recalcula por transacción
+TRAMO_RECONSTRUCCION = timedelta(days=31)
+
+
+def truncar(ts, resolucion):
+    """Inicio (UTC) del bucket de `resolucion` que contiene a `ts`."""
+    ts = ts.astimezone(tz.utc).replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if resolucion == DIA else ts
+
+
+def tramos(inicios, paso, maximo=None):
+    """Inicios de bucket -> [(desde, hasta)] de buckets contiguos (de a lo sumo `maximo`), con `hasta` exclusivo."""
+    rangos = []
+    for inicio in sorted(inicios):
+        if rangos and rangos[-1][1] == inicio and (maximo is None or inicio + paso - rangos[-1][0] <= maximo):
+            rangos[-1][1] = inicio + paso
+        else:
+            rangos.append([inicio, inicio + paso])
+    return [tuple(r) for r in rangos]
+
+
+def resolucion_para(desde, hasta):
+    """None (lecturas crudas), HORA o DIA según el largo de la ventana."""
+    ventana = hasta - desde
+    if ventana <= VENTANA_CRUDA:
+        return None
+    return HORA if ventana <= VENTANA_HORA else DIA
+
+
+# ==========================================
+#  AGREGACIÓN
+# ==========================================
+
+def _agregar_python(filas):
+    """{(hora, campo): [mín, máx, suma, conteo, primero, último]} de filas (timestamp, *CAMPOS) ordenadas."""
+    buckets = {}
+    for ts, *valores in filas:
+        hora = truncar(ts, HORA)
+        for campo, valor in zip(CAMPOS, valores):
+            if valor is None or math.isnan(valor): continue
+            b = buckets.get((hora, campo))
+            if b is None:
+                buckets[(hora, campo)] = [valor, valor, valor, 1, valor, valor]
+                continue
+            if valor < b[0]: b[0] = valor
+            if valor > b[1]: b[1] = valor
+            b[2] += valor
+            b[3] += 1
+            b[5] = valor
+    return buckets
+
+
+def _agregar_numpy(filas):
+    """Lo mismo que _agregar_python, por columnas: reduceat sobre los tramos de cada hora."""
+    if not filas:
+        return {}
+    columnas = list(zip(*filas))
+    segundos = np.array([ts.timestamp() for ts in columnas[0]], dtype=np.float64)
+    horas = (segundos // 3600).astype(np.int64)
+    inicios = np.flatnonzero(np.r_[True, horas[1:] != horas[:-1]])
+    bucket = np.repeat(np.arange(len(inicios)), np.diff(np.r_[inicios, len(horas)]))
+    # Hora de cada bucket como datetime (los timestamps ya vienen ordenados)
+    etiquetas = [truncar(columnas[0][i], HORA) for i in inicios]
+
+    buckets = {}
+    for campo, valores in zip(CAMPOS, columnas[1:]):
+        # None -> NaN al convertir a float64
+        y = np.array(valores, dtype=np.float64)
+        validos = ~np.isnan(y)
+        if not validos.any(): continue
+        conteo = np.add.reduceat(validos, inicios)
+        # fmin/fmax ignoran los NaN (si todo el bucket es NaN, conteo == 0 y se descarta)
+        minimo = np.fmin.reduceat(y, inicios)
+        maximo = np.fmax.reduceat(y, inicios)
+        suma = np.add.reduceat(np.where(validos, y, 0.0), inicios)
+        posiciones = np.flatnonzero(validos)
+        # Primera y última posición con valor de cada bucket
+        con_valor, primeras = np.unique(bucket[posiciones], return_index=True)
+        _, ultimas = np.unique(bucket[posiciones][::-1], return_index=True)
+        primero = y[posiciones[primeras]]
+        ultimo = y[posiciones[::-1][ultimas]]
+        for j, b in enumerate(con_valor.tolist()):
+            buckets[(etiquetas[b], campo)] = [
+                float(minimo[b]), float(maximo[b]), float(suma[b]), int(conteo[b]), float(primero[j]), float(ultimo[j]),
+            ]
+    return buckets
+
+
+def _combinar(horas):
+    """{(día, campo): [...]} a partir de filas (inicio, campo, mín, máx, suma, conteo, primero, último) ordenadas por inicio."""
+    buckets = {}
+    for inicio, campo, *valores in horas:
+        clave = (truncar(inicio, DIA), campo)
+        b = buckets.get(clave)
+        if b is None:
+            buckets[clave] = valores
+            continue
+        b[0] = min(b[0], valores[0])
+        b[1] = max(b[1], valores[1])
+        b[2] += valores[2]
+        b[3] += valores[3]
+        b[5] = valores[5]
+    return buckets
+
+
+def _reemplazar(estacion, resolucion, desde, hasta, buckets):
+    """
+    Cambia los resúmenes de [desde, hasta) por los `buckets` calculados. Un
+    INSERT preparado con executemany: con bulk_create, preparar cada valor en
+    el ORM costaba más que calcular los resúmenes.
+    """
+    ResumenSensor.objects.filter(
+        estacion=estacion, resolucion=resolucion, inicio__gte=desde, inicio__lt=hasta
+    ).delete()
+    if not buckets:
+        return
+    opciones = ResumenSensor._meta
+    campo_inicio = opciones.get_field('inicio')
+    columnas = [opciones.get_field(c).column for c in COLUMNAS]
+    sql = (
+        f"INSERT INTO {connection.ops.quote_name(opciones.db_table)} "
+        f"({', '.join(map(connection.ops.quote_name, columnas))}) VALUES ({', '.join(['%s'] * len(columnas))})"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (estacion.pk, resolucion, campo_inicio.get_db_prep_value(inicio, connection), campo, *b)
+            for (inicio, campo), b in buckets.items()
+        ])
+
+
+# ==========================================
+#  ACTUALIZACIÓN
+# ==========================================
+
+def recalcular_horas(estacion, desde, hasta):
+    """Rehace los resúmenes por hora de [desde, hasta) (alineados a la hora) desde DatosSensor."""
+    filas = list(
+        DatosSensor.objects.filter(estacion=estacion, timestamp__gte=desde, timestamp__lt=hasta)
+        .order_by('timestamp', 'record_id').values_list('timestamp', *CAMPOS)
+    )
+    agregar = _agregar_numpy if np is not None else _agregar_python
+    _reemplazar(estacion, HORA, desde, hasta, agregar(filas))
+
+
+def recalcular_dias(estacion, desde, hasta):
+    """Rehace los resúmenes por día de [desde, hasta) (alineados al día) desde los de hora."""
+    horas = ResumenSensor.objects.filter(
+        estacion=estacion, resolucion=HORA, inicio__gte=desde, inicio__lt=hasta
+    ).order_by('inicio').values_list(*COLUMNAS[2:])
+    _reemplazar(estacion, DIA, desde, hasta, _combinar(horas))
+
+
+def horas_de(registros):
+    """Inicios de las horas que tocan los registros."""
+    return {truncar(r.timestamp, HORA) for r in registros}
+
+
+def actualizar_resumenes(estacion, horas):
+    """
+    Recalcula los resúmenes de las `horas` (inicios de bucket, ver horas_de)
+    y de los días que las contienen. Va dentro de la transacción que escribió
+    las lecturas, así los resúmenes nunca quedan desfasados de DatosSensor.
+    """
+    if not horas:
+        return
+    for desde, hasta in tramos(horas, DURACION[HORA], HORAS_POR_LECTURA):
+        recalcular_horas(estacion, desde, hasta)
+    for desde, hasta in tramos({truncar(h, DIA) for h in horas}, DURACION[DIA]):
+        recalcular_dias(estacion, desde, hasta)
+
+
+def reconstruir(estacion, desde=None, hasta=None):
+    """
+    Rehace todos los resúmenes de la estación entre `desde` y `hasta` (por
+    defecto, todo lo que tiene guardado) de a TRAMO_RECONSTRUCCION días, una
+    transacción por tramo. Produce el (desde, hasta) de cada tramo terminado.
+    """
+    lecturas = DatosSensor.objects.filter(estacion=estacion)
+    if desde is None:
+        desde = lecturas.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if hasta is None:
+        hasta = lecturas.order_by('-timestamp').values_list('timestamp', flat=True).first()
+    if desde is None or hasta is None:
+        return
+    inicio = truncar(desde, DIA)
+    fin = truncar(hasta, DIA) + DURACION[DIA]
+    while inicio < fin:
+        tramo = min(inicio + TRAMO_RECONSTRUCCION, fin)
+        with transaction.atomic():
+            lectura = inicio
+            while lectura < tramo:
+                recalcular_horas(estacion, lectura, min(lectura + HORAS_POR_LECTURA, tramo))
+                lectura += HORAS_POR_LECTURA
+            recalcular_dias(estacion, inicio, tramo)
+        yield inicio, tramo
+        inicio = tramo
+
+
+# ==========================================
+#  LECTURA
+# ==========================================
+
+def _filas_resumidas(estacion, resolucion, desde, hasta, series):
+    return ResumenSensor.objects.filter(
+        estacion=estacion, resolucion=resolucion, campo__in={campo for campo, _ in series.values()},
+        inicio__gte=truncar(desde, resolucion), inicio__lte=hasta,
+    ).order_by('inicio').values_list('inicio', 'campo', 'minimo', 'maximo', 'suma', 'conteo')
+
+
+async def acolumnas_resumidas(estacion, resolucion, desde, hasta, series):
+    """
+    (ms, {clave: valores}) de los buckets de `resolucion` que empiezan en
+    [desde, hasta]: un inicio por bucket con datos y, en cada serie, None donde
+    su campo no tuvo lecturas. `series` es {clave: (campo, 'promedio'|'minimo'|'maximo')}.
+    """
+    filas = [fila async for fila in _filas_resumidas(estacion, resolucion, desde, hasta, series)]
+    return _columnas(filas, series)
+
+
+async def acubre(estacion, resolucion, desde, hasta, ms):
+    """
+    Si los buckets leídos (`ms`, de acolumnas_resumidas) empiezan donde
+    empiezan las lecturas de la ventana. No pasa con datos importados antes de
+    que existieran los resúmenes hasta que se corre reconstruir_resumenes.
+    """
+    primero = await DatosSensor.objects.filter(
+        estacion=estacion, timestamp__gte=desde, timestamp__lte=hasta,
+    ).order_by('timestamp').values_list('timestamp', flat=True).afirst()
+    if primero is None:
+        return True
+    return bool(ms) and ms[0] <= truncar(primero, resolucion).timestamp() * 1000
+
+
+def _columnas(filas, series):
+    buckets = {}  # inicio -> {campo: {'minimo', 'maximo', 'promedio'}}
+    for inicio, campo, minimo, maximo, suma, conteo in filas:
+        buckets.setdefault(inicio, {})[campo] = {'minimo': minimo, 'maximo': maximo, 'promedio': suma / conteo}
+    ms = [inicio.timestamp() * 1000 for inicio in buckets]
+    columnas = {
+        clave: [valores[campo][agregado] if campo in valores else None for valores in buckets.values()]
+        for clave, (campo, agregado) in series.items()
+    }
+    return ms, columnas
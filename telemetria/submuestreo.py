@@ -0,0 +1,223 @@
+"""
+Reducción de series para los gráficos: con más puntos que píxeles, el
+navegador dibuja de más sin mostrar nada nuevo.
+
+- LTTB (Largest-Triangle-Three-Buckets, Steinarsson 2013): conserva la forma
+  visual eligiendo en cada bucket el punto que forma el triángulo más grande
+  con el elegido antes y el promedio del bucket siguiente.
+- Mín/máx por bucket para las columnas *_max: un pico nunca se pierde.
+
+Con NumPy el trabajo dentro de cada bucket es vectorizado (y el mín/máx no
+tiene bucle en Python); sin NumPy se usa la misma lógica en Python puro.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional, igual que en la ingesta
+    np = None
+
+DISPONIBLE = np is not None
+
+# Límites de max_puntos aceptados por la API
+MINIMO = 10
+MAXIMO = 20000
+
+
+def _bordes(inicio, fin, buckets):
+    """Índices (enteros crecientes) que parten [inicio, fin) en `buckets` tramos de igual cantidad de puntos."""
+    return [inicio + (fin - inicio) * i // buckets for i in range(buckets + 1)]
+
+
+# ==========================================
+#  LTTB
+# ==========================================
+
+def lttb(x, y, max_puntos):
+    """Índices de los puntos elegidos por LTTB (siempre incluye el primero y el último)."""
+    n = len(x)
+    if max_puntos >= n or max_puntos < 3:
+        return list(range(n))
+    if np is None:
+        return _lttb_python(x, y, max_puntos)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Los puntos interiores 1..n-2 en max_puntos-2 buckets
+    bordes = np.array(_bordes(1, n - 1, max_puntos - 2))
+    conteo = np.diff(bordes)
+    promedio_x = np.add.reduceat(x[:n - 1], bordes[:-1]) / conteo
+    promedio_y = np.add.reduceat(y[:n - 1], bordes[:-1]) / conteo
+    # Para el último bucket el "siguiente" es el punto final
+    siguiente_x = np.append(promedio_x[1:], x[-1])
+    siguiente_y = np.append(promedio_y[1:], y[-1])
+
+    elegidos = np.empty(max_puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(max_puntos - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        ax, ay = x[a], y[a]
+        # Doble del área del triángulo (a, candidato, promedio siguiente)
+        areas = np.abs((ax - siguiente_x[i]) * (y[ini:fin] - ay) - (ax - x[ini:fin]) * (siguiente_y[i] - ay))
+        a = ini + int(areas.argmax())
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def _lttb_python(x, y, max_puntos):
+    n = len(x)
+    bordes = _bordes(1, n - 1, max_puntos - 2)
+    elegidos = [0]
+    a = 0
+    for i in range(max_puntos - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        if i + 1 < max_puntos - 2:
+            sig_ini, sig_fin = bordes[i + 1], bordes[i + 2]
+            sx = sum(x[sig_ini:sig_fin]) / (sig_fin - sig_ini)
+            sy = sum(y[sig_ini:sig_fin]) / (sig_fin - sig_ini)
+        else:
+            sx, sy = x[-1], y[-1]
+        ax, ay = x[a], y[a]
+        a = max(range(ini, fin), key=lambda j: abs((ax - sx) * (y[j] - ay) - (ax - x[j]) * (sy - ay)))
+        elegidos.append(a)
+    elegidos.append(n - 1)
+    return elegidos
+
+
+# ==========================================
+#  MÍN/MÁX POR BUCKET
+# ==========================================
+
+def min_max(y, max_puntos):
+    """Índices (ordenados) del mínimo y el máximo de cada bucket: a lo sumo max_puntos."""
+    n = len(y)
+    buckets = max_puntos // 2
+    if max_puntos >= n or buckets < 1:
+        return list(range(n))
+    bordes = _bordes(0, n, buckets)
+    if np is None:
+        elegidos = set()
+        for ini, fin in zip(bordes, bordes[1:]):
+            tramo = range(ini, fin)
+            elegidos.add(min(tramo, key=y.__getitem__))
+            elegidos.add(max(tramo, key=y.__getitem__))
+        return sorted(elegidos)
+
+    y = np.asarray(y, dtype=np.float64)
+    inicios = np.array(bordes[:-1])
+    conteo = np.diff(bordes)
+    bucket = np.repeat(np.arange(buckets), conteo)
+    elegidos = []
+    for reduccion in (np.minimum, np.maximum):
+        extremo = np.repeat(reduccion.reduceat(y, inicios), conteo)
+        # Primera posición de cada bucket donde está su extremo
+        posiciones = np.flatnonzero(y == extremo)
+        _, primeras = np.unique(bucket[posiciones], return_index=True)
+        elegidos.append(posiciones[primeras])
+    return np.union1d(*elegidos)
+
+
+# ==========================================
+#  SERIES
+# ==========================================
+
+def reducir(x, y, max_puntos, picos=False):
+    """[[x, y], ...] con a lo sumo `max_puntos` puntos (mín/máx si `picos`, si no LTTB)."""
+    indices = min_max(y, max_puntos) if picos else lttb(x, y, max_puntos)
+    if np is not None and isinstance(x, np.ndarray):
+        return np.column_stack((x[indices], y[indices])).tolist()
+    return [[x[i], y[i]] for i in indices]
+
+
+def columnas_a_series(ms, columnas, max_puntos, picos=()):
+    """
+    Una serie [[ms, valor], ...] por columna (sin nulos), reducida a
+    `max_puntos`. `ms` son los timestamps en milisegundos y `columnas`
+    {clave: valores con None}; las claves en `picos` usan mín/máx.
+    """
+    series = {}
+    if np is not None:
+        ms = np.asarray(ms, dtype=np.float64)
+        for clave, valores in columnas.items():
+            # None -> NaN al convertir a float64
+            y = np.array(valores, dtype=np.float64)
+            validos = ~np.isnan(y)
+            series[clave] = reducir(ms[validos], y[validos], max_puntos, clave in picos)
+        return series
+
+    for clave, valores in columnas.items():
+        pares = [(t, v) for t, v in zip(ms, valores) if v is not None and not math.isnan(v)]
+        x = [t for t, _ in pares]
+        y = [v for _, v in pares]
+        series[clave] = reducir(x, y, max_puntos, clave in picos)
+    return series
+
+
+# ==========================================
+#  COLUMNAS CON TIMESTAMPS COMPARTIDOS
+# ==========================================
+
+def min_max_columnas(ms, columnas, max_puntos):
+    """
+    Reduce columnas alineadas a `ms` a lo sumo `max_puntos` filas que todas
+    comparten (para el formato columnar, que lleva un solo arreglo de
+    timestamps): por bucket, dos filas en su primer y último timestamp con el
+    mínimo y el máximo de cada serie, en el orden en que aparecen. Un pico no
+    se pierde y el corrimiento es de menos de un bucket (un píxel).
+    Devuelve (ms, {clave: valores}) con None (o NaN con NumPy) donde no hay dato.
+    """
+    n = len(ms)
+    buckets = max_puntos // 2
+    if max_puntos >= n or buckets < 1:
+        return ms, columnas
+    bordes = _bordes(0, n, buckets)
+    if np is None:
+        return _min_max_columnas_python(ms, columnas, bordes)
+
+    ms = np.asarray(ms, dtype=np.float64)
+    inicios = np.array(bordes[:-1])
+    finales = np.array(bordes[1:]) - 1
+    x = np.empty(2 * buckets)
+    x[0::2], x[1::2] = ms[inicios], ms[finales]
+    conteo = np.diff(bordes)
+    bucket = np.repeat(np.arange(buckets), conteo)
+
+    reducidas = {}
+    for clave, valores in columnas.items():
+        y = np.array(valores, dtype=np.float64)
+        extremos, posiciones = [], []
+        for reduccion in (np.fmin, np.fmax):
+            extremo = reduccion.reduceat(y, inicios)
+            # Primera posición de cada bucket donde está su extremo (los buckets sin datos quedan en n)
+            iguales = np.flatnonzero(y == np.repeat(extremo, conteo))
+            con_dato, primeras = np.unique(bucket[iguales], return_index=True)
+            posicion = np.full(buckets, n)
+            posicion[con_dato] = iguales[primeras]
+            extremos.append(extremo)
+            posiciones.append(posicion)
+        minimo_antes = posiciones[0] <= posiciones[1]
+        y = np.empty(2 * buckets)
+        y[0::2] = np.where(minimo_antes, extremos[0], extremos[1])
+        y[1::2] = np.where(minimo_antes, extremos[1], extremos[0])
+        reducidas[clave] = y
+    return x, reducidas
+
+
+def _min_max_columnas_python(ms, columnas, bordes):
+    x = []
+    for ini, fin in zip(bordes, bordes[1:]):
+        x += [ms[ini], ms[fin - 1]]
+    reducidas = {}
+    for clave, valores in columnas.items():
+        y = []
+        for ini, fin in zip(bordes, bordes[1:]):
+            tramo = [j for j in range(ini, fin) if valores[j] is not None and not math.isnan(valores[j])]
+            if not tramo:
+                y += [None, None]
+                continue
+            menor = min(tramo, key=valores.__getitem__)
+            mayor = max(tramo, key=valores.__getitem__)
+            y += [valores[j] for j in sorted((menor, mayor))]
+        reducidas[clave] = y
+    return x, reducidas
@@ -1,3 +1,786 @@
-from django.test import TestCase
+import io
+import os
+import json
+import random
+import tarfile
+import threading
+import struct
+import asyncio
+import tempfile
+from time import sleep, monotonic
+from ftplib import error_perm
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone as tz
+from unittest import skipUnless
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, AsyncClient, override_settings
+from telemetria.models import (
+    Empresa, PerfilUsuario, Proyecto, Estacion, DatosSensor, ResumenSensor, ArchivoImportado, ArchivoCrudo,
+    VersionEncabezado, Notificacion,
+)
+from telemetria.ingesta.escritor import guardar_registros, registrar_cambios
+from telemetria.ingesta.escritores import EscritorORM, EscritorSQLite, EscritorPostgres
+from telemetria.ingesta.ftp import ConexionFTP
+from telemetria.ingesta.importador import Importador
+from telemetria.ingesta.estaciones import CacheEstaciones
+from telemetria.ingesta.local import FuenteLocal, Vigilante
+from telemetria.ingesta.demonio import Agenda, ESPERA_MAXIMA
+from telemetria.ingesta.push import EscritorCoalescente, leer_carga
+from telemetria.ingesta.pipeline import Tarea, Lectura, ejecutar_pipeline
+from telemetria.ingesta.parser import lineas_incrementales
+from telemetria.ingesta.columnas import RegistroColumnas
+from telemetria.ingesta.escritores import VALORES
+from telemetria.ingesta import columnar, benchmark
+from telemetria import resumenes, binario, vivo
+from telemetria.views import delta_vivo, json_columnar, TAMANO_CHUNK
 
-# Create your tests here.
+
+@override_settings(RUTA_DATOS_TELEMETRIA=tempfile.mkdtemp())
+class EscritoresTest(TestCase):
+    """Los escritores por motor deben dejar exactamente las mismas filas que el ORM."""
+
+    CAMPOS = ('bateria_voltaje', 'oxigeno_disuelto', 'oxigeno_tmax', 'salinidad', 'orp')
+
+    def setUp(self):
+        proyecto = Proyecto.objects.create(nombre='Prueba', fecha_inicio='2025-01-01')
+        self.estacion = Estacion.objects.create(proyecto=proyecto, nombre='Est', codigo_identificador='99001')
+
+    def lote(self, desde, hasta, ajuste=0.0):
+        inicio = datetime(2025, 6, 1, tzinfo=tz.utc)
+        registros = []
+        for i in range(desde, hasta):
+            registros.append(DatosSensor(
+                estacion=self.estacion,
+                timestamp=inicio + timedelta(minutes=i),
+                record_id=i,
+                bateria_voltaje=12.0 + i / 100,
+                oxigeno_disuelto=None if i % 7 == 0 else 7.5 + (ajuste if i % 10 == 0 else 0),
+                oxigeno_tmax=inicio if i % 3 == 0 else None,
+                salinidad=0.1 * i,
+                orp=150.0,
+            ))
+        return registros
+
+    def volcar(self, escritor):
+        """Carga inicial, reimportación idéntica y una con solapamiento, cambios y una clave repetida."""
+        escritos = [
+            guardar_registros(self.lote(0, 100), self.CAMPOS, escritor),
+            guardar_registros(self.lote(0, 100), self.CAMPOS, escritor),
+            guardar_registros(self.lote(50, 150, ajuste=1.0) + self.lote(149, 150, ajuste=2.0), self.CAMPOS, escritor),
+        ]
+        filas = list(
+            DatosSensor.objects.order_by('timestamp', 'record_id')
+            .values_list('timestamp', 'record_id', *self.CAMPOS, 'ph', 'hash_contenido')
+        )
+        DatosSensor.objects.all().delete()
+        return escritos, filas
+
+    def comparar_con_orm(self, escritor):
+        escritos_orm, filas_orm = self.volcar(EscritorORM())
+        escritos, filas = self.volcar(escritor)
+        self.assertEqual(len(filas), 150)
+        self.assertEqual(filas, filas_orm)
+        # Una reimportación idéntica no escribe nada
+        self.assertEqual(escritos[1], 0)
+        self.assertEqual(escritos_orm[1], 0)
+
+    @skipUnless(connection.vendor == 'sqlite', 'requiere SQLite')
+    def test_sqlite_igual_que_orm(self):
+        self.comparar_con_orm(EscritorSQLite(connection))
+
+    @skipUnless(connection.vendor == 'postgresql', 'requiere PostgreSQL')
+    def test_postgres_igual_que_orm(self):
+        self.comparar_con_orm(EscritorPostgres(connection))
+
+
+@override_settings(RUTA_DATOS_TELEMETRIA=tempfile.mkdtemp())
+class LecturasTest(TestCase):
+    """La API de lecturas solo muestra estaciones del usuario y respeta la ventana pedida."""
+
+    def setUp(self):
+        inicio = datetime(2025, 6, 1, tzinfo=tz.utc)
+        self.estaciones = {}
+        for nombre in ('A', 'B'):
+            empresa = Empresa.objects.create(nombre=f"Empresa {nombre}")
+            proyecto = Proyecto.objects.create(nombre=nombre, empresa=empresa, fecha_inicio='2025-01-01')
+            estacion = Estacion.objects.create(proyecto=proyecto, nombre=nombre, codigo_identificador=f"9900{nombre}")
+            DatosSensor.objects.bulk_create(
+                DatosSensor(estacion=estacion, timestamp=inicio + timedelta(hours=i), record_id=i, ph=7.0)
+                for i in range(72)
+            )
+            usuario = User.objects.create_user(nombre.lower(), password='x')
+            PerfilUsuario.objects.update_or_create(user=usuario, defaults={'empresa': empresa})
+            proyecto.usuarios_asignados.add(usuario)
+            self.estaciones[nombre] = estacion
+        self.client.force_login(User.objects.get(username='a'))
+
+    def test_no_ve_estaciones_de_otra_empresa(self):
+        self.assertEqual(self.client.get('/api/v1/estaciones/9900B/lecturas/').status_code, 404)
+        self.assertEqual(self.client.get(f"/api/v1/estaciones/{self.estaciones['B'].pk}/lecturas/").status_code, 404)
+
+    def test_ventana(self):
+        datos = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-06-02&hasta=2025-06-02T05:00Z').json()
+        self.assertEqual(len(datos['series']['ph']), 6)
+        self.assertEqual(self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=mañana').status_code, 400)
+
+    def test_max_puntos(self):
+        datos = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-06-01&hasta=2025-06-04&max_puntos=10').json()
+        ph = datos['series']['ph']
+        self.assertEqual(len(ph), 10)
+        # LTTB conserva los extremos de la ventana
+        self.assertEqual(ph[0][0], datetime(2025, 6, 1, tzinfo=tz.utc).timestamp() * 1000)
+        self.assertEqual(ph[-1][0], datetime(2025, 6, 3, 23, tzinfo=tz.utc).timestamp() * 1000)
+
+    def test_resumenes_en_ventanas_largas(self):
+        list(resumenes.reconstruir(self.estaciones['A']))
+        datos = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-06-01&hasta=2025-12-31').json()
+        self.assertEqual(datos['resolucion'], 'dia')
+        self.assertEqual(datos['series']['ph'], [
+            [datetime(2025, 6, d, tzinfo=tz.utc).timestamp() * 1000, 7.0] for d in (1, 2, 3)
+        ])
+        datos = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-05-20&hasta=2025-06-30').json()
+        self.assertEqual(datos['resolucion'], 'hora')
+        self.assertEqual(len(datos['series']['ph']), 72)
+        datos = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-06-01&hasta=2025-06-04').json()
+        self.assertEqual(datos['resolucion'], 'cruda')
+
+    def test_ventana_larga_sin_resumenes(self):
+        # Datos de antes de los resúmenes: crudos hasta que se corre reconstruir_resumenes
+        datos = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-06-01&hasta=2025-12-31&max_puntos=10').json()
+        self.assertEqual(datos['resolucion'], 'cruda')
+        self.assertEqual(len(datos['series']['ph']), 10)
+        # Resúmenes solo del último día (lo importado después de la migración): tampoco alcanzan
+        resumenes.actualizar_resumenes(self.estaciones['A'], {datetime(2025, 6, 3, h, tzinfo=tz.utc) for h in range(24)})
+        datos = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-06-01&hasta=2025-12-31').json()
+        self.assertEqual(datos['resolucion'], 'cruda')
+        self.assertEqual(len(datos['series']['ph']), 72)
+        # Después de reconstruir_resumenes, resumen por día y un ETag nuevo
+        etag = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-06-01&hasta=2025-12-31')['ETag']
+        with redirect_stdout(io.StringIO()):
+            call_command('reconstruir_resumenes', estacion=['9900A'])
+        respuesta = self.client.get('/api/v1/estaciones/9900A/lecturas/?desde=2025-06-01&hasta=2025-12-31', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['resolucion'], 'dia')
+
+    def test_formato_binario(self):
+        respuesta = self.client.get(
+            '/api/v1/estaciones/9900A/lecturas/?desde=2025-06-02&hasta=2025-06-02T05:00Z', HTTP_ACCEPT=binario.TIPO
+        )
+        self.assertEqual(respuesta['Content-Type'], binario.TIPO)
+        cuerpo = respuesta.content
+        largo, = struct.unpack_from('<I', cuerpo)
+        encabezado = json.loads(cuerpo[4:4 + largo])
+        base, n = 4 + largo, encabezado['filas']
+        self.assertEqual((base % 8, n), (0, 6))
+        self.assertEqual(struct.unpack_from(f'<{n}d', cuerpo, base)[0], datetime(2025, 6, 2, tzinfo=tz.utc).timestamp() * 1000)
+        ph = encabezado['series']['ph']
+        self.assertEqual(struct.unpack_from(f'<{n}f', cuerpo, base + ph['valores']), (7.0,) * n)
+        self.assertEqual(cuerpo[base + ph['validos']], 0b111111)
+        # Sin ningún dato en la ventana: sin bloque
+        self.assertIsNone(encabezado['series']['orp'])
+
+    def test_no_modificada_entre_importaciones(self):
+        url = '/api/v1/estaciones/9900A/lecturas/?desde=2025-06-01&hasta=2025-06-02'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Otro formato es otra representación
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT=binario.TIPO).status_code, 200)
+        registrar_cambios(self.estaciones['A'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_delta_despues(self):
+        Estacion.objects.filter(pk=self.estaciones['A'].pk).update(ultimo_timestamp=datetime(2025, 6, 3, 23, tzinfo=tz.utc), ultimo_record_id=71)
+        ultimo = datetime(2025, 6, 3, 21, tzinfo=tz.utc).timestamp() * 1000
+        datos = self.client.get(f'/api/v1/estaciones/9900A/lecturas/?despues={ultimo:.0f}').json()
+        self.assertEqual([t for t, _ in datos['series']['ph']], [ultimo + 3600000, ultimo + 7200000])
+        self.assertEqual(datos['cursor'], ultimo + 7200000)
+        # Sin lecturas nuevas el cursor no se mueve
+        datos = self.client.get(f"/api/v1/estaciones/9900A/lecturas/?despues={datos['cursor']:.0f}").json()
+        self.assertEqual((datos['series']['ph'], datos['cursor']), ([], ultimo + 7200000))
+
+    def test_api_datos_en_streaming(self):
+        respuesta = self.client.get('/api/v1/datos/')
+        self.assertTrue(respuesta.streaming)
+        datos = json.loads(b''.join(respuesta.streaming_content))
+        # Solo la estación de la empresa del usuario
+        self.assertEqual(len(datos['timestamps']), 72)
+        self.assertEqual(datos['timestamps'][0], datetime(2025, 6, 1, tzinfo=tz.utc).timestamp() * 1000)
+        self.assertEqual((datos['series']['ph'], datos['series']['orp']), ([7.0] * 72, [None] * 72))
+
+        # Una parte del cuerpo por lote de filas leído; NaN sale como null
+        inicio = datetime(2025, 6, 1, tzinfo=tz.utc)
+        filas = ((inicio + timedelta(minutes=i), float(i), float('nan')) for i in range(2 * TAMANO_CHUNK + 1))
+        partes = list(json_columnar(filas, ['a', 'b']))
+        self.assertEqual(len(partes[1:partes.index('],"series":{')]), 3)
+        datos = json.loads(''.join(partes))
+        self.assertEqual((len(datos['timestamps']), datos['series']['a'][-1]), (2 * TAMANO_CHUNK + 1, 2 * TAMANO_CHUNK))
+        self.assertEqual(set(datos['series']['b']), {None})
+
+    async def test_asgi(self):
+        # Las vistas async dan lo mismo por ASGI que por WSGI (el Client de siempre)
+        cliente = AsyncClient()
+        await cliente.aforce_login(await User.objects.aget(username='a'))
+        url = '/api/v1/estaciones/9900A/lecturas/?desde=2025-06-02&hasta=2025-06-02T05:00Z'
+        self.assertEqual((await cliente.get(url)).content, (await sync_to_async(self.client.get)(url)).content)
+        self.assertEqual((await cliente.get('/api/v1/estaciones/9900B/lecturas/')).status_code, 404)
+        respuesta = await cliente.get('/api/v1/datos/')
+        datos = json.loads(b''.join([parte async for parte in respuesta.streaming_content]))
+        self.assertEqual((len(datos['timestamps']), datos['series']['ph'][:2]), (72, [7.0, 7.0]))
+
+    @override_settings(SONDEO_VIVO_TELEMETRIA=0)
+    async def test_vivo(self):
+        # Por WSGI no hay SSE: 204 y el dashboard sigue con sondeo
+        self.assertEqual((await sync_to_async(self.client.get)('/api/v1/estaciones/9900A/vivo/')).status_code, 204)
+
+        estacion = self.estaciones['A']
+        ultimo = datetime(2025, 6, 3, 23, tzinfo=tz.utc)
+        hub = vivo.hub()
+        colas = [hub.suscribir(estacion.pk, delta_vivo, estacion.generacion_datos, ultimo) for _ in range(2)]
+
+        def importar():
+            nuevo = ultimo + timedelta(hours=1)
+            DatosSensor.objects.create(estacion=estacion, timestamp=nuevo, record_id=72, ph=7.5)
+            Estacion.objects.filter(pk=estacion.pk).update(ultimo_timestamp=nuevo, ultimo_record_id=72)
+            with self.captureOnCommitCallbacks(execute=True):
+                registrar_cambios(estacion)
+        await sync_to_async(importar)()
+
+        # Una sola consulta, el mismo evento para cada suscripción
+        for cola in colas:
+            evento, datos = await asyncio.wait_for(cola.get(), timeout=5)
+            self.assertEqual(evento, vivo.LECTURAS)
+            self.assertEqual(datos['series']['ph'], [[ultimo.timestamp() * 1000 + 3600000, 7.5]])
+        for cola in colas:
+            hub.desuscribir(estacion.pk, cola)
+        self.assertEqual(hub.estaciones, {})
+
+    @override_settings(SONDEO_VIVO_TELEMETRIA=0)
+    async def test_vivo_estacion_sin_lecturas(self):
+        # Sin lecturas al suscribirse el cursor del hub es None: la primera importación pide recargar
+        vacia = await Estacion.objects.acreate(proyecto_id=self.estaciones['A'].proyecto_id, nombre='C', codigo_identificador='9900C')
+        hub = vivo.hub()
+        cola = hub.suscribir(vacia.pk, delta_vivo, vacia.generacion_datos, vacia.ultimo_timestamp)
+
+        def importar():
+            nuevo = datetime(2025, 6, 1, tzinfo=tz.utc)
+            DatosSensor.objects.create(estacion=vacia, timestamp=nuevo, record_id=0, ph=7.5)
+            Estacion.objects.filter(pk=vacia.pk).update(ultimo_timestamp=nuevo, ultimo_record_id=0)
+            with self.captureOnCommitCallbacks(execute=True):
+                registrar_cambios(vacia)
+        await sync_to_async(importar)()
+
+        evento, datos = await asyncio.wait_for(cola.get(), timeout=5)
+        self.assertEqual((evento, datos['cursor']), (vivo.RECARGAR, datetime(2025, 6, 1, tzinfo=tz.utc).timestamp() * 1000))
+        self.assertEqual(hub.estaciones[vacia.pk].cursor, datetime(2025, 6, 1, tzinfo=tz.utc))
+        hub.desuscribir(vacia.pk, cola)
+
+
+# ==========================================
+#  INGESTA
+# ==========================================
+
+ENCABEZADO_DAT = '"TIMESTAMP","RECORD","BattV","pH(pH)"\n'
+
+
+def lineas_dat(desde, hasta, ph=7.0):
+    inicio = datetime(2025, 6, 1)
+    return ''.join(
+        f'"{inicio + timedelta(minutes=i):%Y-%m-%d %H:%M:%S}",{i},12.5,{ph}\n' for i in range(desde, hasta)
+    )
+
+
+class FTPFalso:
+    """Lo que ConexionFTP usa de ftplib.FTP, sirviendo `archivos` ({nombre: (bytes, mtime)}) desde memoria."""
+
+    def __init__(self, archivos):
+        self.archivos = archivos
+        self.pedidos = []  # (nombre, byte desde el que se pidió)
+
+    def mlsd(self, facts=None):
+        for nombre, (datos, mtime) in self.archivos.items():
+            yield nombre, {'size': str(len(datos)), 'modify': mtime}
+
+    def voidcmd(self, comando):
+        return '200 OK'
+
+    def transfercmd(self, comando, rest=None):
+        nombre = comando.split(' ', 1)[1]
+        self.pedidos.append((nombre, rest or 0))
+        if nombre not in self.archivos:
+            raise error_perm(f"550 {nombre}: No such file")
+        socket = io.BytesIO(self.archivos[nombre][0][rest or 0:])
+        socket.recv = socket.read
+        return socket
+
+    def retrbinary(self, comando, callback, blocksize=8192, rest=None):
+        with self.transfercmd(comando, rest) as socket:
+            while bloque := socket.recv(blocksize):
+                callback(bloque)
+
+    def voidresp(self):
+        return '226 Transfer complete'
+
+    def quit(self):
+        pass
+
+    close = quit
+
+
+@override_settings(RUTA_DATOS_TELEMETRIA=tempfile.mkdtemp())
+class ImportacionFTPTest(TestCase):
+    """Por FTP solo se descarga lo nuevo de cada archivo, según su manifiesto."""
+
+    NOMBRE = 'H_prueba_FAO_99002.dat'
+
+    def setUp(self):
+        proyecto = Proyecto.objects.create(nombre='Prueba', fecha_inicio='2025-01-01')
+        self.estacion = Estacion.objects.create(proyecto=proyecto, nombre='Est', codigo_identificador='99002')
+        self.ftp = FTPFalso({})
+        self.conexion = ConexionFTP('localhost', 'usuario', 'clave')
+        self.conexion.ftp = self.ftp
+
+    def publicar(self, contenido, mtime):
+        self.ftp.archivos[self.NOMBRE] = (contenido.encode('latin-1'), mtime)
+
+    def importar(self, **opciones):
+        importador = Importador(**opciones)
+        with redirect_stdout(io.StringIO()):
+            importador.preparar()
+            return importador.importar(self.conexion, self.conexion.listar_archivos())
+
+    def test_reanuda_desde_el_offset(self):
+        self.publicar(ENCABEZADO_DAT + lineas_dat(0, 3), '20250601000300')
+        self.assertEqual(self.importar(), 3)
+        offset = ArchivoImportado.objects.get(nombre=self.NOMBRE).offset
+        self.assertEqual(offset, len(ENCABEZADO_DAT + lineas_dat(0, 3)))
+
+        # Línea a medio escribir: no se guarda ni avanza el offset
+        self.publicar(ENCABEZADO_DAT + lineas_dat(0, 5) + '"2025-06-01 00:05:00",5,1', '20250601000500')
+        self.assertEqual(self.importar(), 2)
+        self.assertEqual(self.ftp.pedidos[-1], (self.NOMBRE, offset - 1))
+        self.assertEqual(ArchivoImportado.objects.get(nombre=self.NOMBRE).offset, len(ENCABEZADO_DAT + lineas_dat(0, 5)))
+        self.assertEqual(DatosSensor.objects.filter(estacion=self.estacion).count(), 5)
+
+    def test_archivo_sin_cambios_se_omite(self):
+        self.publicar(ENCABEZADO_DAT + lineas_dat(0, 3), '20250601000300')
+        self.importar()
+        pedidos = len(self.ftp.pedidos)
+        self.assertEqual(self.importar(), 0)
+        self.assertEqual(len(self.ftp.pedidos), pedidos)
+
+    def test_archivo_rotado_se_relee_completo(self):
+        self.publicar(ENCABEZADO_DAT + lineas_dat(0, 10), '20250601001000')
+        self.importar()
+        # El datalogger empezó un archivo nuevo: más chico que el offset guardado
+        self.publicar(ENCABEZADO_DAT + lineas_dat(10, 12), '20250601001200')
+        self.assertEqual(self.importar(), 2)
+        self.assertEqual(self.ftp.pedidos[-1], (self.NOMBRE, 0))
+        self.assertEqual(ArchivoImportado.objects.get(nombre=self.NOMBRE).offset, len(ENCABEZADO_DAT + lineas_dat(10, 12)))
+        self.assertEqual(DatosSensor.objects.filter(estacion=self.estacion).count(), 12)
+
+    def test_marca_de_agua(self):
+        empate = '"2025-06-01 00:04:00",10,12.5,7.0\n'  # misma fecha que la marca, record_id mayor
+        for usar_columnar in (True, False):
+            with self.subTest(usar_columnar=usar_columnar):
+                DatosSensor.objects.all().delete()
+                ArchivoImportado.objects.all().delete()
+                Estacion.objects.filter(pk=self.estacion.pk).update(ultimo_timestamp=None, ultimo_record_id=None)
+                self.publicar(ENCABEZADO_DAT + lineas_dat(0, 5), '20250601000500')
+                self.importar(usar_columnar=usar_columnar)
+
+                # Releído completo (--resync): lo que está hasta la marca ni se convierte
+                self.publicar(ENCABEZADO_DAT + lineas_dat(0, 5) + empate + lineas_dat(5, 6), '20250601000600')
+                importador = Importador(resync=True, usar_columnar=usar_columnar)
+                with redirect_stdout(io.StringIO()):
+                    importador.preparar()
+                    self.assertEqual(importador.importar(self.conexion, self.conexion.listar_archivos()), 2)
+                metrica, = importador.metricas.archivos
+                self.assertEqual((metrica.leidos, dict(metrica.rechazos)), (2, {'ya_importada': 5}))
+                self.assertEqual(Estacion.objects.get(pk=self.estacion.pk).marca_agua[1], 5)
+
+                # --full ignora la marca: relee todo (y no reescribe lo que no cambió)
+                importador = Importador(completo=True, usar_columnar=usar_columnar)
+                with redirect_stdout(io.StringIO()):
+                    importador.preparar()
+                    self.assertEqual(importador.importar(self.conexion, self.conexion.listar_archivos()), 0)
+                metrica, = importador.metricas.archivos
+                self.assertEqual((metrica.leidos, dict(metrica.rechazos)), (7, {}))
+
+    def test_archivo_crudo_y_reproceso(self):
+        raiz = os.path.join(tempfile.mkdtemp(), '.archivo')
+        self.publicar(ENCABEZADO_DAT + lineas_dat(0, 3), '20250601000300')
+        self.importar(archivo=raiz)
+        self.publicar(ENCABEZADO_DAT + lineas_dat(0, 5), '20250601000500')
+        self.importar(archivo=raiz)
+        # Un crudo por cada tramo descargado, cada uno con su encabezado
+        crudos = list(ArchivoCrudo.objects.order_by('inicio'))
+        self.assertEqual([c.inicio for c in crudos], [0, len(ENCABEZADO_DAT + lineas_dat(0, 3))])
+        self.assertEqual([c.tamano for c in crudos], [len(ENCABEZADO_DAT + lineas_dat(0, 3)), len(ENCABEZADO_DAT + lineas_dat(3, 5))])
+
+        campos = ('timestamp', 'record_id', 'bateria_voltaje', 'ph')
+        antes = list(DatosSensor.objects.order_by('timestamp').values_list(*campos))
+        DatosSensor.objects.all().delete()
+        with self.settings(RUTA_DATOS_TELEMETRIA=os.path.dirname(raiz)), redirect_stdout(io.StringIO()):
+            call_command('reprocesar', workers=1)
+        self.assertEqual(list(DatosSensor.objects.order_by('timestamp').values_list(*campos)), antes)
+
+    def test_reimportacion_solo_escribe_lo_que_cambio(self):
+        self.publicar(ENCABEZADO_DAT + lineas_dat(0, 5), '20250601000500')
+        self.assertEqual(self.importar(), 5)
+        self.assertEqual(self.importar(completo=True), 0)
+
+        # El datalogger corrigió una fila ya importada
+        corregido = lineas_dat(0, 5).replace('",2,12.5,7.0', '",2,12.5,7.5')
+        self.publicar(ENCABEZADO_DAT + corregido, '20250601000600')
+        self.assertEqual(self.importar(completo=True), 1)
+        self.assertEqual(
+            list(DatosSensor.objects.order_by('record_id').values_list('ph', flat=True)), [7.0, 7.0, 7.5, 7.0, 7.0]
+        )
+
+    def test_informe_y_metricas_prometheus(self):
+        carpeta = tempfile.mkdtemp()
+        informe, prometheus = os.path.join(carpeta, 'informe.json'), os.path.join(carpeta, 'ingesta.prom')
+        self.publicar(ENCABEZADO_DAT + lineas_dat(0, 3) + '"2025-99-01 00:00:00",3,1,1\nbasura\n', '20250601000300')
+        self.importar(informe=informe, prometheus=prometheus)
+
+        with open(informe, encoding='utf-8') as f:
+            datos = json.load(f)
+        archivo, = datos['archivos']
+        self.assertEqual((archivo['archivo'], archivo['filas_leidas'], archivo['filas_escritas']), (self.NOMBRE, 3, 3))
+        self.assertEqual(archivo['rechazos'], {'fecha_invalida': 1, 'linea_invalida': 1})
+        self.assertEqual(archivo['bytes'], len(self.ftp.archivos[self.NOMBRE][0]))
+        self.assertEqual(datos['totales']['archivos'], 1)
+        self.assertEqual(datos['estaciones']['99002']['ultimo_guardado'], '2025-06-01T00:02:00+00:00')
+
+        with open(prometheus, encoding='utf-8') as f:
+            lineas = f.read().splitlines()
+        self.assertIn('# TYPE telemetria_ingesta_filas_total counter', lineas)
+        self.assertIn('telemetria_ingesta_filas_total{estacion="99002",tipo="escritas"} 3', lineas)
+        self.assertIn('telemetria_ingesta_rechazos_total{estacion="99002",motivo="fecha_invalida"} 1', lineas)
+        self.assertIn('telemetria_ingesta_archivos_total{resultado="ok"} 1', lineas)
+
+    def test_cache_de_estaciones(self):
+        cache = CacheEstaciones()
+        with self.assertNumQueries(1):
+            cache.cargar()
+        # Ni las conocidas ni las desconocidas vuelven a consultar la BD
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.obtener('99002'), self.estacion)
+            self.assertIsNone(cache.obtener('12345', 'H_a_FAO_12345.dat'))
+            self.assertIsNone(cache.obtener('12345', 'H_b_FAO_12345.dat'))
+        self.assertEqual(cache.resumen_desconocidos(), "1 códigos sin estación en la BD (2 archivos omitidos): 12345")
+
+
+@override_settings(RUTA_DATOS_TELEMETRIA=tempfile.mkdtemp())
+class PipelineTest(TestCase):
+    """Con varias conexiones los archivos se entregan al escritor en orden y un fallo no corta el resto."""
+
+    NOMBRES = [f"H_{letra}_FAO_99003.dat" for letra in 'abcde']
+
+    def setUp(self):
+        proyecto = Proyecto.objects.create(nombre='Prueba', fecha_inicio='2025-01-01')
+        self.estacion = Estacion.objects.create(proyecto=proyecto, nombre='Est', codigo_identificador='99003')
+        self.ftp = FTPFalso({
+            nombre: ((ENCABEZADO_DAT + lineas_dat(10 * i, 10 * i + 3)).encode('latin-1'), '20250601000000')
+            for i, nombre in enumerate(self.NOMBRES)
+        })
+
+    def conexion(self):
+        conexion = ConexionFTP('localhost', 'usuario', 'clave')
+        conexion.ftp = self.ftp
+        return conexion
+
+    def test_orden_y_archivo_con_error(self):
+        archivos = self.conexion().listar_archivos()
+        del self.ftp.archivos[self.NOMBRES[2]]  # desaparece entre el listado y la descarga
+        importador = Importador()
+        with redirect_stdout(io.StringIO()):
+            importador.preparar()
+            total = importador.importar(self.conexion(), archivos, workers=3, crear_fuente=self.conexion)
+        self.assertEqual(total, 12)
+        self.assertEqual([m.nombre for m in importador.metricas.archivos], self.NOMBRES)
+        self.assertEqual([bool(m.error) for m in importador.metricas.archivos], [False, False, True, False, False])
+        self.assertEqual(
+            sorted(ArchivoImportado.objects.values_list('nombre', flat=True)),
+            [n for n in self.NOMBRES if n != self.NOMBRES[2]],
+        )
+
+    def test_cola_llena(self):
+        tareas = [Tarea(nombre, self.estacion) for nombre in self.NOMBRES]
+        resultados = ejecutar_pipeline(tareas, self.conexion, workers=3, capacidad=2)
+        tarea, lectura, error = next(resultados)
+        self.assertEqual((tarea.nombre, error), (self.NOMBRES[0], None))
+        # Mientras el escritor no suelta el primero, solo se baja uno más
+        sleep(0.3)
+        self.assertEqual(len(self.ftp.pedidos), 2)
+        self.assertEqual(len(list(lectura.registros())), 3)
+        self.assertEqual([t.nombre for t, _, _ in resultados], self.NOMBRES[1:])
+
+        # Cerrar el generador a mitad detiene las descargas
+        self.ftp.pedidos.clear()
+        resultados = ejecutar_pipeline(tareas, self.conexion, workers=3, capacidad=2)
+        next(resultados)
+        resultados.close()
+        self.assertLessEqual(len(self.ftp.pedidos), 2)
+
+
+@override_settings(RUTA_DATOS_TELEMETRIA=tempfile.mkdtemp())
+class ParseoTest(TestCase):
+    """El parseo de un .dat es el mismo sin importar cómo lleguen los bytes ni qué camino lo convierta."""
+
+    def setUp(self):
+        proyecto = Proyecto.objects.create(nombre='Prueba', fecha_inicio='2025-01-01')
+        self.estacion = Estacion.objects.create(proyecto=proyecto, nombre='Est', codigo_identificador='99004')
+
+    def test_lectura_en_streaming(self):
+        contenido = (ENCABEZADO_DAT + lineas_dat(0, 5) + '"2025-06-01 00:05:00",5,1').encode('latin-1')
+        # Bloques que cortan las líneas por cualquier lado
+        bloques = [contenido[i:i + 7] for i in range(0, len(contenido), 7)]
+        lineas = list(lineas_incrementales(bloques))
+        self.assertEqual([l for l, _ in lineas], (ENCABEZADO_DAT + lineas_dat(0, 5)).splitlines())
+        self.assertEqual(lineas[-1][1], len(ENCABEZADO_DAT + lineas_dat(0, 5)))
+
+        lectura = Lectura(Tarea('H_prueba_FAO_99004.dat', self.estacion), iter(bloques), usar_columnar=False)
+        lotes = list(lectura.lotes(tamano=2))
+        self.assertEqual([len(l) for l in lotes], [2, 2, 1])
+        self.assertEqual([r.record_id for l in lotes for r in l], [0, 1, 2, 3, 4])
+        # La línea a medio escribir queda para la próxima importación
+        self.assertEqual(lectura.offset, len(ENCABEZADO_DAT + lineas_dat(0, 5)))
+
+    def test_versiones_de_encabezado(self):
+        registro = RegistroColumnas()
+        mapa = registro.obtener(self.estacion, ENCABEZADO_DAT)
+        self.assertEqual(mapa.campos, ('record_id', 'bateria_voltaje', 'ph'))
+        self.assertIs(registro.obtener(self.estacion, ENCABEZADO_DAT.strip() + '\r\n'), mapa)
+        registro.registrar(self.estacion, mapa)
+        self.assertEqual(mapa.version, 1)
+        self.assertFalse(Notificacion.objects.exists())
+
+        # Cambió el programa del datalogger: versión nueva y aviso
+        otro = registro.obtener(self.estacion, '"TIMESTAMP","RECORD","pH(pH)","ORP"')
+        with redirect_stdout(io.StringIO()):
+            registro.registrar(self.estacion, otro)
+        self.assertEqual((otro.version, otro.columnas['orp']), (2, 3))
+        self.assertEqual(Notificacion.objects.filter(estacion=self.estacion).count(), 1)
+
+        # Otro proceso reutiliza el mapeo guardado sin volver a registrarlo
+        registro = RegistroColumnas()
+        registro.precargar()
+        mapa = registro.obtener(self.estacion, ENCABEZADO_DAT)
+        self.assertEqual(mapa.version, 1)
+        registro.registrar(self.estacion, mapa)
+        self.assertEqual(VersionEncabezado.objects.filter(estacion=self.estacion).count(), 2)
+
+    @skipUnless(columnar.DISPONIBLE, 'requiere NumPy')
+    def test_columnar_igual_que_por_filas(self):
+        carpeta = tempfile.mkdtemp()
+        for variante in (0, 1):  # la 1 lleva sufijos _Avg y otro orden de columnas
+            ruta = os.path.join(carpeta, f"H_{variante}_FAO_99004.dat")
+            columnas = benchmark.encabezado_sintetico(variante, random.Random(variante))
+            benchmark.generar_dat(ruta, columnas, 300, nan=0.3, semilla=variante)
+            with open(ruta, encoding='latin-1') as f:
+                lineas = f.read().splitlines()
+            n = len(columnas)
+            lineas[10] = '"2025-13-45 00:00:00",' + ','.join(['1'] * (n - 1))   # fecha imposible
+            lineas[20] = '"2025-1-1 0:0:0",' + ','.join([''] * (n - 1))         # otro formato, celdas vacías
+            lineas[30] = '"",' + ','.join(['NAN'] * (n - 1))                     # sin fecha
+            lineas[40] = 'basura'
+            contenido = ('\n'.join(lineas) + '\n').encode('latin-1')
+
+            resultados = []
+            for usar_columnar in (True, False):
+                tarea = Tarea(f"H_{variante}_FAO_99004.dat", self.estacion)
+                lectura = Lectura(tarea, iter([contenido]), usar_columnar=usar_columnar)
+                filas = [
+                    (r.timestamp, r.record_id) + tuple(getattr(r, c) for c in VALORES)
+                    for r in lectura.registros()
+                ]
+                resultados.append((filas, dict(tarea.metrica.rechazos)))
+            vectorizado, por_filas = resultados
+            self.assertEqual(len(vectorizado[0]), 297)
+            self.assertEqual(vectorizado, por_filas)
+
+
+class VigilanciaTest(TestCase):
+    """El modo residente importa los archivos cuando el datalogger termina de escribirlos."""
+
+    def test_vigilante_entrega_archivos_estables(self):
+        for usar_inotify in (False, True):
+            with self.subTest(usar_inotify=usar_inotify):
+                raiz = tempfile.mkdtemp()
+                os.makedirs(os.path.join(raiz, '99005'))
+                with open(os.path.join(raiz, '99005', 'H_viejo_FAO_99005.dat'), 'w') as f:
+                    f.write(ENCABEZADO_DAT)
+                vigilante = Vigilante(FuenteLocal(raiz), intervalo=0.05, espera=0.3, usar_inotify=usar_inotify)
+                try:
+                    ruta = os.path.join(raiz, '99005', 'H_nuevo_FAO_99005.dat')
+                    inicio = monotonic()
+                    with open(ruta, 'w') as f:
+                        f.write(ENCABEZADO_DAT + lineas_dat(0, 3))
+                    archivos = vigilante.esperar(detener=lambda: monotonic() - inicio > 5)
+                    # Solo lo que cambió, y recién cuando dejó de cambiar
+                    self.assertEqual(list(archivos), ['H_nuevo_FAO_99005.dat'])
+                    self.assertEqual(archivos['H_nuevo_FAO_99005.dat'][0], os.path.getsize(ruta))
+                    self.assertGreaterEqual(monotonic() - inicio, 0.3)
+                finally:
+                    vigilante.cerrar()
+
+    def test_espera_exponencial_sin_datos(self):
+        agenda = Agenda('99005', intervalo=600)
+        # Sin datos nuevos: desde un cuarto del intervalo, duplicando hasta el máximo
+        esperas = [agenda.registrar(0, ahora=1000) for _ in range(7)]
+        self.assertEqual(esperas, [150, 300, 600, 1200, 2400, ESPERA_MAXIMA, ESPERA_MAXIMA])
+        self.assertEqual(agenda.proxima, 1000 + ESPERA_MAXIMA)
+        # Llegan datos: vuelve al ritmo del datalogger, alineado con su próxima subida
+        agenda.observar_mtime(900)
+        self.assertEqual(agenda.registrar(120, ahora=1000), 560)
+        self.assertEqual(agenda.vacios, 0)
+
+        # Sin intervalo configurado se estima con los mtime observados
+        agenda = Agenda('99006')
+        for mtime in (0, 300, 600):
+            agenda.observar_mtime(mtime)
+        self.assertEqual(agenda.intervalo, 300)
+
+
+@override_settings(RUTA_DATOS_TELEMETRIA=tempfile.mkdtemp())
+class BackfillTest(TestCase):
+    """La carga histórica en paralelo deja lo mismo que una importación: filas, marca de agua y resúmenes."""
+
+    def test_backfill_desde_tarball(self):
+        proyecto = Proyecto.objects.create(nombre='Prueba', fecha_inicio='2025-01-01')
+        estaciones = [
+            Estacion.objects.create(proyecto=proyecto, nombre=f"Est {c}", codigo_identificador=c) for c in ('99007', '99008')
+        ]
+        carpeta = tempfile.mkdtemp()
+        tarball = os.path.join(carpeta, 'historico.tar.gz')
+        with tarfile.open(tarball, 'w:gz') as tar:
+            for nombre, contenido in (
+                ('2024/H_a_FAO_99007.dat', ENCABEZADO_DAT + lineas_dat(0, 90)),
+                ('2025/H_b_FAO_99007.dat', ENCABEZADO_DAT + lineas_dat(90, 150)),
+                ('H_a_FAO_99008.dat', ENCABEZADO_DAT + lineas_dat(0, 30, ph=8.0)),
+                ('H_a_FAO_12345.dat', ENCABEZADO_DAT + lineas_dat(0, 10)),  # estación que no existe
+            ):
+                datos = contenido.encode('latin-1')
+                info = tarfile.TarInfo(nombre)
+                info.size = len(datos)
+                tar.addfile(info, io.BytesIO(datos))
+
+        with redirect_stdout(io.StringIO()):
+            call_command('backfill', tarball, workers=2, lote=40)
+
+        for estacion, filas, ultimo in ((estaciones[0], 150, 149), (estaciones[1], 30, 29)):
+            estacion.refresh_from_db()
+            self.assertEqual(DatosSensor.objects.filter(estacion=estacion).count(), filas)
+            self.assertEqual(estacion.marca_agua, (datetime(2025, 6, 1, tzinfo=tz.utc) + timedelta(minutes=ultimo), ultimo))
+            self.assertEqual(estacion.generacion_datos, 1)
+            horas = ResumenSensor.objects.filter(estacion=estacion, resolucion='hora', campo='ph')
+            self.assertEqual(sum(horas.values_list('conteo', flat=True)), filas)
+        self.assertEqual(DatosSensor.objects.count(), 180)
+
+
+def filas_json(desde, hasta, dias=0):
+    inicio = datetime(2025, 6, 1) + timedelta(days=dias)
+    return json.dumps({'filas': [
+        {'TIMESTAMP': f"{inicio + timedelta(minutes=i):%Y-%m-%d %H:%M:%S}", 'RECORD': i, 'BattV': 12.5, 'pH(pH)': 7.0}
+        for i in range(desde, hasta)
+    ]})
+
+
+class EscritorDePrueba(EscritorCoalescente):
+    """Anota el tamaño de cada grupo escrito y, con `fallar`, revierte los grupos de más de un envío."""
+
+    def __init__(self, fallar=False, **opciones):
+        super().__init__(**opciones)
+        self.fallar = fallar
+        self.grupos = []
+
+    def _escribir(self, envios):
+        self.grupos.append(len(envios))
+        with transaction.atomic():
+            super()._escribir(envios)
+            if self.fallar and len(envios) > 1:
+                raise RuntimeError("falla del grupo")
+
+
+# Transaccional: el escritor coalescente escribe desde su propio hilo y conexión
+@override_settings(RUTA_DATOS_TELEMETRIA=tempfile.mkdtemp())
+class IngestaHTTPTest(TransactionTestCase):
+    """El datalogger puede enviar sus lecturas por POST en vez de esperar al FTP."""
+
+    def setUp(self):
+        proyecto = Proyecto.objects.create(nombre='Prueba', fecha_inicio='2025-01-01')
+        self.estaciones = [
+            Estacion.objects.create(proyecto=proyecto, nombre=f"Est {c}", codigo_identificador=c) for c in ('99009', '99010')
+        ]
+        self.token = self.estaciones[0].generar_token_ingesta()
+
+    def enviar(self, cuerpo, tipo='application/json', token=None, codigo='99009'):
+        cabeceras = {'HTTP_AUTHORIZATION': f"Token {token}"} if token else {}
+        return self.client.post(f'/api/v1/ingesta/{codigo}/', cuerpo, content_type=tipo, **cabeceras)
+
+    def test_token(self):
+        self.assertEqual(self.enviar(filas_json(0, 3)).status_code, 401)
+        self.assertEqual(self.enviar(filas_json(0, 3), token='otro').status_code, 401)
+        # Una estación inexistente responde igual que un token inválido
+        self.assertEqual(self.enviar(filas_json(0, 3), token=self.token, codigo='12345').status_code, 401)
+        self.assertEqual(self.enviar(filas_json(0, 3), token=self.token).json(), {'recibidos': 3, 'guardados': 3})
+
+    def test_json_toa5_duplicados_y_futuro(self):
+        self.assertEqual(self.enviar(filas_json(0, 3), token=self.token).json(), {'recibidos': 3, 'guardados': 3})
+        toa5 = (
+            '"TOA5","CR1000","CR1000","1234","CR1000.Std.32","CPU:prueba.CR1","1","Tabla"\n'
+            + ENCABEZADO_DAT + '"TS","RN","Volts",""\n"","","Smp","Smp"\n' + lineas_dat(0, 5)
+        )
+        # Lo que ya estaba (hasta la marca de agua) no se vuelve a guardar
+        with redirect_stdout(io.StringIO()):  # otro encabezado que el del JSON: aviso de versión nueva
+            self.assertEqual(self.enviar(toa5, 'text/plain', self.token).json(), {'recibidos': 2, 'guardados': 2})
+        self.assertEqual(self.enviar(filas_json(0, 5), token=self.token).json(), {'recibidos': 0, 'guardados': 0})
+        self.assertEqual(self.enviar('{"filas": [{"BattV": 1}]}', token=self.token).status_code, 400)
+        # Una fila mala (fecha ISO con T) rechaza el envío entero: el datalogger no lo descarta
+        malo = json.dumps({'filas': [
+            {'TIMESTAMP': '2025-06-01 00:05:00', 'RECORD': 5, 'pH(pH)': 7},
+            {'TIMESTAMP': '2025-06-01T00:06:00', 'RECORD': 6, 'pH(pH)': 7},
+        ]})
+        respuesta = self.enviar(malo, token=self.token)
+        self.assertEqual(respuesta.status_code, 422)
+        self.assertEqual(respuesta.json()['recibidos'], 1)
+        self.assertEqual(respuesta.json()['rechazados'], {'fecha_invalida': 1})
+
+        # Un reloj adelantado guarda sus filas pero no arrastra la marca de agua al futuro
+        futuro = json.dumps({'filas': [{'TIMESTAMP': f"{datetime.now(tz.utc) + timedelta(days=3):%Y-%m-%d %H:%M:%S}", 'RECORD': 99}]})
+        self.assertEqual(self.enviar(futuro, token=self.token).json(), {'recibidos': 1, 'guardados': 1})
+        estacion = Estacion.objects.get(pk=self.estaciones[0].pk)
+        self.assertEqual(estacion.marca_agua, (datetime(2025, 6, 1, 0, 4, tzinfo=tz.utc), 4))
+        self.assertEqual(DatosSensor.objects.filter(estacion=estacion).count(), 6)
+
+    def enviar_a_la_vez(self, escritor):
+        resultados = {}
+
+        def enviar(estacion, dias):
+            mapa, registros = leer_carga(estacion, filas_json(0, 10, dias).encode(), 'application/json')
+            resultados[estacion.codigo_identificador] = escritor.enviar(estacion, mapa, registros)
+
+        hilos = [threading.Thread(target=enviar, args=(e, n)) for n, e in enumerate(self.estaciones)]
+        for hilo in hilos: hilo.start()
+        for hilo in hilos: hilo.join()
+        return resultados
+
+    def test_envios_concurrentes_en_una_transaccion(self):
+        escritor = EscritorDePrueba(ventana=1)
+        self.assertEqual(self.enviar_a_la_vez(escritor), {'99009': 10, '99010': 10})
+        self.assertEqual(escritor.grupos, [2])
+
+    def test_marca_de_agua_tras_fallar_el_grupo(self):
+        escritor = EscritorDePrueba(fallar=True, ventana=1)
+        self.assertEqual(self.enviar_a_la_vez(escritor), {'99009': 10, '99010': 10})
+        # El grupo se revirtió y cada envío se escribió solo, marca de agua incluida
+        self.assertEqual(escritor.grupos, [2, 1, 1])
+        for n, estacion in enumerate(self.estaciones):
+            estacion.refresh_from_db()
+            self.assertEqual(estacion.marca_agua, (datetime(2025, 6, 1 + n, 0, 9, tzinfo=tz.utc), 9))
+        # Y la versión de encabezado, que el grupo revertido había dado por registrada en memoria
+        self.assertEqual(VersionEncabezado.objects.filter(estacion__in=self.estaciones).count(), 2)
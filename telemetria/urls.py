@@ -5,6 +5,9 @@ from . import views
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
     path('api/v1/datos/', views.api_datos, name='api_datos'),
+    path('api/v1/estaciones/<str:estacion>/lecturas/', views.api_lecturas, name='api_lecturas'),
+    path('api/v1/estaciones/<str:estacion>/vivo/', views.api_vivo, name='api_vivo'),
+    path('api/v1/ingesta/<str:codigo>/', views.api_ingesta, name='api_ingesta'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('proyectos/', views.lista_proyectos, name='lista_proyectos'),
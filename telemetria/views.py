@@ -1,6 +1,22 @@
+import math
+import queue
 import random
+import asyncio
+import hashlib
+import tempfile
+from itertools import islice
+from datetime import datetime, timedelta
 from django.shortcuts import render
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.dateparse import parse_datetime, parse_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.core.exceptions import RequestDataTooBig
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import AuthenticationForm
@@ -12,6 +28,8 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import login
+from .ingesta.push import ESCRITOR, CargaInvalida, FilasRechazadas, leer_carga
+from . import submuestreo, resumenes, binario, vivo
 
 def login_view(request):
     if request.method == 'POST':
@@ -37,50 +55,464 @@ def logout_view(request):
 
 @login_required
 def dashboard_view(request):
-    return render(request, 'dashboard.html')
+    estaciones = estaciones_visibles(request.user).order_by('nombre')
+    return render(request, 'dashboard.html', {'estaciones': estaciones})
+
+# Serie del dashboard -> campo de DatosSensor
+SERIES = {
+    'bateria_voltaje': 'bateria_voltaje',
+    'ptemp': 'ptemp_c',
+    'oxigeno_mg': 'oxigeno_disuelto',
+    'oxigeno_porc': 'porcentaje_oxigeno',
+    'temperatura_agua': 'temperatura_agua',
+    'conductividad': 'conductividad',
+    'salinidad': 'salinidad',
+    'solidos': 'solidos_disueltos',
+    'ph': 'ph',
+    'orp': 'orp',
+    'oxigeno_max': 'oxigeno_max',
+    'salinidad_max': 'salinidad_max',
+    'ph_max': 'ph_max',
+}
+
+def _visibles(usuario, empresa):
+    estaciones = Estacion.objects.filter(proyecto__usuarios_asignados=usuario)
+    if empresa is not None:
+        estaciones = estaciones.filter(proyecto__empresa_id=empresa)
+    return estaciones
+
+def estaciones_visibles(usuario):
+    """Estaciones de los proyectos asignados al usuario, dentro de su empresa (todas para el superusuario)."""
+    if usuario.is_superuser:
+        return Estacion.objects.all()
+    return _visibles(usuario, PerfilUsuario.objects.filter(user=usuario).values_list('empresa', flat=True).first())
 
-@login_required 
-def api_datos(request):
-    # Traemos todos los datos ordenados
-    datos = DatosSensor.objects.all().order_by('timestamp')
-    
-    # Preparamos diccionarios vacíos para cada serie
-    response_data = {
-        'bateria_nivel': [], # Ojo: Tu CSV no tiene % batería, solo Voltaje. Usaremos Voltaje.
-        'bateria_voltaje': [],
-        'ptemp': [],
-        'oxigeno_mg': [],
-        'oxigeno_porc': [],
-        'temperatura_agua': [],
-        'conductividad': [],
-        'salinidad': [],
-        'solidos': [],
-        'ph': [],
-        'orp': []
+async def aestaciones_visibles(usuario):
+    """estaciones_visibles() para las vistas async."""
+    if usuario.is_superuser:
+        return Estacion.objects.all()
+    return _visibles(usuario, await PerfilUsuario.objects.filter(user=usuario).values_list('empresa', flat=True).afirst())
+
+# ==========================================
+# VALIDADORES HTTP (ETag / Last-Modified)
+# ==========================================
+
+# Segundos que el navegador puede reusar una ventana que ya quedó detrás de la
+# marca de agua sin revalidar (una reimportación podría corregirla)
+CACHE_HISTORICA = 3600
+
+def validadores(request, estaciones):
+    """
+    (ETag, Last-Modified) de una respuesta de lecturas a partir de la URL, el
+    formato pedido y la generación de datos de las `estaciones` (pk,
+    generacion_datos, datos_modificados): no hace falta leer DatosSensor.
+    """
+    firma = hashlib.blake2b(request.get_full_path().encode(), digest_size=16)
+    firma.update(b'|binario' if binario.acepta(request) else b'|json')
+    modificado = None
+    for pk, generacion, fecha in estaciones:
+        firma.update(f"|{pk}:{generacion}".encode())
+        if fecha is not None and (modificado is None or fecha > modificado):
+            modificado = fecha
+    return f'"{firma.hexdigest()}"', modificado
+
+def no_modificada(request, etag, modificado):
+    """304 si el cliente ya tiene esta versión (If-None-Match / If-Modified-Since), si no None."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(modificado.timestamp()) if modificado else None
+    )
+
+def con_validadores(respuesta, etag, modificado, historica=False):
+    respuesta.headers.setdefault('ETag', etag)
+    if modificado is not None and not respuesta.has_header('Last-Modified'):
+        respuesta['Last-Modified'] = http_date(modificado.timestamp())
+    # private: la respuesta depende de las estaciones visibles para la sesión
+    if historica:
+        patch_cache_control(respuesta, private=True, max_age=CACHE_HISTORICA)
+    else:
+        patch_cache_control(respuesta, private=True, no_cache=True)
+    patch_vary_headers(respuesta, ['Accept'])
+    return respuesta
+
+# Filas por lectura del cursor y tamaño en memoria de cada serie antes de pasar a disco
+TAMANO_CHUNK = 2000
+BUFFER_SERIE = 1024 * 1024
+
+def _numero(valor):
+    # NaN/inf no existen en JSON
+    return 'null' if valor is None or not math.isfinite(valor) else repr(valor)
+
+class JSONColumnar:
+    """
+    Escribe {"timestamps": [...], "series": {clave: [...]}} a medida que llegan
+    lotes de filas (timestamp, *valores): los timestamps (ms) salen directo y
+    los valores de cada serie se acumulan ya serializados en un archivo
+    temporal (en memoria hasta BUFFER_SERIE) que se vuelca al final.
+    """
+
+    def __init__(self, claves):
+        self.claves = claves
+        self.buffers = [tempfile.SpooledTemporaryFile(max_size=BUFFER_SERIE, mode='w+') for _ in claves]
+        self.separador = ''
+
+    def lote(self, filas):
+        columnas = list(zip(*filas))
+        texto = self.separador + ','.join([str(int(ts.timestamp() * 1000)) for ts in columnas[0]])
+        for buffer, valores in zip(self.buffers, columnas[1:]):
+            buffer.write(self.separador + ','.join(map(_numero, valores)))
+        self.separador = ','
+        return texto
+
+    def final(self):
+        yield '],"series":{'
+        for i, (clave, buffer) in enumerate(zip(self.claves, self.buffers)):
+            yield f'{"," if i else ""}"{clave}":['
+            buffer.seek(0)
+            while bloque := buffer.read(64 * 1024):
+                yield bloque
+            yield ']'
+        yield '}}'
+
+    def cerrar(self):
+        for buffer in self.buffers:
+            buffer.close()
+
+def json_columnar(filas, claves):
+    escritor = JSONColumnar(claves)
+    try:
+        yield '{"timestamps":['
+        while lote := list(islice(filas, TAMANO_CHUNK)):
+            yield escritor.lote(lote)
+        yield from escritor.final()
+    finally:
+        escritor.cerrar()
+
+async def lotes_async(filas):
+    """
+    Lotes de TAMANO_CHUNK filas del queryset, cada uno leído del cursor en el
+    hilo de la request. No es aiterator(): en Django 5.2,
+    BaseIterable._async_generator llama a self.__iter__() en el event loop, y
+    ValuesListIterable.__iter__ no es un generador (ejecuta la consulta con
+    compiler.results_iter() ahí mismo), así que
+
+        async for fila in DatosSensor.objects.values_list('timestamp', 'ph').aiterator():
+
+    lanza SynchronousOnlyOperation antes de leer la primera fila.
+    """
+    filas = filas.iterator(chunk_size=TAMANO_CHUNK)
+    leer = sync_to_async(lambda: list(islice(filas, TAMANO_CHUNK)))
+    while lote := await leer():
+        yield lote
+
+async def ajson_columnar(lotes, claves):
+    """json_columnar() sobre lotes_async()."""
+    escritor = JSONColumnar(claves)
+    try:
+        yield '{"timestamps":['
+        async for lote in lotes:
+            yield escritor.lote(lote)
+        for texto in escritor.final():
+            yield texto
+    finally:
+        escritor.cerrar()
+
+@login_required
+async def api_datos(request):
+    visibles = await aestaciones_visibles(await request.auser())
+    generaciones = [g async for g in visibles.order_by('pk').values_list('pk', 'generacion_datos', 'datos_modificados')]
+    etag, modificado = validadores(request, generaciones)
+    respuesta = no_modificada(request, etag, modificado)
+    if respuesta is not None:
+        return con_validadores(respuesta, etag, modificado)
+
+    # Solo las columnas de las series, como tuplas y leídas del cursor por partes
+    filas = DatosSensor.objects.filter(
+        estacion__in=visibles
+    ).order_by('timestamp').values_list('timestamp', *SERIES.values())
+    if isinstance(request, ASGIRequest):
+        contenido = ajson_columnar(lotes_async(filas), list(SERIES))
+    else:
+        # Por WSGI Django juntaría en memoria un iterador async antes de enviarlo
+        contenido = json_columnar(filas.iterator(chunk_size=TAMANO_CHUNK), list(SERIES))
+    respuesta = StreamingHttpResponse(contenido, content_type='application/json')
+    return con_validadores(respuesta, etag, modificado)
+
+# ==========================================
+# API DE LECTURAS POR ESTACIÓN
+# ==========================================
+
+# Sin desde/hasta se devuelve el último día con datos de la estación
+VENTANA_DEFECTO = timedelta(days=1)
+VENTANA_MAXIMA = timedelta(days=366)
+
+def leer_fecha(valor):
+    """'2025-06-01', '2025-06-01T12:00' o con zona; sin zona se toma la del servidor."""
+    fecha = parse_datetime(valor)
+    if fecha is None:
+        dia = parse_date(valor)
+        if dia is None:
+            raise ValueError(f"fecha inválida: {valor}")
+        fecha = datetime.combine(dia, datetime.min.time())
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+def ventana_consulta(request, estacion):
+    """(desde, hasta) pedidos, completados con VENTANA_DEFECTO. Lanza ValueError si no son válidos."""
+    desde = leer_fecha(request.GET['desde']) if request.GET.get('desde') else None
+    hasta = leer_fecha(request.GET['hasta']) if request.GET.get('hasta') else None
+    if hasta is None:
+        hasta = desde + VENTANA_DEFECTO if desde else (estacion.ultimo_timestamp or timezone.now())
+    if desde is None:
+        desde = hasta - VENTANA_DEFECTO
+    if desde > hasta:
+        raise ValueError("'desde' es posterior a 'hasta'")
+    if hasta - desde > VENTANA_MAXIMA:
+        raise ValueError(f"la ventana no puede superar {VENTANA_MAXIMA.days} días")
+    return desde, hasta
+
+def leer_despues(request):
+    """
+    Modo delta: `despues` es el timestamp más nuevo que ya tiene el cliente
+    (milisegundos, como los de las series, o fecha ISO). None si no se pidió.
+    """
+    return leer_cursor(request.GET.get('despues'))
+
+def leer_cursor(valor):
+    """Timestamp en milisegundos o fecha ISO (None si viene vacío). Lanza ValueError si no es válido."""
+    if not valor:
+        return None
+    try:
+        return datetime.fromtimestamp(float(valor) / 1000, tz=timezone.get_current_timezone())
+    except (ValueError, OverflowError):
+        return leer_fecha(valor)
+
+def leer_max_puntos(request):
+    """max_puntos pedido (None = todos los puntos). Lanza ValueError si no es válido."""
+    valor = request.GET.get('max_puntos')
+    if not valor:
+        return None
+    try:
+        max_puntos = int(valor)
+    except ValueError:
+        raise ValueError("max_puntos debe ser un número entero")
+    if not submuestreo.MINIMO <= max_puntos <= submuestreo.MAXIMO:
+        raise ValueError(f"max_puntos debe estar entre {submuestreo.MINIMO} y {submuestreo.MAXIMO}")
+    return max_puntos
+
+def leer_resolucion(request, desde, hasta):
+    """'cruda', 'hora' o 'dia': la pedida o, por defecto, la que corresponde al largo de la ventana."""
+    valor = request.GET.get('resolucion') or 'auto'
+    if valor == 'auto':
+        return resumenes.resolucion_para(desde, hasta) or 'cruda'
+    if valor not in ('cruda', resumenes.HORA, resumenes.DIA):
+        raise ValueError("resolucion debe ser auto, cruda, hora o dia")
+    return valor
+
+async def aobtener_estacion(usuario, estacion):
+    """Estación visible para el usuario por código identificador o, si no hay ninguna con ese código, por pk."""
+    visibles = await aestaciones_visibles(usuario)
+    encontrada = await visibles.filter(codigo_identificador=estacion).afirst()
+    if encontrada is None and estacion.isdigit():
+        encontrada = await visibles.filter(pk=int(estacion)).afirst()
+    if encontrada is None:
+        # 404 también para las de otras empresas: no se revela que existen
+        raise Http404("Estación no encontrada")
+    return encontrada
+
+def pares(ms, columnas):
+    """{clave: [[ms, valor], ...]} sin los nulos."""
+    return {
+        clave: [[t, v] for t, v in zip(ms, valores) if v is not None]
+        for clave, valores in columnas.items()
     }
 
-    for d in datos:
-        ts = d.timestamp.timestamp() * 1000 # Fecha en milisegundos
-        
-        # Función auxiliar para agregar dato si no es nulo
-        def add(key, value):
-            if value is not None:
-                response_data[key].append([ts, value])
-
-        add('bateria_voltaje', d.bateria_voltaje)
-        add('ptemp', d.ptemp_c)
-        add('oxigeno_mg', d.oxigeno_disuelto)
-        add('oxigeno_porc', d.porcentaje_oxigeno)
-        add('temperatura_agua', d.temperatura_agua)
-        add('conductividad', d.conductividad)
-        add('salinidad', d.salinidad)
-        add('solidos', d.solidos_disueltos)
-        add('ph', d.ph)
-        add('orp', d.orp)
-        # Nota: Como no tienes "Nivel Batería %" en el CSV, usaremos Voltaje duplicado o vacío
-        # Si tienes la fórmula para calcular % basado en voltaje, la pondríamos aquí.
-
-    return JsonResponse(response_data)
+def lecturas_crudas(estacion, hasta, desde=None, despues=None, limite=None):
+    """Filas (timestamp, *SERIES) hasta `hasta` desde `desde` (inclusive) o posteriores a `despues`."""
+    # Recorre solo el rango del índice único (estacion, timestamp, record_id)
+    lecturas = DatosSensor.objects.filter(estacion=estacion, timestamp__lte=hasta)
+    lecturas = lecturas.filter(timestamp__gt=despues) if despues else lecturas.filter(timestamp__gte=desde)
+    filas = lecturas.order_by('timestamp').values_list('timestamp', *SERIES.values())
+    return filas if limite is None else filas[:limite]
+
+def transponer(filas):
+    """Filas de lecturas_crudas() -> (ms, {clave: valores})."""
+    tiempos, *valores = list(zip(*filas)) or [()] * (len(SERIES) + 1)
+    return [ts.timestamp() * 1000 for ts in tiempos], dict(zip(SERIES, valores))
+
+def columnas_crudas(estacion, hasta, desde=None, despues=None, limite=None):
+    """(ms, {clave: valores}) de lecturas_crudas()."""
+    return transponer(lecturas_crudas(estacion, hasta, desde, despues, limite))
+
+async def acolumnas_crudas(estacion, hasta, desde=None, despues=None, limite=None):
+    return transponer([fila async for fila in lecturas_crudas(estacion, hasta, desde, despues, limite)])
+
+@login_required
+async def api_lecturas(request, estacion):
+    estacion = await aobtener_estacion(await request.auser(), estacion)
+    try:
+        despues = leer_despues(request)
+        if despues is not None:
+            # Solo lo posterior al último punto del cliente, siempre crudo
+            desde, hasta = despues, max(estacion.ultimo_timestamp or timezone.now(), despues)
+            if hasta - desde > VENTANA_MAXIMA:
+                raise ValueError(f"'despues' no puede ser anterior a {VENTANA_MAXIMA.days} días del último dato")
+            resolucion = 'cruda'
+        else:
+            desde, hasta = ventana_consulta(request, estacion)
+            resolucion = leer_resolucion(request, desde, hasta)
+        max_puntos = leer_max_puntos(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Entre importaciones la respuesta no cambia: 304 sin tocar DatosSensor
+    etag, modificado = validadores(request, [(estacion.pk, estacion.generacion_datos, estacion.datos_modificados)])
+    # Una ventana que termina antes del último dato guardado ya no recibe lecturas nuevas
+    historica = estacion.ultimo_timestamp is not None and hasta < estacion.ultimo_timestamp
+    respuesta = no_modificada(request, etag, modificado)
+    if respuesta is not None:
+        return con_validadores(respuesta, etag, modificado, historica)
+
+    picos = {clave for clave in SERIES if clave.endswith('_max')}
+    if resolucion != 'cruda':
+        # Ventanas largas: un punto por bucket de ResumenSensor (promedio; máximo para las *_max)
+        ms, columnas = await resumenes.acolumnas_resumidas(estacion, resolucion, desde, hasta, {
+            clave: (campo, 'maximo' if clave in picos else 'promedio') for clave, campo in SERIES.items()
+        })
+        if not await resumenes.acubre(estacion, resolucion, desde, hasta, ms):
+            # Resúmenes todavía sin reconstruir para la ventana: lecturas crudas (max_puntos las reduce)
+            resolucion = 'cruda'
+    if resolucion == 'cruda':
+        ms, columnas = await acolumnas_crudas(estacion, hasta, desde=None if despues else desde, despues=despues)
+
+    # Desde dónde pedir el próximo delta (?despues=cursor): el último dato cubierto por la respuesta
+    if despues is not None:
+        cursor = ms[-1] if ms else despues.timestamp() * 1000
+    else:
+        cursor = min(hasta, estacion.ultimo_timestamp or hasta).timestamp() * 1000
+    encabezado = {
+        'estacion': estacion.codigo_identificador,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'resolucion': resolucion,
+        'cursor': cursor,
+    }
+    if binario.acepta(request):
+        # Un solo arreglo de timestamps: la reducción tiene que ser la misma para todas las series
+        if max_puntos is not None:
+            ms, columnas = submuestreo.min_max_columnas(ms, columnas, max_puntos)
+        respuesta = HttpResponse(binario.codificar(encabezado, ms, columnas), content_type=binario.TIPO)
+        return con_validadores(respuesta, etag, modificado, historica)
+
+    if max_puntos is not None:
+        # Por columnas: cada serie se reduce a max_puntos (LTTB, o mín/máx para las *_max)
+        series = submuestreo.columnas_a_series(ms, columnas, max_puntos, picos=picos)
+    else:
+        series = pares(ms, columnas)
+    return con_validadores(JsonResponse({**encabezado, 'series': series}), etag, modificado, historica)
+
+# ==========================================
+# LECTURAS EN VIVO (SSE, SOLO BAJO ASGI)
+# ==========================================
+
+# Más filas nuevas que esto en un aviso (p. ej. un backfill) no van como delta: el cliente recarga
+MAX_FILAS_VIVO = 2000
+# Comentario SSE cada tantos segundos para que los proxies no corten la conexión
+LATIDO_VIVO = 25
+
+def delta_vivo(estacion_id, despues):
+    """
+    Para vivo.Hub: (generación, cursor, evento) con las lecturas de la estación
+    posteriores a `despues`. Evento LECTURAS con las series como en la API de
+    lecturas, RECARGAR si son demasiadas (o si el cliente no tenía ninguna), o
+    None si no hay nada nuevo.
+    """
+    estacion = Estacion.objects.get(pk=estacion_id)
+    hasta = estacion.ultimo_timestamp
+    if hasta is None or (despues is not None and hasta <= despues):
+        return estacion.generacion_datos, despues, None
+    datos = {'estacion': estacion.codigo_identificador, 'cursor': hasta.timestamp() * 1000}
+    if despues is None:
+        # Sin cursor (p. ej. la estación no tenía lecturas al suscribirse): no hay desde dónde filtrar
+        return estacion.generacion_datos, hasta, (vivo.RECARGAR, datos)
+    ms, columnas = columnas_crudas(estacion, hasta, despues=despues, limite=MAX_FILAS_VIVO + 1)
+    if len(ms) > MAX_FILAS_VIVO:
+        return estacion.generacion_datos, hasta, (vivo.RECARGAR, datos)
+    return estacion.generacion_datos, hasta, (vivo.LECTURAS, {**datos, 'series': pares(ms, columnas)})
+
+async def eventos_vivo(estacion, despues):
+    hub = vivo.hub()
+    cola = hub.suscribir(estacion.pk, delta_vivo, estacion.generacion_datos, estacion.ultimo_timestamp)
+    try:
+        yield 'retry: 5000\n\n'
+        # Lo que el cliente todavía no tiene; después, los avisos del hub
+        _, _, evento = await sync_to_async(delta_vivo)(estacion.pk, despues)
+        while True:
+            if evento is not None:
+                tipo, datos = evento
+                yield vivo.sse(tipo, datos, id=int(datos['cursor']))
+                if tipo == vivo.RECARGAR:
+                    return
+            try:
+                evento = await asyncio.wait_for(cola.get(), timeout=LATIDO_VIVO)
+            except asyncio.TimeoutError:
+                evento = None
+                yield ': latido\n\n'
+    finally:
+        hub.desuscribir(estacion.pk, cola)
+
+@login_required
+async def api_vivo(request, estacion):
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI cada conexión abierta ocuparía un hilo: 204 hace que EventSource no reintente
+        return HttpResponse(status=204)
+    estacion = await aobtener_estacion(await request.auser(), estacion)
+    try:
+        # Al reconectar, EventSource manda el id (cursor) del último evento recibido
+        despues = leer_cursor(request.headers.get('Last-Event-ID')) or leer_despues(request) or estacion.ultimo_timestamp
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    respuesta = StreamingHttpResponse(eventos_vivo(estacion, despues), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'  # nginx: no juntar los eventos
+    return respuesta
+
+# ==========================================
+# INGESTA POR HTTP (PUSH DEL DATALOGGER)
+# ==========================================
+
+def token_de(request):
+    """Token enviado como 'Authorization: Token <token>' o en la cabecera X-Token."""
+    autorizacion = request.headers.get('Authorization', '')
+    if autorizacion.startswith('Token '):
+        return autorizacion[len('Token '):].strip()
+    return request.headers.get('X-Token', '').strip()
+
+@csrf_exempt
+@require_POST
+def api_ingesta(request, codigo):
+    # Misma respuesta para estación inexistente y token inválido: no se revela qué códigos existen
+    estacion = Estacion.objects.filter(codigo_identificador=codigo).first()
+    if estacion is None or not estacion.verificar_token_ingesta(token_de(request)):
+        return JsonResponse({'error': 'no autorizado'}, status=401)
+
+    try:
+        mapa, registros = leer_carga(estacion, request.body, request.content_type)
+    except RequestDataTooBig:
+        return JsonResponse({'error': 'envío demasiado grande'}, status=413)
+    except FilasRechazadas as e:
+        # Nada guardado: con un 200 el datalogger borraría también las filas rechazadas
+        return JsonResponse({'error': str(e), 'recibidos': e.recibidos, 'rechazados': e.rechazos}, status=422)
+    except CargaInvalida as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        guardados = ESCRITOR.enviar(estacion, mapa, registros)
+    except (queue.Full, TimeoutError):
+        # El datalogger reintenta más tarde con los mismos datos
+        return JsonResponse({'error': 'servidor ocupado, reintente'}, status=503, headers={'Retry-After': '30'})
+
+    return JsonResponse({'recibidos': len(registros), 'guardados': guardados})
 
 # ==========================================
 # 3. GESTIÓN DE ESTACIONES
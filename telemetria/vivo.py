@@ -0,0 +1,188 @@
+"""
+Lecturas en vivo para los dashboards abiertos (Server-Sent Events por ASGI).
+
+Un Hub por event loop (por proceso del servidor ASGI) lleva, por estación con
+dashboards suscritos, la generación de datos y el cursor (último timestamp ya
+enviado). Cuando la estación cambia, el Hub consulta UNA vez las lecturas
+nuevas y reparte el mismo evento a todas sus suscripciones: un dashboard
+ocioso es solo una cola esperando.
+
+El aviso de cambio llega por dos caminos:
+
+- Broker local: notificar(), que el escritor llama al confirmar la transacción
+  (ver ingesta.escritor.registrar_cambios). Inmediato, pero solo ve lo que se
+  escribe en este proceso (la ingesta por HTTP).
+- Sondeo de la BD: cada settings.SONDEO_VIVO_TELEMETRIA segundos (5 por
+  defecto, 0 lo desactiva) una sola consulta compara la generacion_datos de
+  las estaciones suscritas. Cubre importar_ftp y cualquier otro proceso, y no
+  necesita Redis ni nada fuera de la BD.
+"""
+import json
+import asyncio
+import logging
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from telemetria.models import Estacion
+
+# Tamaño de la cola de cada suscripción: un cliente que no lee tanto se descarta
+CAPACIDAD_COLA = 100
+
+RECARGAR = 'recargar'
+LECTURAS = 'lecturas'
+
+registro = logging.getLogger(__name__)
+
+
+def intervalo_sondeo():
+    return getattr(settings, 'SONDEO_VIVO_TELEMETRIA', 5)
+
+
+def sse(evento, datos, id=None):
+    """Texto de un evento SSE (el id permite retomar con Last-Event-ID al reconectar)."""
+    lineas = [f"event: {evento}"]
+    if id is not None:
+        lineas.append(f"id: {id}")
+    lineas.append(f"data: {json.dumps(datos, separators=(',', ':'))}")
+    return '\n'.join(lineas) + '\n\n'
+
+
+def generaciones(pks):
+    return dict(Estacion.objects.filter(pk__in=pks).values_list('pk', 'generacion_datos'))
+
+
+def en_hilo(funcion):
+    """
+    sync_to_async(funcion) que descarta la conexión a la BD vencida o rota
+    antes y después de usarla, como hace Django al empezar y terminar cada
+    request: las consultas del Hub no pasan por ningún request.
+    """
+    def consulta(*args):
+        close_old_connections()
+        try:
+            return funcion(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(consulta)
+
+
+class EstadoEstacion:
+    """Suscripciones de una estación y lo último que se les envió."""
+
+    def __init__(self, consultar, generacion, cursor):
+        self.consultar = consultar
+        self.generacion = generacion
+        self.cursor = cursor
+        self.colas = set()
+        self.aviso = asyncio.Event()
+        self.tarea = None
+
+
+class Hub:
+    """
+    Suscripciones de un event loop. `consultar(estacion_id, despues)` (sync)
+    devuelve (generacion, cursor, (evento, datos) o None) con las lecturas
+    posteriores a `despues`.
+    """
+
+    def __init__(self, loop, intervalo):
+        self.loop = loop
+        self.intervalo = intervalo
+        self.estaciones = {}
+        self._sondeo = None
+
+    def suscribir(self, estacion_id, consultar, generacion, cursor):
+        """Cola de eventos (evento, datos) de la estación. Liberarla con desuscribir()."""
+        estado = self.estaciones.get(estacion_id)
+        if estado is None:
+            estado = self.estaciones[estacion_id] = EstadoEstacion(consultar, generacion, cursor)
+            estado.tarea = self.loop.create_task(self._vigilar(estacion_id, estado))
+        cola = asyncio.Queue(maxsize=CAPACIDAD_COLA)
+        estado.colas.add(cola)
+        if self.intervalo and self._sondeo is None:
+            self._sondeo = self.loop.create_task(self._sondear())
+        return cola
+
+    def desuscribir(self, estacion_id, cola):
+        estado = self.estaciones.get(estacion_id)
+        if estado is None: return
+        estado.colas.discard(cola)
+        if not estado.colas:
+            estado.tarea.cancel()
+            del self.estaciones[estacion_id]
+        if not self.estaciones and self._sondeo is not None:
+            self._sondeo.cancel()
+            self._sondeo = None
+
+    def avisar(self, estacion_id):
+        """Marca la estación como cambiada (desde el loop)."""
+        estado = self.estaciones.get(estacion_id)
+        if estado is not None:
+            estado.aviso.set()
+
+    def notificar(self, estacion_id):
+        """avisar() desde cualquier hilo."""
+        self.loop.call_soon_threadsafe(self.avisar, estacion_id)
+
+    async def _vigilar(self, estacion_id, estado):
+        while True:
+            await estado.aviso.wait()
+            estado.aviso.clear()
+            try:
+                generacion, cursor, evento = await en_hilo(estado.consultar)(estacion_id, estado.cursor)
+            except Exception:
+                # Se reintenta con el próximo aviso o sondeo
+                registro.exception("No se pudieron leer las lecturas nuevas de la estación %s", estacion_id)
+                continue
+            estado.generacion, estado.cursor = generacion, cursor
+            if evento is None: continue
+            for cola in list(estado.colas):
+                try:
+                    cola.put_nowait(evento)
+                except asyncio.QueueFull:
+                    # Cliente demasiado lento: se le pide recargar y deja de recibir deltas
+                    estado.colas.discard(cola)
+                    cola.get_nowait()
+                    cola.put_nowait((RECARGAR, {'cursor': evento[1].get('cursor')}))
+
+    async def _sondear(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            if not self.estaciones: continue
+            try:
+                actuales = await en_hilo(generaciones)(list(self.estaciones))
+            except Exception:
+                registro.exception("Falló el sondeo de generaciones")
+                continue
+            for estacion_id, generacion in actuales.items():
+                estado = self.estaciones.get(estacion_id)
+                if estado is not None and generacion != estado.generacion:
+                    estado.aviso.set()
+
+
+_hubs = {}
+_lock = threading.Lock()
+
+
+def hub():
+    """Hub del event loop en curso (se crea al primer uso)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        if loop not in _hubs:
+            _hubs[loop] = Hub(loop, intervalo_sondeo())
+            # Un loop cerrado (p. ej. el de un test) no recibe más avisos
+            for viejo in [l for l in _hubs if l.is_closed()]:
+                del _hubs[viejo]
+        return _hubs[loop]
+
+
+def notificar(estacion_id):
+    """Broker local: avisa a los hubs de este proceso que la estación tiene datos nuevos."""
+    with _lock:
+        hubs = list(_hubs.values())
+    for h in hubs:
+        try:
+            h.notificar(estacion_id)
+        except RuntimeError:  # su loop ya se cerró
+            pass